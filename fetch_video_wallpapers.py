@@ -8,16 +8,26 @@
 
 import os
 import sys
-import requests
 import argparse
-import subprocess
-import shutil
-from tqdm import tqdm
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools import catalog, run_metrics
+from tools.dedup_store import DEFAULT_DB_PATH, DedupStore, get_store
+from tools.download_engine import DownloadEngine, DEFAULT_PER_HOST
+from tools.http_cache import DEFAULT_TTL, configure_cache, get_json
+from tools.http_pool import close_sessions, configure_pool, get_session
+from tools.image_postprocess import MIN_HEIGHT, MIN_WIDTH
+from tools.pipeline import Pipeline, PipelineStage, print_stats
+from tools.pubspec_assets import asset_roots, update_pubspec
+from tools.size_budget import parse_size, plan_with_budget
+from tools.video_thumbnails import DEFAULT_WORKERS as DEFAULT_THUMB_WORKERS
+from tools.video_thumbnails import ThumbnailWorker, check_ffmpeg, find_videos, has_ffmpeg
+from tools import video_transcode
+from tools.video_select import DEFAULT_FPS, VideoTarget, select_file
+from tools.video_transcode import DEFAULT_MAX_KBPS, DEFAULT_MAX_WIDTH, transcode_videos
 
 # iPhone 视频参数
-MIN_WIDTH = 1080  # 最低宽度要求
-MIN_HEIGHT = 1920  # 最低高度要求
+MAX_SEARCH_PAGES = 50  # 单次搜索最多翻页数，防止无限翻页
 
 # API 配置
 API_KEYS = {
@@ -25,146 +35,75 @@ API_KEYS = {
 }
 
 
-def check_ffmpeg():
-    """检查 FFmpeg 是否安装"""
-    if not shutil.which('ffmpeg'):
-        print("\n⚠️  警告：未检测到 FFmpeg")
-        print("\nFFmpeg 用于生成视频缩略图。安装方法：")
-        print("  macOS:   brew install ffmpeg")
-        print("  Ubuntu:  sudo apt install ffmpeg")
-        print("  Windows: 下载 https://ffmpeg.org/download.html\n")
-        return False
-    return True
-
-
-def generate_thumbnail(video_path: str, thumbnail_path: str) -> bool:
-    """生成视频缩略图"""
-    try:
-        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
-        
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,
-            '-ss', '00:00:00',       # 第 0 秒
-            '-vframes', '1',          # 只提取 1 帧
-            '-vf', 'scale=400:-1',    # 缩放到宽度 400px
-            '-y',                     # 覆盖已存在的文件
-            thumbnail_path
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            timeout=10
-        )
-        
-        if result.returncode == 0 and os.path.exists(thumbnail_path):
-            file_size = os.path.getsize(thumbnail_path) / 1024
-            print(f"  📸 生成缩略图: {os.path.basename(thumbnail_path)} ({file_size:.1f} KB)")
-            return True
-        else:
-            print(f"  ⚠️  缩略图生成失败")
-            return False
-            
-    except Exception as e:
-        print(f"  ⚠️  缩略图生成异常: {e}")
-        return False
-
-
 class VideoDownloader:
     """视频下载器基类"""
     
-    def __init__(self, api_key: str, save_dir: str):
+    PLATFORM = ""
+    
+    def __init__(self, api_key: str, save_dir: str, engine: DownloadEngine = None,
+                 store: DedupStore = None, thumbnails: ThumbnailWorker = None, target: VideoTarget = None):
         self.api_key = api_key
         self.save_dir = save_dir
-        self.session = requests.Session()
+        self.session = get_session()  # 进程内共享，跨实例复用连接
+        self.engine = engine or DownloadEngine()
+        # 全局去重库：按 平台+ID / URL / 内容哈希 去重，跨主题目录共享
+        self.store = store or get_store()
+        # 缩略图在独立线程池中生成，不阻塞下载
+        self.thumbnails = thumbnails
+        # 多个版本中挑选最合适的文件：分辨率、帧率与大小
+        self.target = target or VideoTarget(MIN_WIDTH, MIN_HEIGHT)
         os.makedirs(save_dir, exist_ok=True)
-        
-        # 记录已下载的 URL，避免重复
-        self.downloaded_file = os.path.join(save_dir, "_downloaded.txt")
-        self.downloaded_urls = self._load_downloaded()
-    
-    def _load_downloaded(self) -> set:
-        """加载已下载的 URL 列表"""
-        if os.path.exists(self.downloaded_file):
-            with open(self.downloaded_file, "r") as f:
-                return set(f.read().splitlines())
-        return set()
-    
-    def _save_downloaded(self, url: str):
-        """保存已下载的 URL"""
-        with open(self.downloaded_file, "a") as f:
-            f.write(url + "\n")
-    
-    def _is_portrait(self, width: int, height: int) -> bool:
-        """判断是否为竖屏视频"""
-        return height > width and width >= MIN_WIDTH and height >= MIN_HEIGHT
-    
-    def download_video(self, url: str, filename: str, generate_thumb: bool = True) -> bool:
-        """下载单个视频"""
-        if url in self.downloaded_urls:
-            print(f"⏩ 已跳过（重复）：{filename}")
+    
+    def download_video(self, url: str, filename: str, generate_thumb: bool = True, item_id=None) -> bool:
+        """下载单个视频（可在线程池中并发调用）"""
+        if not self.store.claim(self.PLATFORM, item_id, url):
+            self.engine.write(f"⏩ 已跳过（重复）：{filename}")
             return False
         
         file_path = os.path.join(self.save_dir, filename)
         
-        try:
-            with self.session.get(url, stream=True, timeout=60) as r:
-                r.raise_for_status()
-                total_size = int(r.headers.get('content-length', 0))
-                
-                progress = tqdm(
-                    total=total_size,
-                    unit='B',
-                    unit_scale=True,
-                    unit_divisor=1024,
-                    desc=f"⬇️  {filename}",
-                    ascii=True
-                )
+        with run_metrics.get_metrics().stage("download", self.PLATFORM, file=filename) as stage:
+            try:
+                written, content_hash = self.engine.fetch(self.session, url, file_path, timeout=60)
+                stage.set(bytes=written)
                 
-                with open(file_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            progress.update(len(chunk))
-                progress.close()
+                # 内容哈希去重：不同平台/主题下的同一文件只保留一份
+                existing = self.store.record_download(self.PLATFORM, item_id, url, content_hash, file_path)
+                if existing:
+                    os.remove(file_path)
+                    stage.set(skipped="duplicate")
+                    self.engine.write(f"⏩ 已跳过（内容与 {existing} 相同）：{filename}")
+                    return False
                 
-                file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-                print(f"✅ 已保存：{file_path} ({file_size_mb:.2f} MB)")
+                file_size_mb = written / (1024 * 1024)
+                self.engine.write(f"✅ 已保存：{file_path} ({file_size_mb:.2f} MB)")
                 
-                # 生成缩略图
-                if generate_thumb and check_ffmpeg():
-                    thumb_filename = os.path.splitext(filename)[0] + '.jpg'
-                    thumb_path = os.path.join(self.save_dir, 'thumbnails', thumb_filename)
-                    generate_thumbnail(file_path, thumb_path)
+                # 提交缩略图任务，与后续下载并行
+                if generate_thumb and self.thumbnails is not None:
+                    self.thumbnails.submit(file_path)
                 
-                self._save_downloaded(url)
-                self.downloaded_urls.add(url)
                 return True
-                
-        except Exception as e:
-            print(f"⚠️  下载失败：{filename}\n错误：{e}")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            return False
+                    
+            except Exception as e:
+                stage.fail(e)
+                self.engine.write(f"⚠️  下载失败：{filename}\n错误：{e}")
+                return False
+            finally:
+                self.store.release(self.PLATFORM, item_id, url)
 
 
 class PexelsVideoDownloader(VideoDownloader):
     """Pexels 视频下载器"""
     
+    PLATFORM = "pexels_video"
     API_URL = "https://api.pexels.com/videos/search"
     
-    def search_videos(self, query: str, count: int = 5) -> List[Dict]:
-        """搜索视频"""
-        if not self.api_key:
-            print("⚠️  未配置 Pexels API Key，跳过")
-            return []
-        
-        print(f"\n🔍 正在从 Pexels 搜索视频：{query}")
-        
+    def _fetch_page(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], bool]:
+        """请求一页搜索结果，返回 (条目列表, 是否还有下一页)"""
         params = {
             "query": f"{query} mobile wallpaper animation",
-            "per_page": min(count * 3, 80),  # 多获取一些，筛选后可能不够
+            "page": page,
+            "per_page": per_page,
             "orientation": "portrait",  # 竖屏
         }
         
@@ -172,149 +111,152 @@ class PexelsVideoDownloader(VideoDownloader):
             "Authorization": self.api_key,
         }
         
-        try:
-            response = self.session.get(self.API_URL, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            videos = []
-            for item in data.get("videos", []):
-                video_files = item.get("video_files", [])
-                
-                # 查找最高质量的视频文件（优先 HD）
-                best_video = None
-                max_resolution = 0
-                
-                for vf in video_files:
-                    width = vf.get("width", 0)
-                    height = vf.get("height", 0)
-                    quality = vf.get("quality", "")
-                    file_type = vf.get("file_type", "")
-                    
-                    # 只要 mp4 格式的竖屏视频
-                    if file_type == "video/mp4" and self._is_portrait(width, height):
-                        resolution = width * height
-                        
-                        # 优先选择 HD 质量，或更高分辨率
-                        if quality == "hd" or resolution > max_resolution:
-                            best_video = {
-                                "url": vf["link"],
-                                "width": width,
-                                "height": height,
-                                "quality": quality,
-                            }
-                            max_resolution = resolution
-                
-                if best_video:
-                    videos.append({
-                        "id": item["id"],
-                        "duration": item.get("duration", 0),
-                        "url": best_video["url"],
-                        "width": best_video["width"],
-                        "height": best_video["height"],
-                        "quality": best_video["quality"],
-                        "user": item.get("user", {}).get("name", "Unknown"),
-                    })
-                
-                if len(videos) >= count:
-                    break
-            
-            print(f"✨ 找到 {len(videos)} 个合适的视频")
-            return videos
+        data = get_json(self.session, self.PLATFORM, self.API_URL, params, headers)
+        return data.get("videos", []), bool(data.get("next_page"))
+    
+    def _parse_item(self, item: Dict) -> Optional[Dict]:
+        """挑选单条结果中最合适的视频文件，没有合格文件返回 None"""
+        duration = item.get("duration", 0)
+        # 设置了单个视频预算时探测真实大小，否则按码率估算即可比较
+        session = self.session if self.target.max_bytes is not None else None
+        best_video = select_file(item.get("video_files", []), duration, self.target, session, self.engine)
+        if best_video is None:
+            return None
+        
+        return {
+            "id": item["id"],
+            "duration": duration,
+            "url": best_video["url"],
+            "width": best_video["width"],
+            "height": best_video["height"],
+            "quality": best_video["quality"],
+            "fps": best_video["fps"],
+            # 只传递接口给出或已探测到的大小，体积预算阶段不再重复探测；估算值仅用于挑选文件
+            "bytes": None if best_video["estimated"] else best_video["bytes"],
+            "user": item.get("user", {}).get("name", "Unknown"),
+        }
+    
+    def iter_videos(self, query: str, count: int = 5) -> Iterator[Dict]:
+        """惰性分页搜索：逐页请求，直到筛选后凑够 count 个或没有更多结果"""
+        # 多获取一些，筛选后可能不够；翻页过程中每页大小保持不变
+        per_page = min(count * 3, 80)
+        found = 0
+        
+        for page in range(1, MAX_SEARCH_PAGES + 1):
+            items, has_more = self._fetch_page(query, page, per_page)
+            for item in items:
+                video = self._parse_item(item)
+                if video is None:
+                    continue
+                yield video
+                found += 1
+                if found >= count:
+                    return
             
-        except Exception as e:
-            print(f"❌ Pexels 搜索失败：{e}")
-            return []
+            if not items or not has_more:
+                return
     
-    def download_videos(self, query: str, count: int = 5):
-        """下载视频"""
-        videos = self.search_videos(query, count)
+    def search_videos(self, query: str, count: int = 5) -> List[Dict]:
+        """搜索视频"""
+        if not self.api_key:
+            print("⚠️  未配置 Pexels API Key，跳过")
+            return []
+        
+        print(f"\n🔍 正在从 Pexels 搜索视频：{query}")
+        
+        # 翻页中途出错时保留已拿到的结果
+        videos = []
+        with run_metrics.get_metrics().stage("search", self.PLATFORM, query=query) as stage:
+            try:
+                for video in self.iter_videos(query, count):
+                    videos.append(video)
+            except Exception as e:
+                stage.fail(e)
+                print(f"❌ Pexels 搜索失败：{e}")
+            stage.set(results=len(videos))
         
-        success = 0
+        print(f"✨ 找到 {len(videos)} 个合适的视频")
+        return videos
+    
+    def build_plan(self, query: str, videos: List[Dict]) -> List[Dict]:
+        """将搜索结果转换为下载计划条目"""
+        plan = []
         for i, video in enumerate(videos, 1):
             duration = int(video["duration"])
             quality = video["quality"]
-            filename = f"{query}_{i}_{video['id']}_{quality}_{duration}s.mp4"
-            
-            print(f"\n📹 视频 {i}/{len(videos)}: {video['width']}x{video['height']} {quality.upper()} {duration}s")
-            
-            if self.download_video(video["url"], filename, generate_thumb=True):
-                success += 1
-        
-        print(f"\n📊 {query.capitalize()} - 成功下载 {success}/{len(videos)} 个视频")
+            plan.append({
+                "query": query,
+                "platform": self.PLATFORM,
+                "id": video["id"],
+                "url": video["url"],
+                "filename": f"{query}_{i}_{video['id']}_{quality}_{duration}s.mp4",
+                "width": video["width"],
+                "height": video["height"],
+                "quality": quality,
+                "duration": duration,
+                "bytes": video.get("bytes"),
+                "downloader": self,
+            })
+        return plan
 
 
-def update_pubspec_yaml():
-    """自动更新 pubspec.yaml 的 assets 配置"""
-    yaml_path = 'pubspec.yaml'
+def run_pipeline(source: Iterable, engine: DownloadEngine, count: int = None,
+                 thumbnails: ThumbnailWorker = None, transcode: Dict = None,
+                 search_workers: int = 4) -> Dict[str, Dict]:
+    """
+    流水线：[搜索] → 下载（I/O 线程）→ [转码] → [缩略图]（线程驱动 ffmpeg 子进程）
+    count 不为 None 时 source 为 (关键词, 下载器) 组合，边搜索边下载；否则 source 为已规划好的下载计划
+    transcode 为 transcode_video 的参数（max_width / max_bytes / max_kbps），None 表示不转码
+    返回各阶段统计
+    """
+    def search(job):
+        query, downloader = job
+        return downloader.build_plan(query, downloader.search_videos(query, count))
     
-    if not os.path.exists(yaml_path):
-        print("⚠️  未找到 pubspec.yaml")
-        return False
+    def download(item):
+        downloader = item["downloader"]
+        ok = downloader.download_video(item["url"], item["filename"], generate_thumb=False, item_id=item["id"])
+        engine.count(ok)
+        if not ok:
+            return None
+        item["path"] = os.path.join(downloader.save_dir, item["filename"])
+        return item
     
-    print("\n📝 更新 pubspec.yaml...")
+    def shrink(item):
+        path = item["path"]
+        if journal.is_done(path, settings):
+            return item
+        r = video_transcode.transcode_video(path, **transcode)
+        if r["mode"] == "failed":
+            engine.write(f"  ⚠️  转码失败：{os.path.basename(path)}")
+            return item  # 保留原视频，下次运行再试
+        journal.mark(path, settings)
+        engine.write(f"  🎞️  {os.path.basename(path)}: {r['before'] / 1024 / 1024:.2f} MB → "
+                     f"{r['after'] / 1024 / 1024:.2f} MB（{r['mode']}）")
+        return item
     
-    try:
-        with open(yaml_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # 找到 assets 部分并替换
-        new_lines = []
-        in_assets = False
-        assets_replaced = False
-        indent_count = 0
-        
-        for line in lines:
-            # 检测 assets 开始
-            if 'assets:' in line and not line.strip().startswith('#'):
-                in_assets = True
-                assets_replaced = True
-                indent_count = len(line) - len(line.lstrip())
-                
-                # 写入新的 assets 配置
-                new_lines.append(line)
-                new_lines.append(f"{' ' * (indent_count + 2)}# 图片资源\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/wallpapers/abstract/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/wallpapers/aesthetic/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/wallpapers/gradient/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/wallpapers/minimal/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/avatars/anime/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/avatars/cute/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/avatars/minimal/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/avatars/vintage/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/images/others/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}# 视频资源\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/videos/liquid/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/videos/liquid/thumbnails/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/videos/colorful/\n")
-                new_lines.append(f"{' ' * (indent_count + 2)}- assets/videos/colorful/thumbnails/\n")
-                continue
-            
-            # 跳过原有的 assets 条目
-            if in_assets:
-                # 检测 assets 结束（遇到新的顶级配置项）
-                if line.strip() and not line.strip().startswith('-') and not line.strip().startswith('#'):
-                    if len(line) - len(line.lstrip()) <= indent_count:
-                        in_assets = False
-                        new_lines.append(line)
-                continue
-            
-            new_lines.append(line)
-        
-        if assets_replaced:
-            with open(yaml_path, 'w', encoding='utf-8') as f:
-                f.writelines(new_lines)
-            print("✅ pubspec.yaml 已更新")
-            return True
-        else:
-            print("⚠️  未找到 assets 配置")
-            return False
-            
-    except Exception as e:
-        print(f"❌ 更新 pubspec.yaml 失败：{e}")
-        return False
+    def thumbnail(item):
+        thumbnails.generate(item["path"])
+        return item
+    
+    stages = []
+    if count is not None:
+        stages.append(PipelineStage("search", search, search_workers, fan_out=True, timed=False))
+    stages.append(PipelineStage("download", download, engine.max_workers, timed=False))
+    if transcode is not None and has_ffmpeg(probe=True):
+        settings = video_transcode.settings_key(transcode["max_width"], transcode["max_bytes"],
+                                                transcode["max_kbps"])
+        journal = video_transcode.TranscodeJournal()
+        stages.append(PipelineStage("transcode", shrink, video_transcode.DEFAULT_WORKERS, timed=False))
+    else:
+        journal = None
+    if thumbnails is not None and thumbnails.enabled:
+        stages.append(PipelineStage("thumbnail", thumbnail, thumbnails.max_workers, timed=False))
+    
+    stats = Pipeline(stages, log=engine.write).run(source)
+    if journal is not None:
+        journal.save()
+    return stats
 
 
 def main():
@@ -359,18 +301,109 @@ API Key 配置:
         help="保存目录（默认: assets/videos）"
     )
     
+    parser.add_argument(
+        "--pubspec",
+        type=str,
+        default="pubspec.yaml",
+        help="pubspec.yaml 文件路径（默认: pubspec.yaml）"
+    )
+    
     parser.add_argument(
         "--pexels-key",
         type=str,
         help="Pexels API Key"
     )
     
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="去重数据库路径（默认: .fetch_cache/dedup.sqlite3）"
+    )
+    
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="忽略搜索缓存，强制重新请求平台接口"
+    )
+    
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL / 3600,
+        help=f"搜索结果缓存有效期，单位小时，0 表示不使用缓存（默认: {DEFAULT_TTL // 3600}）"
+    )
+    
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=4,
+        help="并发下载线程数（默认: 4）"
+    )
+    
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=DEFAULT_PER_HOST,
+        help=f"单个主机的最大并发连接数（默认: {DEFAULT_PER_HOST}）"
+    )
+    
     parser.add_argument(
         "--no-thumbnail",
         action="store_true",
         help="不生成缩略图"
     )
     
+    parser.add_argument(
+        "--budget",
+        type=parse_size,
+        default=None,
+        help="视频总体积预算（含已有文件），如 40MB；下载前用 HEAD 探测大小挑选候选"
+    )
+    
+    parser.add_argument(
+        "--topic-budget",
+        type=parse_size,
+        default=None,
+        help="单个主题目录的体积预算（含已有文件），如 10MB"
+    )
+    
+    parser.add_argument(
+        "--transcode",
+        action="store_true",
+        help="下载后转码：缩放到设备宽度、限制大小/码率、去掉音轨、faststart"
+    )
+    
+    parser.add_argument(
+        "--max-mb",
+        type=float,
+        default=None,
+        help="单个视频的大小预算（MB，默认不限）：挑选文件时优先预算内的版本，转码时按它限制码率"
+    )
+    
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=DEFAULT_FPS,
+        help=f"期望帧率，优先挑选不高于它的版本（默认: {DEFAULT_FPS}）"
+    )
+    
+    parser.add_argument(
+        "--max-kbps",
+        type=int,
+        default=DEFAULT_MAX_KBPS,
+        help=f"转码码率上限（默认: {DEFAULT_MAX_KBPS}，0 表示不限）"
+    )
+    
+    parser.add_argument(
+        "--thumb-workers",
+        type=int,
+        default=DEFAULT_THUMB_WORKERS,
+        help=f"并发生成缩略图的 ffmpeg 进程数（默认: {DEFAULT_THUMB_WORKERS}）"
+    )
+    
+    run_metrics.add_arguments(parser)
+    
     args = parser.parse_args()
     
     # 更新 API Key
@@ -394,8 +427,7 @@ API Key 配置:
     
     # 检查 FFmpeg
     if not args.no_thumbnail:
-        has_ffmpeg = check_ffmpeg()
-        if not has_ffmpeg:
+        if not check_ffmpeg():
             print("\n⚠️  将跳过缩略图生成，或使用 --no-thumbnail 参数")
             response = input("\n是否继续？(y/N): ")
             if response.lower() != 'y':
@@ -405,27 +437,109 @@ API Key 配置:
     print("🎬 精美视频壁纸下载器")
     print("=" * 60)
     print(f"📱 目标: 竖屏高清视频 (至少 {MIN_WIDTH}x{MIN_HEIGHT})")
-    print(f"🎯 优先: HD 质量，无文件大小限制")
+    budget = f"，≤ {args.max_mb} MB/个" if args.max_mb else ""
+    print(f"🎯 挑选: 达标版本中体积最小的（≤ {args.fps:g}fps{budget}）")
+    if args.transcode:
+        budget = f"≤ {args.max_mb} MB/个" if args.max_mb else f"≤ {args.max_kbps} kbps"
+        print(f"🎞️  转码: 宽 ≤ {DEFAULT_MAX_WIDTH}px，{budget}，无音轨")
     print(f"🔍 搜索关键词: {', '.join(queries)}")
     print(f"📊 每个关键词下载: {args.count} 个视频")
     print(f"📂 保存路径: {args.dir}")
     print(f"📸 生成缩略图: {'否' if args.no_thumbnail else '是'}")
+    print(f"⚡ 并发下载: {args.workers} 线程（单主机 ≤ {args.per_host}）")
     print("=" * 60)
     
-    # 开始下载
+    # 分阶段指标（--metrics / --prom / --profile-dir 开启）
+    metrics = run_metrics.configure_from_args("fetch_video_wallpapers", args)
+    
+    # 共享连接池，大小与下载并发数匹配
+    configure_pool(args.workers)
+    
+    # 搜索结果缓存
+    cache = configure_cache(ttl=args.cache_ttl * 3600, refresh=args.refresh)
+    
+    # 打开共享去重库，导入仓库中的 download_history.tsv 与尚存的旧 _downloaded.txt
+    store = get_store(args.db)
+    migrated = store.import_legacy(args.dir)
+    if migrated["history"] or migrated["urls"] or migrated["files"]:
+        print(f"📦 去重库已导入 {migrated['history'] + migrated['urls']} 条记录，索引 {migrated['files']} 个已有文件")
+    
+    # 上次中断的转码可能留下临时文件，先清理，避免被当作视频抽帧或写进素材目录
+    leftovers = video_transcode.clean_leftovers(args.dir)
+    if leftovers:
+        print(f"🧹 已清理 {leftovers} 个未完成的转码临时文件")
+    
+    # 开始下载（所有主题共享同一个并发下载引擎）
+    engine = DownloadEngine(max_workers=args.workers, per_host=args.per_host)
+    
+    # 缩略图阶段：先补齐已有视频缺失/过期的缩略图，下载完成的视频随后陆续加入
+    thumbnails = None
+    if not args.no_thumbnail:
+        thumbnails = ThumbnailWorker(args.thumb_workers, log=engine.write)
+        thumbnails.backfill(args.dir)
+    
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    target = VideoTarget(MIN_WIDTH, MIN_HEIGHT, args.fps, max_bytes)
+    downloaders = []
     for query in queries:
         query_dir = os.path.join(args.dir, query.replace(" ", "_"))
-        
+        downloaders.append((query, PexelsVideoDownloader(API_KEYS["pexels"], query_dir, engine,
+                                                         thumbnails=thumbnails, target=target)))
+    
+    transcode = None
+    if args.transcode:
+        transcode = {"max_width": DEFAULT_MAX_WIDTH, "max_bytes": max_bytes, "max_kbps": args.max_kbps or None}
+    
+    if args.budget is None and args.topic_budget is None:
+        # 流水线：搜索、下载、转码与抽帧同时进行，不必等全部搜索完成
         print(f"\n{'=' * 60}")
-        print(f"📥 开始下载主题: {query}")
+        print(f"📥 边搜索边下载：{len(queries)} 个关键词")
         print(f"{'=' * 60}")
+        stats = run_pipeline(downloaders, engine, count=args.count, thumbnails=thumbnails,
+                             transcode=transcode, search_workers=args.workers)
+    else:
+        # 体积预算需要先汇总所有主题的候选
+        plan = []
+        for query, downloader in downloaders:
+            plan.extend(downloader.build_plan(query, downloader.search_videos(query, args.count)))
+        
+        # 体积预算：HEAD 探测大小，只保留预算内的候选
+        plan = plan_with_budget(plan, get_session(), engine, args.budget, args.topic_budget,
+                                args.dir, args.workers)
         
-        downloader = PexelsVideoDownloader(API_KEYS["pexels"], query_dir)
-        downloader.download_videos(query, args.count)
+        print(f"\n{'=' * 60}")
+        print(f"📥 开始下载：共 {len(plan)} 个视频")
+        print(f"{'=' * 60}")
+        stats = run_pipeline(plan, engine, thumbnails=thumbnails, transcode=transcode)
+    engine.close()
+    print(f"\n📊 成功下载 {stats['download']['out']}/{stats['download']['in']} 个视频")
+    print_stats(stats)
     
-    # 更新 pubspec.yaml
+    # 转码补齐：流水线只处理本次新下载的视频，已按相同参数转码过的文件直接跳过
+    if args.transcode:
+        transcode_videos(find_videos(args.dir), max_bytes=max_bytes, max_kbps=args.max_kbps or None)
+        if thumbnails is not None:
+            thumbnails.backfill(args.dir)  # 转码后的视频比缩略图新，重新抽帧
+    
+    if thumbnails is not None:
+        stats = thumbnails.close()
+        print(f"📸 缩略图：生成 {stats['generated']} 张，跳过 {stats['skipped']} 张（已是最新），失败 {stats['failed']} 张")
+    # 下载记录导出到仓库（download_history.tsv），提交后其他环境也能共享去重
+    if store.export_history():
+        print("📝 下载记录已更新：download_history.tsv（请随素材一起提交）")
+    store.close()
+    close_sessions()
+    if cache.hits:
+        print(f"💾 搜索缓存命中 {cache.hits} 次（--refresh 可强制刷新）")
+    
+    # 素材目录：App 启动时直接读取，无需扫描 AssetManifest
     print("\n" + "=" * 60)
-    update_pubspec_yaml()
+    catalog.write_catalog(video_root=args.dir)
+    
+    # 更新 pubspec.yaml（资源列表无变化时不改写）
+    project_dir = os.path.dirname(os.path.abspath(args.pubspec))
+    update_pubspec(args.pubspec, roots=asset_roots(args.dir, project_dir=project_dir))
+    run_metrics.print_summary(metrics.close())
     
     print("\n" + "=" * 60)
     print("🎉 所有视频下载完成！")
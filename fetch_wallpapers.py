@@ -7,17 +7,27 @@
 
 import os
 import sys
-import yaml
-import requests
 import argparse
-from tqdm import tqdm
-from typing import List, Dict
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools import catalog, image_postprocess, image_variants, preview_dedup, run_metrics
+from tools.dedup_store import DEFAULT_DB_PATH, DedupStore, get_store
+from tools.download_engine import DownloadEngine, DEFAULT_PER_HOST, DEFAULT_WORKERS
+from tools.http_cache import DEFAULT_TTL, configure_cache, get_json
+from tools.http_pool import close_sessions, configure_pool, get_session
+from tools.image_postprocess import MIN_HEIGHT, MIN_WIDTH
+from tools.pipeline import Pipeline, PipelineStage, print_stats
+from tools.pubspec_assets import asset_roots, update_pubspec
+from tools.search_cursor import configure_cursors, get_cursors, parse_time
+from tools.size_budget import format_size, parse_size, plan_with_budget
 
 # iPhone 16 Pro Max 屏幕参数
 IPHONE_16_PRO_MAX_WIDTH = 1320
 IPHONE_16_PRO_MAX_HEIGHT = 2868
-MIN_WIDTH = 1080  # 最低宽度要求
-MIN_HEIGHT = 1920  # 最低高度要求
+MAX_SEARCH_PAGES = 50  # 单次搜索最多翻页数，防止无限翻页
 
 # API 配置（需要用户自己申请免费 API Key）
 # Unsplash: https://unsplash.com/developers
@@ -31,92 +41,207 @@ API_KEYS = {
 }
 
 
-class WallpaperDownloader:
+class WallpaperDownloader(ABC):
     """壁纸下载器基类"""
     
-    def __init__(self, api_key: str, save_dir: str):
+    PLATFORM = ""
+    NAME = ""
+    PER_PAGE_CAP = 30
+    PER_PAGE_MIN = 1
+    # 结果按发布时间倒序时，原始条目中发布时间的字段名；设置后支持增量游标
+    PUBLISHED_FIELD = None
+    
+    def __init__(self, api_key: str, save_dir: str, engine: DownloadEngine = None,
+                 store: DedupStore = None):
         self.api_key = api_key
         self.save_dir = save_dir
-        self.session = requests.Session()
+        self.session = get_session()  # 进程内共享，跨实例复用连接
+        self.engine = engine or DownloadEngine()
+        # 全局去重库：按 平台+ID / URL / 内容哈希 去重，跨主题目录共享
+        self.store = store or get_store()
+        # 最近一次搜索取到的结果与对应的计划条目，下载完成后据此更新游标
+        self.scan = None
+        self.planned = {}
         os.makedirs(save_dir, exist_ok=True)
-        
-        # 记录已下载的 URL，避免重复
-        self.downloaded_file = os.path.join(save_dir, "_downloaded.txt")
-        self.downloaded_urls = self._load_downloaded()
-    
-    def _load_downloaded(self) -> set:
-        """加载已下载的 URL 列表"""
-        if os.path.exists(self.downloaded_file):
-            with open(self.downloaded_file, "r") as f:
-                return set(f.read().splitlines())
-        return set()
-    
-    def _save_downloaded(self, url: str):
-        """保存已下载的 URL"""
-        with open(self.downloaded_file, "a") as f:
-            f.write(url + "\n")
     
     def _is_portrait(self, width: int, height: int) -> bool:
         """判断是否为竖屏壁纸"""
         return height > width and width >= MIN_WIDTH and height >= MIN_HEIGHT
     
-    def download_image(self, url: str, filename: str) -> bool:
-        """下载单张图片"""
-        if url in self.downloaded_urls:
-            print(f"⏩ 已跳过（重复）：{filename}")
+    def download_image(self, url: str, filename: str, item_id=None, phash: int = None) -> bool:
+        """下载单张图片（可在线程池中并发调用）"""
+        if not self.store.claim(self.PLATFORM, item_id, url):
+            self.engine.write(f"⏩ 已跳过（重复）：{filename}")
             return False
         
         file_path = os.path.join(self.save_dir, filename)
         
-        try:
-            with self.session.get(url, stream=True, timeout=30) as r:
-                r.raise_for_status()
-                total_size = int(r.headers.get('content-length', 0))
+        with run_metrics.get_metrics().stage("download", self.PLATFORM, file=filename) as stage:
+            try:
+                written, content_hash = self.engine.fetch(self.session, url, file_path, timeout=30)
+                stage.set(bytes=written)
                 
-                progress = tqdm(
-                    total=total_size,
-                    unit='B',
-                    unit_scale=True,
-                    unit_divisor=1024,
-                    desc=f"⬇️  {filename}",
-                    ascii=True
-                )
+                # 内容哈希去重：不同平台/主题下的同一文件只保留一份
+                existing = self.store.record_download(self.PLATFORM, item_id, url, content_hash,
+                                                      file_path, phash)
+                if existing:
+                    os.remove(file_path)
+                    stage.set(skipped="duplicate")
+                    self.engine.write(f"⏩ 已跳过（内容与 {existing} 相同）：{filename}")
+                    return False
                 
-                with open(file_path, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            progress.update(len(chunk))
-                progress.close()
-                
-                print(f"✅ 已保存：{file_path}")
-                self._save_downloaded(url)
-                self.downloaded_urls.add(url)
+                self.engine.write(f"✅ 已保存：{file_path}")
                 return True
-                
-        except Exception as e:
-            print(f"⚠️  下载失败：{filename}\n错误：{e}")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            return False
-
-
-class UnsplashDownloader(WallpaperDownloader):
-    """Unsplash 壁纸下载器"""
-    
-    API_URL = "https://api.unsplash.com/search/photos"
+                    
+            except Exception as e:
+                stage.fail(e)
+                self.engine.write(f"⚠️  下载失败：{filename}\n错误：{e}")
+                return False
+            finally:
+                self.store.release(self.PLATFORM, item_id, url)
+    
+    @abstractmethod
+    def _fetch_page(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], bool]:
+        """请求一页原始结果，返回 (条目列表, 是否还有下一页)，由各平台子类实现"""
+    
+    @abstractmethod
+    def _parse_item(self, item: Dict) -> Optional[Dict]:
+        """筛选并转换单条结果，不合格返回 None，由各平台子类实现"""
+    
+    def iter_wallpapers(self, query: str, count: int = 10, cursor: Dict = None,
+                        scan: Dict = None) -> Iterator[Dict]:
+        """
+        惰性分页搜索：逐页请求，直到筛选后凑够 count 张或没有更多结果
+        cursor 为之前已处理完的结果区间，区间内的条目跳过（首次遇到时直接翻到区间之后）
+        scan 不为 None 时按顺序登记取到的结果 (发布时间, ID)，被筛掉的 ID 记为 None
+        """
+        # 多获取一些，筛选后可能不够；翻页过程中每页大小保持不变
+        per_page = max(self.PER_PAGE_MIN, min(count * 2, self.PER_PAGE_CAP))
+        found = 0
+        reached = False
+        page = 1
+        
+        while page <= MAX_SEARCH_PAGES:
+            items, has_more = self._fetch_page(query, page, per_page)
+            next_page = page + 1
+            for index, item in enumerate(items):
+                published = parse_time(item.get(self.PUBLISHED_FIELD)) if self.PUBLISHED_FIELD else None
+                if cursor is not None and published is not None and cursor["oldest"] <= published <= cursor["newest"]:
+                    if reached:
+                        continue
+                    reached = True
+                    if scan is not None:
+                        scan["reached"] = True
+                    # 区间内的结果都已处理过，按区间长度直接翻到其末尾；提前一页，容忍区间内有条目被删除
+                    end_page = ((page - 1) * per_page + index + cursor["count"]) // per_page
+                    get_cursors().reached()
+                    run_metrics.get_metrics().current().set(cursor_page=page)
+                    if end_page > page:
+                        print(f"⏭️  {self.NAME} · {query}：第 {page} 页起为已处理过的结果，跳到第 {end_page} 页")
+                        next_page = end_page
+                        break
+                    continue
+                wallpaper = self._parse_item(item)
+                if scan is not None and published is not None:
+                    entries = scan["after"] if reached else scan["before"]
+                    entries.append((published, wallpaper["id"] if wallpaper else None))
+                if wallpaper is None:
+                    continue
+                yield wallpaper
+                found += 1
+                if found >= count:
+                    return
+            
+            if not items or not has_more:
+                return
+            page = next_page
     
     def search_wallpapers(self, query: str, count: int = 10) -> List[Dict]:
         """搜索壁纸"""
+        self.scan = None
         if not self.api_key:
-            print("⚠️  未配置 Unsplash API Key，跳过")
+            print(f"⚠️  未配置 {self.NAME} API Key，跳过")
             return []
         
-        print(f"\n🔍 正在从 Unsplash 搜索：{query}")
+        print(f"\n🔍 正在从 {self.NAME} 搜索：{query}")
+        
+        # 翻页中途出错时保留已拿到的结果，但不更新游标
+        wallpapers = []
+        scan = {"before": [], "after": [], "reached": False}
+        cursor = get_cursors().get(self.PLATFORM, query) if self.PUBLISHED_FIELD else None
+        with run_metrics.get_metrics().stage("search", self.PLATFORM, query=query) as stage:
+            try:
+                for wallpaper in self.iter_wallpapers(query, count, cursor, scan):
+                    wallpapers.append(wallpaper)
+            except Exception as e:
+                stage.fail(e)
+                print(f"❌ {self.NAME} 搜索失败：{e}")
+            else:
+                if self.PUBLISHED_FIELD:
+                    self.scan = scan
+            stage.set(results=len(wallpapers))
         
+        print(f"✨ {self.NAME} · {query}：找到 {len(wallpapers)} 张合适的壁纸")
+        return wallpapers
+    
+    def update_cursor(self, query: str):
+        """
+        下载结果确定后更新游标：已下载、去重跳过、近似重复剔除与被筛掉的结果算作已处理，
+        下载失败、超出预算的结果不算
+        """
+        if self.scan is None:
+            return
+        
+        def handled(item_id):
+            if item_id is None:
+                return True
+            item = self.planned.get(item_id)
+            if item is None:
+                return False
+            return bool(item.get("similar") or self.store.has_item(self.PLATFORM, item_id)
+                        or self.store.has_url(item["url"]))
+        
+        before = [(published, handled(item_id)) for published, item_id in self.scan["before"]]
+        after = [(published, handled(item_id)) for published, item_id in self.scan["after"]]
+        get_cursors().update(self.PLATFORM, query, before, self.scan["reached"], after)
+    
+    def make_filename(self, query: str, index: int, wallpaper: Dict) -> str:
+        """生成保存文件名"""
+        return f"{self.PLATFORM}_{query}_{index}_{wallpaper['id']}.jpg"
+    
+    def build_plan(self, query: str, wallpapers: List[Dict]) -> List[Dict]:
+        """将搜索结果转换为下载计划条目"""
+        plan = [
+            {
+                "query": query,
+                "platform": self.PLATFORM,
+                "id": wp["id"],
+                "url": wp["url"],
+                "preview": wp.get("preview"),
+                "filename": self.make_filename(query, i, wp),
+                "downloader": self,
+            }
+            for i, wp in enumerate(wallpapers, 1)
+        ]
+        self.planned = {item["id"]: item for item in plan}
+        return plan
+
+
+class UnsplashDownloader(WallpaperDownloader):
+    """Unsplash 壁纸下载器"""
+    
+    PLATFORM = "unsplash"
+    NAME = "Unsplash"
+    API_URL = "https://api.unsplash.com/search/photos"
+    PER_PAGE_CAP = 30
+    PUBLISHED_FIELD = "created_at"  # order_by=latest
+    
+    def _fetch_page(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], bool]:
+        """请求一页搜索结果"""
         params = {
             "query": f"{query} mobile wallpaper portrait",
-            "per_page": min(count * 2, 30),  # 多获取一些，筛选后可能不够
+            "page": page,
+            "per_page": per_page,
             "orientation": "portrait",  # 竖屏
             "order_by": "latest",  # 改为最新
         }
@@ -125,62 +250,35 @@ class UnsplashDownloader(WallpaperDownloader):
             "Authorization": f"Client-ID {self.api_key}",
         }
         
-        try:
-            response = self.session.get(self.API_URL, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            wallpapers = []
-            for item in data.get("results", []):
-                width = item.get("width", 0)
-                height = item.get("height", 0)
-                
-                if self._is_portrait(width, height):
-                    wallpapers.append({
-                        "url": item["urls"]["raw"] + f"&w={IPHONE_16_PRO_MAX_WIDTH}&h={IPHONE_16_PRO_MAX_HEIGHT}&fit=crop",
-                        "id": item["id"],
-                        "author": item["user"]["name"],
-                    })
-                
-                if len(wallpapers) >= count:
-                    break
-            
-            print(f"✨ 找到 {len(wallpapers)} 张合适的壁纸")
-            return wallpapers
-            
-        except Exception as e:
-            print(f"❌ Unsplash 搜索失败：{e}")
-            return []
-    
-    def download_wallpapers(self, query: str, count: int = 10):
-        """下载壁纸"""
-        wallpapers = self.search_wallpapers(query, count)
-        
-        success = 0
-        for i, wp in enumerate(wallpapers, 1):
-            filename = f"unsplash_{query}_{i}_{wp['id']}.jpg"
-            if self.download_image(wp["url"], filename):
-                success += 1
-        
-        print(f"\n📊 Unsplash - 成功下载 {success}/{len(wallpapers)} 张")
+        data = get_json(self.session, self.PLATFORM, self.API_URL, params, headers)
+        return data.get("results", []), page < data.get("total_pages", 0)
+    
+    def _parse_item(self, item: Dict) -> Optional[Dict]:
+        """筛选并转换单条结果"""
+        if not self._is_portrait(item.get("width", 0), item.get("height", 0)):
+            return None
+        return {
+            "url": item["urls"]["raw"] + f"&w={IPHONE_16_PRO_MAX_WIDTH}&h={IPHONE_16_PRO_MAX_HEIGHT}&fit=crop",
+            "preview": item["urls"].get("small"),
+            "id": item["id"],
+            "author": item["user"]["name"],
+        }
 
 
 class PexelsDownloader(WallpaperDownloader):
     """Pexels 壁纸下载器"""
     
+    PLATFORM = "pexels"
+    NAME = "Pexels"
     API_URL = "https://api.pexels.com/v1/search"
+    PER_PAGE_CAP = 80
     
-    def search_wallpapers(self, query: str, count: int = 10) -> List[Dict]:
-        """搜索壁纸"""
-        if not self.api_key:
-            print("⚠️  未配置 Pexels API Key，跳过")
-            return []
-        
-        print(f"\n🔍 正在从 Pexels 搜索：{query}")
-        
+    def _fetch_page(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], bool]:
+        """请求一页搜索结果"""
         params = {
             "query": f"{query} mobile wallpaper",
-            "per_page": min(count * 2, 80),
+            "page": page,
+            "per_page": per_page,
             "orientation": "portrait",
         }
         
@@ -188,148 +286,214 @@ class PexelsDownloader(WallpaperDownloader):
             "Authorization": self.api_key,
         }
         
-        try:
-            response = self.session.get(self.API_URL, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            wallpapers = []
-            for item in data.get("photos", []):
-                width = item.get("width", 0)
-                height = item.get("height", 0)
-                
-                if self._is_portrait(width, height):
-                    # 使用 large2x 或 original 尺寸
-                    url = item["src"].get("original", item["src"].get("large2x"))
-                    wallpapers.append({
-                        "url": url,
-                        "id": item["id"],
-                        "photographer": item["photographer"],
-                    })
-                
-                if len(wallpapers) >= count:
-                    break
-            
-            print(f"✨ 找到 {len(wallpapers)} 张合适的壁纸")
-            return wallpapers
-            
-        except Exception as e:
-            print(f"❌ Pexels 搜索失败：{e}")
-            return []
-    
-    def download_wallpapers(self, query: str, count: int = 10):
-        """下载壁纸"""
-        wallpapers = self.search_wallpapers(query, count)
-        
-        success = 0
-        for i, wp in enumerate(wallpapers, 1):
-            filename = f"pexels_{query}_{i}_{wp['id']}.jpg"
-            if self.download_image(wp["url"], filename):
-                success += 1
-        
-        print(f"\n📊 Pexels - 成功下载 {success}/{len(wallpapers)} 张")
+        data = get_json(self.session, self.PLATFORM, self.API_URL, params, headers)
+        return data.get("photos", []), bool(data.get("next_page"))
+    
+    def _parse_item(self, item: Dict) -> Optional[Dict]:
+        """筛选并转换单条结果"""
+        if not self._is_portrait(item.get("width", 0), item.get("height", 0)):
+            return None
+        # 使用 large2x 或 original 尺寸
+        url = item["src"].get("original", item["src"].get("large2x"))
+        return {
+            "url": url,
+            "preview": item["src"].get("tiny"),
+            "id": item["id"],
+            "photographer": item["photographer"],
+        }
 
 
 class PixabayDownloader(WallpaperDownloader):
     """Pixabay 壁纸下载器"""
     
+    PLATFORM = "pixabay"
+    NAME = "Pixabay"
     API_URL = "https://pixabay.com/api/"
+    PER_PAGE_CAP = 200
+    PER_PAGE_MIN = 3  # Pixabay 要求 per_page 在 3~200 之间
     
-    def search_wallpapers(self, query: str, count: int = 10) -> List[Dict]:
-        """搜索壁纸"""
-        if not self.api_key:
-            print("⚠️  未配置 Pixabay API Key，跳过")
-            return []
-        
-        print(f"\n🔍 正在从 Pixabay 搜索：{query}")
-        
+    def _fetch_page(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], bool]:
+        """请求一页搜索结果"""
         params = {
             "key": self.api_key,
             "q": f"{query} mobile wallpaper",
             "image_type": "photo",
             "orientation": "vertical",
-            "per_page": min(count * 2, 200),
+            "page": page,
+            "per_page": per_page,
             "safesearch": "true",
         }
         
-        try:
-            response = self.session.get(self.API_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            wallpapers = []
-            for item in data.get("hits", []):
-                width = item.get("imageWidth", 0)
-                height = item.get("imageHeight", 0)
-                
-                if self._is_portrait(width, height):
-                    wallpapers.append({
-                        "url": item["largeImageURL"],
-                        "id": item["id"],
-                        "tags": item.get("tags", ""),
-                    })
-                
-                if len(wallpapers) >= count:
-                    break
-            
-            print(f"✨ 找到 {len(wallpapers)} 张合适的壁纸")
-            return wallpapers
-            
-        except Exception as e:
-            print(f"❌ Pixabay 搜索失败：{e}")
-            return []
-    
-    def download_wallpapers(self, query: str, count: int = 10):
-        """下载壁纸"""
-        wallpapers = self.search_wallpapers(query, count)
-        
-        success = 0
-        for i, wp in enumerate(wallpapers, 1):
-            filename = f"pixabay_{query}_{i}_{wp['id']}.jpg"
-            if self.download_image(wp["url"], filename):
-                success += 1
-        
-        print(f"\n📊 Pixabay - 成功下载 {success}/{len(wallpapers)} 张")
+        data = get_json(self.session, self.PLATFORM, self.API_URL, params)
+        # totalHits 是 API 实际允许翻阅的条数上限
+        return data.get("hits", []), page * per_page < data.get("totalHits", 0)
+    
+    def _parse_item(self, item: Dict) -> Optional[Dict]:
+        """筛选并转换单条结果"""
+        if not self._is_portrait(item.get("imageWidth", 0), item.get("imageHeight", 0)):
+            return None
+        return {
+            "url": item["largeImageURL"],
+            "preview": item.get("previewURL"),
+            "id": item["id"],
+            "tags": item.get("tags", ""),
+        }
 
 
-def update_pubspec_assets(pubspec_path: str, base_dir: str):
-    """自动更新 pubspec.yaml 中的 assets 路径"""
-    if not os.path.exists(pubspec_path):
-        print(f"⚠️  未找到 {pubspec_path}，跳过自动更新。")
-        return
-    
-    print(f"\n🧩 正在更新 {pubspec_path} ...")
-    
-    with open(pubspec_path, "r", encoding="utf-8") as f:
-        content = yaml.safe_load(f)
-    
-    if "flutter" not in content:
-        content["flutter"] = {}
-    
-    assets = content["flutter"].get("assets", [])
-    
-    # 遍历所有包含图片的目录
-    for root, dirs, files in os.walk(base_dir):
-        # 跳过隐藏文件和 _downloaded.txt
-        image_files = [
-            f for f in files 
-            if f.lower().endswith((".jpg", ".png", ".jpeg", ".webp")) 
-            and not f.startswith("_")
-        ]
-        
-        if image_files:
-            rel_path = os.path.relpath(root, os.path.dirname(pubspec_path)) + "/"
-            rel_path = rel_path.replace("\\", "/")
-            if rel_path not in assets:
-                assets.append(rel_path)
-                print(f"  ➕ 添加路径：{rel_path}")
-    
-    content["flutter"]["assets"] = sorted(list(set(assets)))
-    
-    with open(pubspec_path, "w", encoding="utf-8") as f:
-        yaml.dump(content, f, allow_unicode=True, sort_keys=False)
-    
-    print("✅ pubspec.yaml 已自动更新成功！")
+PLATFORM_DOWNLOADERS = {
+    "unsplash": UnsplashDownloader,
+    "pexels": PexelsDownloader,
+    "pixabay": PixabayDownloader,
+}
+
+
+def make_downloaders(queries: List[str], platforms: List[str], base_dir: str,
+                     engine: DownloadEngine) -> Dict[Tuple[str, str], WallpaperDownloader]:
+    """为每个（关键词, 平台）组合创建下载器，保存到 <base_dir>/<关键词>/"""
+    downloaders = {}
+    for query in queries:
+        query_dir = os.path.join(base_dir, query.replace(" ", "_"))
+        for platform in platforms:
+            downloaders[(query, platform)] = PLATFORM_DOWNLOADERS[platform](API_KEYS[platform], query_dir, engine)
+    return downloaders
+
+
+def search_all(downloaders: Dict[Tuple[str, str], WallpaperDownloader], count: int,
+               max_workers: int = 8) -> List[Dict]:
+    """并发搜索所有（关键词, 平台）组合，合并为一份下载计划"""
+    jobs = list(downloaders)
+    if not jobs:
+        return []
+    
+    print(f"\n🔍 并发搜索 {len(jobs)} 个组合...")
+    
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(jobs), max_workers))) as pool:
+        futures = {
+            pool.submit(downloaders[job].search_wallpapers, job[0], count): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    
+    # 按关键词、平台的固定顺序合并，保证计划稳定
+    plan = []
+    for job in jobs:
+        plan.extend(downloaders[job].build_plan(job[0], results[job]))
+    return plan
+
+
+def print_plan(plan: List[Dict]):
+    """打印下载计划（dry run）"""
+    print(f"\n{'=' * 60}")
+    print(f"📋 下载计划：共 {len(plan)} 张")
+    print(f"{'=' * 60}")
+    
+    totals = Counter((item["query"], item["platform"]) for item in plan)
+    current = None
+    for item in plan:
+        key = (item["query"], item["platform"])
+        if key != current:
+            current = key
+            print(f"\n📂 {item['query']} · {item['downloader'].NAME}（{totals[key]} 张）")
+        size = f"（{format_size(item['bytes'])}）" if item.get("bytes") else ""
+        print(f"  • {item['filename']}{size}")
+        print(f"    {item['url']}")
+
+
+def _download_item(item: Dict) -> bool:
+    """下载单个计划条目，成功时在条目上记录保存路径"""
+    downloader = item["downloader"]
+    ok = downloader.download_image(item["url"], item["filename"], item["id"], item.get("phash"))
+    if ok:
+        item["path"] = os.path.join(downloader.save_dir, item["filename"])
+    return ok
+
+
+def run_pipeline(source: Iterable, engine: DownloadEngine, store: DedupStore, count: int = None,
+                 preview_filter: preview_dedup.PreviewFilter = None, validate: bool = True,
+                 optimize: bool = False, fmt: str = image_postprocess.DEFAULT_FORMAT,
+                 quality: int = image_postprocess.DEFAULT_QUALITY, variants: bool = True,
+                 search_workers: int = 8, cpu_workers: int = None) -> Dict[str, Dict]:
+    """
+    流水线：[搜索 → 预览图去重] → 下载（I/O 线程）→ 校验 → [缩放重编码] → [变体]（进程池）→ 提交去重库
+    count 不为 None 时 source 为 (关键词, 下载器) 组合，边搜索边下载；否则 source 为已规划好的下载计划
+    返回各阶段统计
+    """
+    cpu_workers = cpu_workers or os.cpu_count() or 1
+    target_w, target_h = image_postprocess.TARGET_PROFILES[image_postprocess.DEFAULT_PROFILE]
+    summary = {"before": 0, "after": 0, "optimized": 0, "variants": 0}
+    
+    def search(job):
+        query, downloader = job
+        return downloader.build_plan(query, downloader.search_wallpapers(query, count))
+    
+    def download(item):
+        ok = _download_item(item)
+        engine.count(ok)
+        return item if ok else None
+    
+    def check(item):
+        # 尺寸已在搜索阶段按原图检查；下载地址可能是平台缩放过的版本（Pixabay 最长边 1280），这里只检查能否解码
+        error = pipeline.cpu(image_postprocess.validate_image, item["path"])
+        if error is None:
+            return item
+        # 损坏或不合格的文件删除并移出去重库，下次运行可以重新下载
+        os.remove(item["path"])
+        store.forget_path(item["path"])
+        engine.write(f"🗑️  已删除：{item['filename']}（{error}）")
+        return None
+    
+    def shrink(item):
+        result = pipeline.cpu(image_postprocess.process_image, item["path"], target_w, target_h, fmt, quality)
+        item["optimized"] = result
+        item["path"] = result["dst"]
+        return item
+    
+    def make_variants(item):
+        written = pipeline.cpu(image_variants.make_variants, item["path"], tuple(image_variants.VARIANT_WIDTHS))
+        item["variants"] = len(written)
+        return item
+    
+    def commit(item):
+        # 提交阶段只有一个 worker，汇总计数在这里累加，不需要加锁
+        summary["variants"] += item.get("variants", 0)
+        result = item.get("optimized")
+        if result is not None and not result["skipped"]:
+            if result["dst"] != result["src"]:
+                store.rename_path(result["src"], result["dst"])
+            summary["optimized"] += 1
+            summary["before"] += result["before"]
+            summary["after"] += result["after"]
+        return item
+    
+    stages = []
+    if count is not None:
+        stages.append(PipelineStage("search", search, search_workers, fan_out=True, timed=False))
+        if preview_filter is not None:
+            stages.append(PipelineStage("phash", preview_filter.check, search_workers))
+    stages.append(PipelineStage("download", download, engine.max_workers, timed=False))
+    has_pillow = image_postprocess.AVAILABLE
+    if validate and has_pillow:
+        stages.append(PipelineStage("validate", check, cpu_workers))
+    if optimize and has_pillow:
+        stages.append(PipelineStage("optimize", shrink, cpu_workers))
+    if variants and has_pillow:
+        stages.append(PipelineStage("variants", make_variants, cpu_workers))
+    stages.append(PipelineStage("commit", commit, 1, timed=False))
+    
+    pipeline = Pipeline(stages, process_workers=cpu_workers, log=engine.write)
+    stats = pipeline.run(source)
+    store.flush()
+    
+    if summary["optimized"]:
+        saved = (summary["before"] - summary["after"]) / (1024 * 1024)
+        engine.write(f"✨ 后处理 {summary['optimized']} 张，节省 {saved:.1f} MB")
+    if summary["variants"]:
+        engine.write(f"✨ 生成 {summary['variants']} 个变体文件")
+    if preview_filter is not None and preview_filter.dropped:
+        engine.write(f"✨ 近似重复剔除 {preview_filter.dropped} 张")
+    return stats
 
 
 def main():
@@ -395,6 +559,107 @@ API Key 配置:
         help="pubspec.yaml 文件路径（默认: pubspec.yaml）"
     )
     
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=DEFAULT_DB_PATH,
+        help="去重数据库路径（默认: .fetch_cache/dedup.sqlite3）"
+    )
+    
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="忽略搜索缓存，强制重新请求平台接口"
+    )
+    
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL / 3600,
+        help=f"搜索结果缓存有效期，单位小时，0 表示不使用缓存（默认: {DEFAULT_TTL // 3600}）"
+    )
+    
+    parser.add_argument(
+        "--full-scan",
+        action="store_true",
+        help="忽略增量游标，从第一页重新翻阅（默认按时间排序的平台跳过之前已处理过的结果）"
+    )
+    
+    parser.add_argument(
+        "--workers", "-w",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"并发下载线程数（默认: {DEFAULT_WORKERS}）"
+    )
+    
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=DEFAULT_PER_HOST,
+        help=f"单个主机的最大并发连接数（默认: {DEFAULT_PER_HOST}）"
+    )
+    
+    parser.add_argument(
+        "--budget",
+        type=parse_size,
+        default=None,
+        help="壁纸总体积预算（含已有文件），如 40MB；下载前用 HEAD 探测大小挑选候选"
+    )
+    
+    parser.add_argument(
+        "--topic-budget",
+        type=parse_size,
+        default=None,
+        help="单个主题目录的体积预算（含已有文件），如 10MB"
+    )
+    
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="只搜索并打印下载计划，不下载任何文件"
+    )
+    
+    parser.add_argument(
+        "--phash-threshold",
+        type=int,
+        default=preview_dedup.DEFAULT_THRESHOLD,
+        help=f"预览图感知哈希的汉明距离阈值，不超过即视为重复（默认: {preview_dedup.DEFAULT_THRESHOLD}）"
+    )
+    
+    parser.add_argument(
+        "--no-phash",
+        action="store_true",
+        help="关闭基于预览图的跨平台近似重复检测"
+    )
+    
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="下载后缩放到目标机型并重新编码（Pexels/Pixabay 原图通常远大于屏幕）"
+    )
+    
+    parser.add_argument(
+        "--format",
+        choices=sorted(image_postprocess.OUTPUT_FORMATS),
+        default=image_postprocess.DEFAULT_FORMAT,
+        help=f"后处理输出格式（默认: {image_postprocess.DEFAULT_FORMAT}）"
+    )
+    
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=image_postprocess.DEFAULT_QUALITY,
+        help=f"后处理编码质量 1-100（默认: {image_postprocess.DEFAULT_QUALITY}）"
+    )
+    
+    parser.add_argument(
+        "--no-variants",
+        action="store_true",
+        help="不生成网格/预览用的多分辨率变体（默认为新增或更新的壁纸生成 400/800px 小图）"
+    )
+    
+    run_metrics.add_arguments(parser)
+    
     parser.add_argument(
         "--unsplash-key",
         type=str,
@@ -439,6 +704,7 @@ API Key 配置:
     print(f"🌐 使用平台: {', '.join(platforms)}")
     print(f"📊 每个关键词下载: {args.count} 张")
     print(f"📂 保存路径: {args.dir}")
+    print(f"⚡ 并发下载: {args.workers} 线程（单主机 ≤ {args.per_host}）")
     print("=" * 60)
     
     # 检查 API Keys
@@ -469,28 +735,95 @@ API Key 配置:
     
     print(f"\n✅ 已激活平台: {', '.join(active_platforms)}\n")
     
-    # 开始下载
-    for query in queries:
-        query_dir = os.path.join(args.dir, query.replace(" ", "_"))
-        
+    # 分阶段指标（--metrics / --prom / --profile-dir 开启）
+    metrics = run_metrics.configure_from_args("fetch_wallpapers", args)
+    
+    # 共享连接池，大小与下载并发数匹配
+    configure_pool(args.workers)
+    
+    # 搜索结果缓存（所有平台共用）
+    cache = configure_cache(ttl=args.cache_ttl * 3600, refresh=args.refresh)
+    
+    # 增量游标：下载结果确定后才更新，dry run 不更新
+    cursors = configure_cursors(enabled=not args.full_scan)
+    
+    # 打开共享去重库，导入仓库中的 download_history.tsv 与尚存的旧 _downloaded.txt
+    store = get_store(args.db)
+    migrated = store.import_legacy(args.dir)
+    if migrated["history"] or migrated["urls"] or migrated["files"]:
+        print(f"📦 去重库已导入 {migrated['history'] + migrated['urls']} 条记录，索引 {migrated['files']} 个已有文件")
+    
+    engine = DownloadEngine(max_workers=args.workers, per_host=args.per_host)
+    if not args.no_phash:
+        backfilled = preview_dedup.backfill_store(store)
+        if backfilled:
+            print(f"🧬 已为 {backfilled} 张已有壁纸补算感知哈希")
+    options = dict(optimize=args.optimize, fmt=args.format, quality=args.quality,
+                   variants=not args.no_variants, search_workers=args.workers)
+    
+    downloaders = make_downloaders(queries, active_platforms, args.dir, engine)
+    if args.budget is None and args.topic_budget is None and not args.dry_run:
+        # 流水线：搜索、预览图去重、下载、校验与后处理同时进行，不必等全部搜索完成
+        preview_filter = None
+        if not args.no_phash and preview_dedup.AVAILABLE:
+            preview_filter = preview_dedup.PreviewFilter(store, get_session(), engine, args.phash_threshold)
         print(f"\n{'=' * 60}")
-        print(f"📥 开始下载主题: {query}")
+        print(f"📥 边搜索边下载：{len(downloaders)} 个组合（{len(queries)} 个关键词 × {len(active_platforms)} 个平台）")
         print(f"{'=' * 60}")
+        stats = run_pipeline(list(downloaders.items()), engine, store, count=args.count,
+                             preview_filter=preview_filter, **options)
+    else:
+        # 体积预算与 dry run 需要先拿到完整的候选列表
+        plan = search_all(downloaders, args.count, args.workers)
         
-        if "unsplash" in active_platforms:
-            downloader = UnsplashDownloader(API_KEYS["unsplash"], query_dir)
-            downloader.download_wallpapers(query, args.count)
+        # 近似重复检测：用预览图的感知哈希剔除与已有素材相似的候选
+        if not args.no_phash:
+            plan = preview_dedup.filter_plan(plan, store, get_session(), engine,
+                                             args.phash_threshold, args.workers)
         
-        if "pexels" in active_platforms:
-            downloader = PexelsDownloader(API_KEYS["pexels"], query_dir)
-            downloader.download_wallpapers(query, args.count)
+        # 体积预算：HEAD 探测大小，只保留预算内的候选
+        plan = plan_with_budget(plan, get_session(), engine, args.budget, args.topic_budget,
+                                args.dir, args.workers)
         
-        if "pixabay" in active_platforms:
-            downloader = PixabayDownloader(API_KEYS["pixabay"], query_dir)
-            downloader.download_wallpapers(query, args.count)
-    
-    # 更新 pubspec.yaml
-    update_pubspec_assets(args.pubspec, args.dir)
+        if args.dry_run:
+            print_plan(plan)
+            print("\n🧪 dry run：未下载任何文件")
+            store.close()
+            run_metrics.print_summary(metrics.close())
+            return
+        
+        print(f"\n{'=' * 60}")
+        print(f"📥 开始下载：共 {len(plan)} 张")
+        print(f"{'=' * 60}")
+        stats = run_pipeline(plan, engine, store, **options)
+    engine.close()
+    for (query, _), downloader in downloaders.items():
+        downloader.update_cursor(query)
+    cursors.save()
+    if cache.hits:
+        print(f"💾 搜索缓存命中 {cache.hits} 次（--refresh 可强制刷新）")
+    if cursors.skipped:
+        print(f"⏭️  {cursors.skipped} 个搜索跳过了之前已处理过的结果（--full-scan 可从头翻阅）")
+    print(f"\n📊 成功下载 {stats['commit']['out']}/{stats['download']['in']} 张")
+    print_stats(stats)
+    
+    # 变体补齐：流水线只处理本次新下载的壁纸，这里补上其余新增或更新的原图并清理过期变体
+    if not args.no_variants:
+        image_variants.generate_variants(args.dir)
+    
+    # 下载记录导出到仓库（download_history.tsv），提交后其他环境也能共享去重
+    if store.export_history():
+        print("📝 下载记录已更新：download_history.tsv（请随素材一起提交）")
+    store.close()
+    close_sessions()
+    
+    # 素材目录：App 启动时直接读取，无需扫描 AssetManifest
+    catalog.write_catalog(image_root=args.dir)
+    
+    # 更新 pubspec.yaml（资源列表无变化时不改写）
+    project_dir = os.path.dirname(os.path.abspath(args.pubspec))
+    update_pubspec(args.pubspec, roots=asset_roots(args.dir, project_dir=project_dir))
+    run_metrics.print_summary(metrics.close())
     
     print("\n" + "=" * 60)
     print("🎉 所有壁纸下载完成！")
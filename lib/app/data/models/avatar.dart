@@ -1,9 +1,21 @@
 // 头像数据模型
 class Avatar {
   final String path;
-  Avatar({required this.path});
+  final String? blurhash; // BlurHash 占位
+  final int? color; // 主色（ARGB），图片解码前作为占位背景
+  Avatar({required this.path, this.blurhash, this.color});
 
   factory Avatar.fromJson(Map<String, dynamic> json) =>
       Avatar(path: json['path'] as String);
   Map<String, dynamic> toJson() => {'path': path};
+
+  /// 从素材目录（assets/catalog.json）的条目创建
+  factory Avatar.fromCatalog(Map<String, dynamic> json) {
+    final hex = json['color'] as String?;
+    return Avatar(
+      path: json['path'] as String,
+      blurhash: json['blurhash'] as String?,
+      color: hex == null ? null : int.parse(hex.substring(1), radix: 16) | 0xFF000000,
+    );
+  }
 }
@@ -11,6 +11,14 @@ class Wallpaper {
   final String name; // 文件名
   final int? width;
   final int? height;
+  final int? bytes; // 文件大小
+  final double? duration; // 视频时长（秒）
+  final String? thumbnailPath; // 视频缩略图
+  final String? blurhash; // BlurHash 占位
+  final int? color; // 主色（ARGB），图片解码前作为占位背景
+
+  /// 多分辨率变体：宽度 -> assets 路径（由 tools/image_variants.py 生成）
+  final Map<int, String> variants;
   bool isFavorite;
 
   Wallpaper({
@@ -19,8 +27,44 @@ class Wallpaper {
     required this.name,
     this.width,
     this.height,
+    this.bytes,
+    this.duration,
+    this.thumbnailPath,
+    this.blurhash,
+    this.color,
+    Map<int, String>? variants,
     this.isFavorite = false,
-  });
+  }) : variants = variants ?? {};
+
+  /// 从素材目录（assets/catalog.json）的条目创建
+  factory Wallpaper.fromCatalog(Map<String, dynamic> json) {
+    final variants = (json['variants'] as Map<String, dynamic>?) ?? const {};
+    final hex = json['color'] as String?;
+    return Wallpaper(
+      path: json['path'] as String,
+      topic: json['topic'] as String,
+      name: json['name'] as String,
+      width: json['width'] as int?,
+      height: json['height'] as int?,
+      bytes: json['bytes'] as int?,
+      duration: (json['duration'] as num?)?.toDouble(),
+      thumbnailPath: json['thumbnail'] as String?,
+      blurhash: json['blurhash'] as String?,
+      color: hex == null ? null : int.parse(hex.substring(1), radix: 16) | 0xFF000000,
+      variants: variants.map((w, p) => MapEntry(int.parse(w), p as String)),
+    );
+  }
+
+  /// 宽高比（宽 / 高），未知时为 null
+  double? get aspectRatio =>
+      (width != null && height != null && height! > 0) ? width! / height! : null;
+
+  /// 选择不小于目标解码宽度的最小变体，没有合适的变体时使用原图
+  String pathForWidth(int? targetWidth) {
+    if (targetWidth == null || variants.isEmpty) return path;
+    final widths = variants.keys.where((w) => w >= targetWidth).toList()..sort();
+    return widths.isEmpty ? path : variants[widths.first]!;
+  }
 
   /// 根据文件扩展名判断媒体类型
   MediaType get mediaType {
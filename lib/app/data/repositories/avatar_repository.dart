@@ -14,8 +14,33 @@ class AvatarRepository {
 
   List<String> _avatarPaths = [];
 
-  /// 递归读取 assets/images/avatars 目录所有图片文件
+  /// 读取头像：优先使用素材目录（含占位主色），否则扫描 AssetManifest.json
   Future<List<Avatar>> loadAvatars() async {
+    final fromCatalog = await _loadCatalog();
+    if (fromCatalog != null && fromCatalog.isNotEmpty) {
+      _avatarPaths = fromCatalog.map((a) => a.path).toList();
+      _logger.i('从素材目录读取到 ${fromCatalog.length} 个头像。');
+      return fromCatalog;
+    }
+    return _scanManifest();
+  }
+
+  /// 读取 tools/catalog.py 生成的素材目录，不存在或格式不符时返回 null
+  Future<List<Avatar>?> _loadCatalog() async {
+    try {
+      final catalogJson = await rootBundle.loadString('assets/catalog.json');
+      final Map<String, dynamic> catalog = jsonDecode(catalogJson);
+      if (catalog['version'] != 1) return null;
+      return ((catalog['avatars'] as List?) ?? const [])
+          .map((e) => Avatar.fromCatalog(e as Map<String, dynamic>))
+          .toList();
+    } catch (_) {
+      return null;
+    }
+  }
+
+  /// 递归读取 assets/images/avatars 目录所有图片文件
+  Future<List<Avatar>> _scanManifest() async {
     _logger.i('正在加载 AssetManifest.json...');
     final manifestContent = await rootBundle.loadString('AssetManifest.json');
     final Map<String, dynamic> manifestMap = jsonDecode(manifestContent);
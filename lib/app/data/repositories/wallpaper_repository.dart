@@ -6,25 +6,95 @@ class WallpaperRepository {
   static const String imageDirParent = 'assets/images/wallpapers/';
   static const String videoDirParent = 'assets/videos/';
 
+  // 图片壁纸格式，须与 tools/image_postprocess.py 的 WALLPAPER_EXT 一致（素材目录按它生成）
+  static const List<String> imageExtensions = ['.jpg', '.jpeg', '.png', '.webp', '.gif'];
+
+  // 变体命名：<主题>/variants/<原文件名（含扩展名）>_w<宽度>.<ext>，与 tools/image_variants.py 一致
+  static final RegExp _variantPattern = RegExp(r'^(.*)/variants/(.+)_w(\d+)\.\w+$');
+
+  static const String catalogPath = 'assets/catalog.json';
+
   Future<List<Wallpaper>> loadWallpapers() async {
+    // 优先使用预先生成的素材目录（含宽高等元数据），再与 AssetManifest 对齐：
+    // 抓取后忘了重新生成 catalog.json 时，新素材照常显示，已删除的素材不会留下空白格
+    final fromCatalog = await _loadCatalog();
+    if (fromCatalog == null) return _scanManifest();
+
+    final List<Wallpaper> scanned;
+    try {
+      scanned = await _scanManifest();
+    } catch (_) {
+      return fromCatalog; // 读不到清单时以素材目录为准
+    }
+    if (scanned.isEmpty) return fromCatalog;
+
+    final bundled = {for (final item in scanned) item.path};
+    final items = fromCatalog.where((item) => bundled.contains(item.path)).toList();
+    final cataloged = {for (final item in items) item.path};
+    final missing = scanned.where((item) => !cataloged.contains(item.path)).toList();
+    if (missing.isEmpty && items.length == fromCatalog.length) return items;
+
+    items.addAll(missing);
+    _sort(items);
+    return items;
+  }
+
+  // 简单排序：按主题、文件名（与 tools/catalog.py 一致）
+  static void _sort(List<Wallpaper> items) {
+    items.sort((a, b) {
+      final t = a.topic.compareTo(b.topic);
+      if (t != 0) return t;
+      return a.name.compareTo(b.name);
+    });
+  }
+
+  /// 读取 tools/catalog.py 生成的素材目录，不存在或格式不符时返回 null
+  Future<List<Wallpaper>?> _loadCatalog() async {
+    try {
+      final catalogJson = await rootBundle.loadString(catalogPath);
+      final Map<String, dynamic> catalog = json.decode(catalogJson);
+      if (catalog['version'] != 1) return null;
+      return (catalog['items'] as List)
+          .map((e) => Wallpaper.fromCatalog(e as Map<String, dynamic>))
+          .toList();
+    } catch (_) {
+      return null;
+    }
+  }
+
+  /// 扫描 AssetManifest.json（没有素材目录时的回退方案，也用于补齐目录中缺少的素材）
+  Future<List<Wallpaper>> _scanManifest() async {
     final manifestJson = await rootBundle.loadString('AssetManifest.json');
     final Map<String, dynamic> manifestMap = json.decode(manifestJson);
 
     final List<Wallpaper> items = [];
 
+    // 先收集变体：原图路径 -> {宽度: 变体路径}
+    final Map<String, Map<int, String>> variantsBySource = {};
+    for (final assetPath in manifestMap.keys) {
+      if (!assetPath.startsWith(imageDirParent)) continue;
+      final match = _variantPattern.firstMatch(assetPath);
+      if (match == null) continue;
+      final source = '${match.group(1)}/${match.group(2)}';
+      variantsBySource.putIfAbsent(source, () => {})[int.parse(match.group(3)!)] =
+          assetPath;
+    }
+
     manifestMap.forEach((assetPath, meta) {
-      // 检查是否为图片壁纸
+      // 检查是否为图片壁纸（排除变体）
       if (assetPath.startsWith(imageDirParent) &&
-          (assetPath.endsWith('.jpg') ||
-              assetPath.endsWith('.jpeg') ||
-              assetPath.endsWith('.png') ||
-              assetPath.endsWith('.webp') ||
-              assetPath.endsWith('.gif'))) {
+          !assetPath.contains('/variants/') &&
+          imageExtensions.any(assetPath.endsWith)) {
         final segments = assetPath.replaceFirst(imageDirParent, '').split('/');
         if (segments.length >= 2) {
           final topic = segments[0];
           final name = segments.last;
-          items.add(Wallpaper(path: assetPath, topic: topic, name: name));
+          items.add(Wallpaper(
+            path: assetPath,
+            topic: topic,
+            name: name,
+            variants: variantsBySource[assetPath],
+          ));
         }
       }
 
@@ -41,13 +111,7 @@ class WallpaperRepository {
       }
     });
 
-    // 简单排序：按主题、文件名
-    items.sort((a, b) {
-      final t = a.topic.compareTo(b.topic);
-      if (t != 0) return t;
-      return a.name.compareTo(b.name);
-    });
-
+    _sort(items);
     return items;
   }
 }
@@ -175,6 +175,10 @@ class FavoritesView extends GetView<FavoritesController> {
         ),
         delegate: SliverChildBuilderDelegate((context, index) {
           final item = controller.favoriteWallpapers[index];
+          final cacheWidth = (MediaQuery.of(context).size.width *
+                  0.5 *
+                  MediaQuery.of(context).devicePixelRatio)
+              .round();
 
           return GestureDetector(
             onTap: () {
@@ -187,14 +191,10 @@ class FavoritesView extends GetView<FavoritesController> {
                 fit: StackFit.expand,
                 children: [
                   MediaViewer(
-                    path: item.path,
+                    path: item.pathForWidth(cacheWidth),
                     mediaType: item.mediaType,
                     fit: BoxFit.cover,
-                    cacheWidth:
-                        (MediaQuery.of(context).size.width *
-                                0.5 *
-                                MediaQuery.of(context).devicePixelRatio)
-                            .round(),
+                    cacheWidth: cacheWidth,
                   ),
 
                   // 删除按钮
@@ -5,6 +5,7 @@ import 'package:flutter_animate/flutter_animate.dart';
 import '../controllers/recommend_controller.dart';
 import '../../../widgets/wallpaper_masonry.dart';
 import '../../../widgets/media_viewer.dart';
+import '../../../widgets/blurhash_placeholder.dart';
 import '../../../data/models/wallpaper.dart';
 import '../../../services/theme_service.dart';
 import '../../../routes/app_routes.dart';
@@ -82,7 +83,10 @@ class RecommendView extends GetView<RecommendController> {
                       tileBuilder: (c, i) {
                         final item = controller.wallpapers[i];
                         final tag = 'wallpaper_${item.path}';
-                        final aspect = i == 0 ? (3 / 2) : (3 / 4);
+                        // 素材目录提供了宽高时按实际比例布局（限制在合理范围内）
+                        final aspect = i == 0
+                            ? (3 / 2)
+                            : (item.aspectRatio ?? 3 / 4).clamp(9 / 16, 4 / 3).toDouble();
                         final mq = MediaQuery.of(c);
                         const padding = 16.0, spacing = 12.0, columns = 2;
                         final colW =
@@ -90,11 +94,16 @@ class RecommendView extends GetView<RecommendController> {
                         final cacheWidth = (colW * mq.devicePixelRatio).round();
                         return WallpaperCard(
                           tag: tag,
-                          image: MediaViewer(
-                            path: item.path,
-                            mediaType: item.mediaType,
-                            fit: BoxFit.cover,
-                            cacheWidth: cacheWidth,
+                          // BlurHash / 主色占位：图片解码完成前不再是空白
+                          image: BlurHashPlaceholder(
+                            hash: item.blurhash,
+                            color: item.color,
+                            child: MediaViewer(
+                              path: item.pathForWidth(cacheWidth),
+                              mediaType: item.mediaType,
+                              fit: BoxFit.cover,
+                              cacheWidth: cacheWidth,
+                            ),
                           ),
                           isFavorite: item.isFavorite,
                           onTap: () {
@@ -154,6 +163,8 @@ class RecommendView extends GetView<RecommendController> {
                         final avatar = controller.avatars[i];
                         return _AvatarCard(
                           path: avatar.path,
+                          placeholderHash: avatar.blurhash,
+                          placeholderColor: avatar.color,
                           onTap: () {
                             HapticFeedback.mediumImpact();
                             _openAvatarPreview(context, i);
@@ -325,8 +336,15 @@ class _CategoryHeaderDelegate extends SliverPersistentHeaderDelegate {
 }
 
 class _AvatarCard extends StatelessWidget {
-  const _AvatarCard({required this.path, required this.onTap});
+  const _AvatarCard({
+    required this.path,
+    required this.onTap,
+    this.placeholderHash,
+    this.placeholderColor,
+  });
   final String path;
+  final String? placeholderHash; // 素材目录提供的 BlurHash
+  final int? placeholderColor; // 素材目录提供的主色
   final VoidCallback onTap;
 
   @override
@@ -360,7 +378,10 @@ class _AvatarCard extends StatelessWidget {
               loadStateChanged: (state) {
                 if (state.extendedImageLoadState == LoadState.failed ||
                     state.extendedImageLoadState == LoadState.loading) {
-                  return Container(color: CupertinoColors.black);
+                  return BlurHashPlaceholder(
+                    hash: placeholderHash,
+                    color: placeholderColor ?? CupertinoColors.black.value,
+                  );
                 }
                 return null;
               },
@@ -0,0 +1,194 @@
+import 'dart:async';
+import 'dart:math' as math;
+import 'dart:typed_data';
+import 'dart:ui' as ui;
+import 'package:flutter/widgets.dart';
+
+/// BlurHash 占位（tools/placeholders.py 生成）
+/// 把 BlurHash 解码成 32×32 的小图，按容器大小平滑拉伸；解码完成前或没有 BlurHash 时显示主色
+class BlurHashPlaceholder extends StatefulWidget {
+  const BlurHashPlaceholder({
+    super.key,
+    this.hash,
+    this.color,
+    this.child,
+  });
+
+  final String? hash;
+  final int? color; // 主色（ARGB）
+  final Widget? child; // 叠在占位之上的内容（如图片），加载完成后自然覆盖占位
+
+  @override
+  State<BlurHashPlaceholder> createState() => _BlurHashPlaceholderState();
+}
+
+class _BlurHashPlaceholderState extends State<BlurHashPlaceholder> {
+  ui.Image? _image;
+
+  @override
+  void initState() {
+    super.initState();
+    _load();
+  }
+
+  @override
+  void didUpdateWidget(covariant BlurHashPlaceholder oldWidget) {
+    super.didUpdateWidget(oldWidget);
+    if (oldWidget.hash != widget.hash) {
+      _image = null;
+      _load();
+    }
+  }
+
+  void _load() {
+    final hash = widget.hash;
+    if (hash == null) return;
+    final cached = BlurHashCache.get(hash);
+    if (cached != null) {
+      _image = cached;
+      return;
+    }
+    BlurHashCache.load(hash).then((image) {
+      if (mounted && widget.hash == hash) setState(() => _image = image);
+    });
+  }
+
+  @override
+  Widget build(BuildContext context) {
+    final background = _image != null
+        ? RawImage(
+            image: _image,
+            fit: BoxFit.fill,
+            filterQuality: FilterQuality.low,
+          )
+        : ColoredBox(color: Color(widget.color ?? 0x00000000));
+    if (widget.child == null) return SizedBox.expand(child: background);
+    return Stack(
+      fit: StackFit.expand,
+      children: [background, widget.child!],
+    );
+  }
+}
+
+/// 解码后的 BlurHash 小图缓存（同一张图在网格与预览之间复用）
+class BlurHashCache {
+  static const int size = 32;
+  static const int _capacity = 256;
+  static final Map<String, ui.Image> _images = {};
+  static final Map<String, Future<ui.Image?>> _pending = {};
+
+  static ui.Image? get(String hash) => _images[hash];
+
+  static Future<ui.Image?> load(String hash) {
+    return _pending.putIfAbsent(hash, () async {
+      try {
+        final pixels = decodeBlurHash(hash, size, size);
+        if (pixels == null) return null;
+        final image = await _toImage(pixels, size, size);
+        if (_images.length >= _capacity) _images.remove(_images.keys.first);
+        _images[hash] = image;
+        return image;
+      } finally {
+        _pending.remove(hash);
+      }
+    });
+  }
+
+  static Future<ui.Image> _toImage(Uint8List pixels, int width, int height) {
+    final completer = Completer<ui.Image>();
+    ui.decodeImageFromPixels(
+      pixels,
+      width,
+      height,
+      ui.PixelFormat.rgba8888,
+      completer.complete,
+    );
+    return completer.future;
+  }
+}
+
+const String _base83 =
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#\$%*+,-.:;=?@[]^_{|}~';
+
+int _decode83(String value) {
+  var result = 0;
+  for (final unit in value.codeUnits) {
+    final digit = _base83.indexOf(String.fromCharCode(unit));
+    if (digit < 0) throw const FormatException('invalid BlurHash character');
+    result = result * 83 + digit;
+  }
+  return result;
+}
+
+double _srgbToLinear(int value) {
+  final v = value / 255;
+  return v <= 0.04045 ? v / 12.92 : math.pow((v + 0.055) / 1.055, 2.4).toDouble();
+}
+
+int _linearToSrgb(double value) {
+  final v = value.clamp(0.0, 1.0);
+  if (v <= 0.0031308) return (v * 12.92 * 255 + 0.5).toInt();
+  return ((1.055 * math.pow(v, 1 / 2.4) - 0.055) * 255 + 0.5).toInt();
+}
+
+double _signPow(double value, double exp) =>
+    (value < 0 ? -1 : 1) * math.pow(value.abs(), exp).toDouble();
+
+/// 把 BlurHash 解码为 width × height 的 RGBA 像素，格式不正确时返回 null
+Uint8List? decodeBlurHash(String hash, int width, int height) {
+  try {
+    if (hash.length < 6) return null;
+    final sizeFlag = _decode83(hash[0]);
+    final numY = sizeFlag ~/ 9 + 1;
+    final numX = sizeFlag % 9 + 1;
+    if (hash.length != 4 + 2 * numX * numY) return null;
+    final maxValue = (_decode83(hash[1]) + 1) / 166;
+
+    final colors = List<List<double>>.generate(numX * numY, (i) {
+      if (i == 0) {
+        final value = _decode83(hash.substring(2, 6));
+        return [
+          _srgbToLinear(value >> 16),
+          _srgbToLinear((value >> 8) & 255),
+          _srgbToLinear(value & 255),
+        ];
+      }
+      final value = _decode83(hash.substring(4 + i * 2, 6 + i * 2));
+      return [
+        _signPow((value ~/ (19 * 19) - 9) / 9, 2) * maxValue,
+        _signPow(((value ~/ 19) % 19 - 9) / 9, 2) * maxValue,
+        _signPow((value % 19 - 9) / 9, 2) * maxValue,
+      ];
+    });
+
+    // 预先算好余弦基，避免在像素循环里重复计算
+    final cosX = List.generate(
+        numX, (i) => List.generate(width, (x) => math.cos(math.pi * i * x / width)));
+    final cosY = List.generate(
+        numY, (j) => List.generate(height, (y) => math.cos(math.pi * j * y / height)));
+
+    final pixels = Uint8List(width * height * 4);
+    var offset = 0;
+    for (var y = 0; y < height; y++) {
+      for (var x = 0; x < width; x++) {
+        var r = 0.0, g = 0.0, b = 0.0;
+        for (var j = 0; j < numY; j++) {
+          for (var i = 0; i < numX; i++) {
+            final basis = cosX[i][x] * cosY[j][y];
+            final color = colors[i + j * numX];
+            r += color[0] * basis;
+            g += color[1] * basis;
+            b += color[2] * basis;
+          }
+        }
+        pixels[offset++] = _linearToSrgb(r);
+        pixels[offset++] = _linearToSrgb(g);
+        pixels[offset++] = _linearToSrgb(b);
+        pixels[offset++] = 255;
+      }
+    }
+    return pixels;
+  } on FormatException {
+    return null;
+  }
+}
@@ -0,0 +1,8 @@
+"""
+壁纸/视频抓取脚本共用的工具模块
+"""
+
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(REPO_ROOT, ".fetch_cache")  # 本地缓存目录（不入库、不打包）
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+壁纸素材目录（assets/catalog.json）
+汇总所有图片/视频壁纸的主题、宽高、字节数、时长、缩略图与多分辨率变体路径，
+以及壁纸、头像、视频缩略图的 BlurHash 与主色占位信息（见 tools.placeholders），
+按 App 的排序方式（主题、文件名）预先排好，App 启动时读取这一个小文件即可完成布局，
+不再解析整个 AssetManifest.json
+宽高等元数据按 大小 + mtime 缓存在 .fetch_cache/catalog_meta.json，只为新增或变化的文件读取
+
+用法:
+  python -m tools.catalog
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+from tools import CACHE_DIR, REPO_ROOT
+from tools.image_postprocess import WALLPAPER_EXT, find_images
+from tools.image_variants import VARIANT_WIDTHS, variant_path
+from tools.placeholders import compute_placeholders
+from tools.run_metrics import get_metrics
+from tools.video_thumbnails import find_videos, has_ffmpeg, thumbnail_path
+from tools.video_transcode import probe
+
+try:
+    from PIL import Image
+    AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    Image = None
+    AVAILABLE = False
+
+CATALOG_VERSION = 1
+DEFAULT_CATALOG_PATH = os.path.join(REPO_ROOT, "assets", "catalog.json")
+DEFAULT_META_CACHE = os.path.join(CACHE_DIR, "catalog_meta.json")
+IMAGE_ROOT = os.path.join(REPO_ROOT, "assets", "images", "wallpapers")
+VIDEO_ROOT = os.path.join(REPO_ROOT, "assets", "videos")
+AVATAR_ROOT = os.path.join(REPO_ROOT, "assets", "images", "avatars")
+
+_DURATION_RE = re.compile(r"_(\d+)s\.\w+$")
+
+
+def asset_path(path: str) -> str:
+    """文件路径转为 Flutter assets 路径（相对项目根目录，使用 /）"""
+    return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace(os.sep, "/")
+
+
+def _image_meta(path: str) -> Dict:
+    """只读文件头获取显示宽高（考虑 EXIF 方向）"""
+    if not AVAILABLE:
+        return {}
+    with Image.open(path) as img:
+        rotated = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        width, height = (img.height, img.width) if rotated else (img.width, img.height)
+    return {"width": width, "height": height}
+
+
+def _video_meta(path: str) -> Dict:
+    """ffprobe 读取宽高与时长；没有 ffprobe 时从文件名中的 _<秒>s 解析时长"""
+    info = probe(path) if has_ffmpeg(probe=True) else None
+    if info is not None:
+        return {"width": info["width"], "height": info["height"], "duration": round(info["duration"], 2)}
+    match = _DURATION_RE.search(os.path.basename(path))
+    return {"duration": float(match.group(1))} if match else {}
+
+
+class MetaCache:
+    """元数据缓存：assets 路径 -> 大小、mtime 与读取到的元数据"""
+
+    def __init__(self, path: str = DEFAULT_META_CACHE):
+        self.path = path
+        self.dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, path: str, reader) -> Dict:
+        key = asset_path(path)
+        st = os.stat(path)
+        entry = self.entries.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return entry["meta"]
+        try:
+            meta = reader(path)
+        except Exception:
+            meta = {}
+        self.entries[key] = {"size": st.st_size, "mtime": st.st_mtime, "meta": meta}
+        self.dirty = True
+        return meta
+
+    def prune(self, keep: set):
+        stale = [key for key in self.entries if key not in keep]
+        for key in stale:
+            del self.entries[key]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def _topic(path: str, root: str) -> Optional[str]:
+    """主题为根目录下的第一级子目录；直接放在根目录下的文件不属于任何主题"""
+    parts = os.path.relpath(path, root).split(os.sep)
+    return parts[0] if len(parts) >= 2 else None
+
+
+def _entry(path: str, root: str, media_type: str, meta: Dict) -> Optional[Dict]:
+    topic = _topic(path, root)
+    if topic is None:
+        return None
+    entry = {
+        "path": asset_path(path),
+        "topic": topic,
+        "name": os.path.basename(path),
+        "type": media_type,
+        "bytes": os.path.getsize(path),
+    }
+    entry.update({k: v for k, v in meta.items() if v is not None})
+    return entry
+
+
+def build_catalog(image_root: str = IMAGE_ROOT, video_root: str = VIDEO_ROOT,
+                  avatar_root: str = AVATAR_ROOT, meta_cache: MetaCache = None) -> Dict[str, List[Dict]]:
+    """扫描图片、视频与头像目录，返回 {"items": 按（主题, 文件名）排序的壁纸, "avatars": 头像}"""
+    cache = meta_cache or MetaCache()
+    items = []
+    placeholder_sources = {}  # 条目 -> 用于计算占位信息的图片
+
+    if os.path.isdir(image_root):
+        for path in find_images(image_root, WALLPAPER_EXT):
+            entry = _entry(path, image_root, "image", cache.get(path, _image_meta))
+            if entry is None:
+                continue
+            variants = {
+                str(width): asset_path(variant_path(path, width))
+                for width in VARIANT_WIDTHS
+                if os.path.exists(variant_path(path, width))
+            }
+            if variants:
+                entry["variants"] = variants
+            items.append(entry)
+            placeholder_sources[id(entry)] = path
+
+    if os.path.isdir(video_root):
+        for path in find_videos(video_root):
+            entry = _entry(path, video_root, "video", cache.get(path, _video_meta))
+            if entry is None:
+                continue
+            thumb = thumbnail_path(path)
+            if os.path.exists(thumb):
+                entry["thumbnail"] = asset_path(thumb)
+                placeholder_sources[id(entry)] = thumb
+            items.append(entry)
+
+    avatars = []
+    if os.path.isdir(avatar_root):
+        for path in find_images(avatar_root):
+            entry = {"path": asset_path(path)}
+            avatars.append(entry)
+            placeholder_sources[id(entry)] = path
+
+    cache.prune({item["path"] for item in items})
+    cache.save()
+
+    # 占位信息按内容哈希缓存，只有新文件需要解码
+    placeholders = compute_placeholders(sorted(set(placeholder_sources.values())), prune=True)
+    for entry in items + avatars:
+        source = placeholder_sources.get(id(entry))
+        if source in placeholders:
+            entry.update(placeholders[source])
+
+    # 与 WallpaperRepository 的排序一致：主题、文件名
+    items.sort(key=lambda item: (item["topic"], item["name"]))
+    avatars.sort(key=lambda item: item["path"])
+    return {"items": items, "avatars": avatars}
+
+
+def write_catalog(catalog_path: str = DEFAULT_CATALOG_PATH, image_root: str = IMAGE_ROOT,
+                  video_root: str = VIDEO_ROOT, avatar_root: str = AVATAR_ROOT) -> bool:
+    """生成素材目录，内容有变化时才写入，返回是否写入"""
+    with get_metrics().stage("catalog") as stage:
+        catalog = build_catalog(image_root, video_root, avatar_root)
+        payload = json.dumps({"version": CATALOG_VERSION, **catalog},
+                             ensure_ascii=False, separators=(",", ":"))
+        stage.set(items=len(catalog["items"]), bytes=len(payload))
+        written = _write_if_changed(catalog_path, payload)
+        stage.set(written=written)
+    if written:
+        print(f"🗂️  素材目录已更新：{asset_path(catalog_path)}"
+              f"（{len(catalog['items'])} 个壁纸，{len(catalog['avatars'])} 个头像）")
+    return written
+
+
+def stale_paths(catalog_path: str = DEFAULT_CATALOG_PATH, image_root: str = IMAGE_ROOT,
+                video_root: str = VIDEO_ROOT) -> List[str]:
+    """素材目录与磁盘不一致的壁纸（新文件未收录或已删除的文件仍在目录中），目录不存在时返回空"""
+    try:
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            listed = {item["path"] for item in json.load(f).get("items", [])}
+    except (OSError, ValueError):
+        return []
+
+    on_disk = set()
+    if os.path.isdir(image_root):
+        on_disk.update(asset_path(p) for p in find_images(image_root, WALLPAPER_EXT)
+                       if _topic(p, image_root) is not None)
+    if os.path.isdir(video_root):
+        on_disk.update(asset_path(p) for p in find_videos(video_root)
+                       if _topic(p, video_root) is not None)
+    return sorted(listed ^ on_disk)
+
+
+def _write_if_changed(catalog_path: str, payload: str) -> bool:
+    """内容与现有文件相同时不写入（避免触发资源重新打包）"""
+    try:
+        with open(catalog_path, "r", encoding="utf-8") as f:
+            if f.read() == payload:
+                return False
+    except OSError:
+        pass
+
+    os.makedirs(os.path.dirname(catalog_path), exist_ok=True)
+    tmp_path = catalog_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    os.replace(tmp_path, catalog_path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 App 使用的壁纸素材目录 assets/catalog.json")
+    parser.add_argument("--images", type=str, default=IMAGE_ROOT, help="图片壁纸根目录")
+    parser.add_argument("--videos", type=str, default=VIDEO_ROOT, help="视频壁纸根目录")
+    parser.add_argument("--avatars", type=str, default=AVATAR_ROOT, help="头像根目录")
+    parser.add_argument("--output", "-o", type=str, default=DEFAULT_CATALOG_PATH, help="输出路径")
+    args = parser.parse_args()
+
+    if not write_catalog(args.output, args.images, args.videos, args.avatars):
+        print("🗂️  素材目录无变化")
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+共享去重库
+SQLite（WAL 模式）记录所有已下载的素材，按 平台+ID / URL / 内容哈希 建索引
+替代各目录下的 _downloaded.txt，跨主题目录去重
+数据库本身在 .fetch_cache/ 下不入库；下载记录另外导出为仓库根目录的 download_history.tsv
+（按行排序、内容不变时不改写），随仓库提交，其他克隆与 CI 首次运行时从中导入
+
+用法:
+  # 导入 download_history.tsv 与旧的 _downloaded.txt，为已有文件建立内容哈希索引，并重新导出
+  python -m tools.dedup_store import assets/images/wallpapers assets/videos
+  # 只导出
+  python -m tools.dedup_store export
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from tools import CACHE_DIR, REPO_ROOT
+
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, "dedup.sqlite3")
+DEFAULT_HISTORY_PATH = os.path.join(REPO_ROOT, "download_history.tsv")
+HISTORY_COLUMNS = ("provider", "item_id", "url", "content_hash", "path", "phash")
+LEGACY_FILENAME = "_downloaded.txt"
+MEDIA_EXT = (".jpg", ".jpeg", ".png", ".webp", ".mp4", ".mov")
+DERIVED_DIRS = ("thumbnails", "variants")  # 派生文件目录，不参与去重
+
+# 旧 URL 的域名 -> 平台
+HOST_PLATFORMS = {
+    "unsplash.com": "unsplash",
+    "pexels.com": "pexels",
+    "pixabay.com": "pixabay",
+}
+
+# 下载器生成的文件名：{platform}_{query}_{序号}_{id}.jpg
+_IMAGE_NAME_RE = re.compile(r"^(unsplash|pexels|pixabay)_(.+?)_(\d+)_(.+)\.\w+$")
+# 视频文件名：{query}_{序号}_{id}_{quality}_{时长}s.mp4（目前只有 Pexels）
+_VIDEO_NAME_RE = re.compile(r"^(.+?)_(\d+)_(\d+)_(\w+)_(\d+)s\.\w+$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    item_id TEXT,
+    url TEXT,
+    content_hash TEXT,
+    path TEXT,
+    phash INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_downloads_item
+    ON downloads(provider, item_id) WHERE item_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_downloads_url ON downloads(url);
+CREATE INDEX IF NOT EXISTS idx_downloads_hash ON downloads(content_hash);
+CREATE INDEX IF NOT EXISTS idx_downloads_path ON downloads(path);
+"""
+
+# 旧库升级时补充的列
+_MIGRATIONS = {
+    "phash": "ALTER TABLE downloads ADD COLUMN phash INTEGER",
+}
+
+
+def guess_provider(url: str) -> str:
+    """根据 URL 域名推断平台"""
+    host = urlparse(url).netloc.lower()
+    for suffix, provider in HOST_PLATFORMS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return provider
+    return "unknown"
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rel_path(path: str) -> str:
+    """转换为相对仓库根目录的路径，便于跨机器共享"""
+    return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace("\\", "/")
+
+
+class DedupStore:
+    """线程安全的去重库，写入按批提交"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, batch_size: int = 50):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._inflight = set()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(downloads)")}
+        for column, sql in _MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(sql)
+        self._conn.commit()
+
+    def _one(self, sql: str, params: tuple) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def has_item(self, provider: str, item_id) -> bool:
+        """该平台的素材 ID 是否已下载"""
+        if item_id is None:
+            return False
+        return self._one(
+            "SELECT 1 FROM downloads WHERE provider = ? AND item_id = ? LIMIT 1",
+            (provider, str(item_id)),
+        ) is not None
+
+    def has_url(self, url: str) -> bool:
+        """URL 是否已下载（兼容旧记录）"""
+        return self._one("SELECT 1 FROM downloads WHERE url = ? LIMIT 1", (url,)) is not None
+
+    def find_hash(self, content_hash: str) -> Optional[str]:
+        """按内容哈希查找已有文件，返回其路径"""
+        row = self._one(
+            "SELECT path FROM downloads WHERE content_hash = ? LIMIT 1", (content_hash,)
+        )
+        return row[0] if row else None
+
+    def all_phashes(self) -> List[int]:
+        """所有已记录的感知哈希（有符号 64 位整数）"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT phash FROM downloads WHERE phash IS NOT NULL"
+            )]
+
+    def missing_phash(self, extensions: tuple) -> List[tuple]:
+        """已有文件中尚未计算感知哈希的记录 (rowid, path)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, path FROM downloads WHERE phash IS NULL AND path IS NOT NULL"
+            ).fetchall()
+        return [(rowid, path) for rowid, path in rows if path.lower().endswith(extensions)]
+
+    def set_phash(self, rowid: int, phash: int):
+        with self._lock:
+            self._conn.execute("UPDATE downloads SET phash = ? WHERE id = ?", (phash, rowid))
+            self._pending += 1
+
+    def record(self, provider: str, item_id=None, url: str = None,
+               content_hash: str = None, path: str = None, phash: int = None):
+        """记录一次下载，达到批量大小时自动提交"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO downloads "
+                "(provider, item_id, url, content_hash, path, phash, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (provider, None if item_id is None else str(item_id), url, content_hash,
+                 rel_path(path) if path else None, phash, time.time()),
+            )
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self.flush()
+
+    def claim(self, provider: str, item_id=None, url: str = None) -> bool:
+        """占用一个待下载素材；已下载或正在被其他线程下载时返回 False"""
+        key = (provider, None if item_id is None else str(item_id), url)
+        with self._lock:
+            if key in self._inflight:
+                return False
+            if self.has_item(provider, item_id) or (url and self.has_url(url)):
+                return False
+            self._inflight.add(key)
+            return True
+
+    def release(self, provider: str, item_id=None, url: str = None):
+        """释放 claim 占用的素材"""
+        with self._lock:
+            self._inflight.discard((provider, None if item_id is None else str(item_id), url))
+
+    def record_download(self, provider: str, item_id, url: str, content_hash: str,
+                        path: str, phash: int = None) -> Optional[str]:
+        """
+        记录一次完成的下载
+        若内容哈希已存在则只登记来源（不登记路径），并返回已有文件的路径
+        """
+        with self._lock:
+            existing = self.find_hash(content_hash)
+            self.record(provider, item_id, url, content_hash, None if existing else path, phash)
+            return existing
+
+    def rename_path(self, old_path: str, new_path: str):
+        """文件改名/移动后同步记录中的路径"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE downloads SET path = ? WHERE path = ?", (rel_path(new_path), rel_path(old_path))
+            )
+            self._pending += 1
+
+    def recorded_paths(self) -> List[str]:
+        """所有记录了文件路径的条目（相对仓库根目录）"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT path FROM downloads WHERE path IS NOT NULL"
+            )]
+
+    def detach_path(self, path: str):
+        """文件已被移除：清空记录中的路径，保留 平台+ID / URL 去重（不会重新下载），内容哈希不再指向该文件"""
+        with self._lock:
+            self._conn.execute("UPDATE downloads SET path = NULL WHERE path = ?", (rel_path(path),))
+            self._pending += 1
+
+    def forget_path(self, path: str):
+        """文件损坏被删除后移除其记录，下次运行可以重新下载"""
+        with self._lock:
+            self._conn.execute("DELETE FROM downloads WHERE path = ?", (rel_path(path),))
+            self._pending += 1
+
+    def flush(self):
+        """提交未落盘的写入"""
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    def import_legacy_file(self, txt_path: str, remove: bool = False) -> int:
+        """导入一个 _downloaded.txt；remove 为 True 时导入后删除（记录随 download_history.tsv 保留）"""
+        with open(txt_path, "r") as f:
+            urls = [line.strip() for line in f if line.strip()]
+
+        count = 0
+        with self._lock:
+            for url in urls:
+                if not self.has_url(url):
+                    self.record(guess_provider(url), url=url)
+                    count += 1
+            self.flush()
+
+        if remove:
+            os.remove(txt_path)
+        return count
+
+    def _has_row(self, provider: str, item_id, url: Optional[str], path: Optional[str]) -> bool:
+        if item_id is not None:
+            return self.has_item(provider, item_id)
+        if url:
+            return self.has_url(url)
+        return path is not None and self._one("SELECT 1 FROM downloads WHERE path = ? LIMIT 1", (path,)) is not None
+
+    def import_history(self, history_path: str = DEFAULT_HISTORY_PATH) -> int:
+        """从导出的下载记录中补充本地库没有的条目，返回导入数量"""
+        try:
+            with open(history_path, "r", encoding="utf-8") as f:
+                lines = [line.rstrip("\n") for line in f if line.strip() and not line.startswith("#")]
+        except OSError:
+            return 0
+
+        count = 0
+        with self._lock:
+            for line in lines:
+                values = [value or None for value in line.split("\t")]
+                row = dict(zip(HISTORY_COLUMNS, values + [None] * (len(HISTORY_COLUMNS) - len(values))))
+                if self._has_row(row["provider"], row["item_id"], row["url"], row["path"]):
+                    continue
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO downloads "
+                    "(provider, item_id, url, content_hash, path, phash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (row["provider"], row["item_id"], row["url"], row["content_hash"], row["path"],
+                     int(row["phash"]) if row["phash"] else None, time.time()),
+                )
+                self._pending += 1
+                count += 1
+            self.flush()
+        return count
+
+    def export_history(self, history_path: str = DEFAULT_HISTORY_PATH) -> bool:
+        """把全部下载记录导出为可提交的 TSV（排序稳定），内容有变化时才写入，返回是否写入"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(HISTORY_COLUMNS)} FROM downloads"
+            ).fetchall()
+        lines = sorted("\t".join("" if value is None else str(value) for value in row) for row in rows)
+        payload = "# " + "\t".join(HISTORY_COLUMNS) + "\n" + "".join(line + "\n" for line in lines)
+
+        try:
+            with open(history_path, "r", encoding="utf-8") as f:
+                if f.read() == payload:
+                    return False
+        except OSError:
+            pass
+        tmp_path = history_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, history_path)
+        return True
+
+    def index_existing(self, base_dir: str) -> int:
+        """为目录下已有但未入库的素材文件补充内容哈希"""
+        count = 0
+        for root, dirs, files in os.walk(base_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and d not in DERIVED_DIRS]
+            for fname in files:
+                if not fname.lower().endswith(MEDIA_EXT) or fname.startswith("_"):
+                    continue
+                path = os.path.join(root, fname)
+                if self._one("SELECT 1 FROM downloads WHERE path = ? LIMIT 1", (rel_path(path),)):
+                    continue
+
+                provider, item_id = "unknown", None
+                match = _IMAGE_NAME_RE.match(fname)
+                if match:
+                    provider, item_id = match.group(1), match.group(4)
+                elif fname.lower().endswith((".mp4", ".mov")):
+                    match = _VIDEO_NAME_RE.match(fname)
+                    if match:
+                        provider, item_id = "pexels_video", match.group(3)
+
+                if self.has_item(provider, item_id):
+                    item_id = None
+                self.record(provider, item_id, content_hash=file_sha256(path), path=path)
+                count += 1
+        self.flush()
+        return count
+
+    def import_legacy(self, base_dir: str, history_path: str = DEFAULT_HISTORY_PATH) -> Dict[str, int]:
+        """导入共享的下载记录与目录树下的 _downloaded.txt（不删除文件），并索引已有文件"""
+        history = self.import_history(history_path)
+        urls = 0
+        for root, dirs, files in os.walk(base_dir):
+            if LEGACY_FILENAME in files:
+                urls += self.import_legacy_file(os.path.join(root, LEGACY_FILENAME))
+        return {"history": history, "urls": urls, "files": self.index_existing(base_dir)}
+
+
+_shared: Optional[DedupStore] = None
+_shared_guard = threading.Lock()
+
+
+def get_store(path: str = None) -> DedupStore:
+    """获取进程内共享的去重库（首次调用决定数据库路径）"""
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = DedupStore(path or DEFAULT_DB_PATH)
+        return _shared
+
+
+def main(argv: List[str]):
+    if not argv or argv[0] not in ("import", "export") or (argv[0] == "import" and len(argv) < 2):
+        print("用法: python -m tools.dedup_store import <目录> [<目录> ...]")
+        print("      python -m tools.dedup_store export")
+        sys.exit(1)
+
+    store = get_store()
+    for base_dir in argv[1:]:
+        result = store.import_legacy(base_dir)
+        print(f"✅ {base_dir}: 导入共享记录 {result['history']} 条、旧 URL {result['urls']} 条，"
+              f"索引 {result['files']} 个文件")
+    if store.export_history():
+        print(f"📝 下载记录已导出：{rel_path(DEFAULT_HISTORY_PATH)}")
+    store.close()
+    print(f"📦 去重库: {store.path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,265 @@
+"""
+并发下载引擎
+有界线程池 + 按主机限流 + 汇总进度条
+供 fetch_wallpapers.py 与 fetch_video_wallpapers.py 共用
+"""
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from tqdm import tqdm
+
+from tools import CACHE_DIR
+from tools.run_metrics import record_response
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 4
+DEFAULT_PARTS_DIR = os.path.join(CACHE_DIR, "parts")
+
+# 读缓冲区：从 MIN 开始，连续读满则翻倍，直到 MAX（每个线程复用同一块内存）
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+HASH_READ_CHUNK = 1024 * 1024
+
+_buffers = threading.local()
+
+
+def _read_buffer() -> memoryview:
+    """当前线程复用的读缓冲区"""
+    buf = getattr(_buffers, "buf", None)
+    if buf is None:
+        buf = _buffers.buf = memoryview(bytearray(MAX_CHUNK))
+    return buf
+
+
+def _preallocate(f, size: int):
+    """按 content-length 预分配文件空间，减少碎片与边写边扩展的开销"""
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except (AttributeError, OSError):
+        f.truncate(size)
+
+
+class DownloadEngine:
+    """有界并发下载引擎"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, per_host: int = DEFAULT_PER_HOST,
+                 desc: str = "⬇️  下载中", parts_dir: str = DEFAULT_PARTS_DIR, progress: bool = True):
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.desc = desc
+        self.parts_dir = parts_dir
+        self.progress = progress  # False 时不显示进度条（如基准测试的安静模式）
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_guard = threading.Lock()
+        self._progress_lock = threading.Lock()
+        self._progress = None
+        self.done = 0
+        self.skipped = 0
+
+    @contextmanager
+    def host_slot(self, url: str):
+        """占用目标主机的一个并发名额"""
+        host = urlparse(url).netloc
+        with self._host_guard:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        with slot:
+            yield
+
+    def _bar(self) -> tqdm:
+        if self._progress is None:
+            self._progress = tqdm(
+                total=0,
+                unit='B',
+                unit_scale=True,
+                unit_divisor=1024,
+                desc=self.desc,
+                ascii=True,
+                disable=not self.progress,
+            )
+        return self._progress
+
+    def add_total(self, size: int):
+        """登记一个文件的预期大小"""
+        if size <= 0:
+            return
+        with self._progress_lock:
+            bar = self._bar()
+            bar.total += size
+            bar.refresh()
+
+    def update(self, size: int):
+        """累加已下载字节数"""
+        with self._progress_lock:
+            self._bar().update(size)
+
+    def write(self, message: str):
+        """输出日志，不打断进度条"""
+        with self._progress_lock:
+            tqdm.write(message)
+
+    def _part_paths(self, url: str) -> Tuple[str, str]:
+        """断点续传的临时文件与元数据路径（按 URL 定位，与最终文件名无关）"""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.parts_dir, key + ".part"), os.path.join(self.parts_dir, key + ".json")
+
+    @staticmethod
+    def _validator(meta: Dict) -> Optional[str]:
+        """If-Range 校验值：优先强 ETag，其次 Last-Modified"""
+        etag = meta.get("etag")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return meta.get("last_modified")
+
+    def fetch(self, session, url: str, file_path: str, timeout: int = 30) -> Tuple[int, str]:
+        """
+        流式下载到文件，返回 (最终文件大小, SHA-256)
+        先写入 .part 临时文件，中断后下次用 Range 请求续传（ETag/Last-Modified 校验），
+        完整后原子重命名为目标文件；失败时保留 .part 并抛出异常
+        内容哈希在写入的同时计算，不需要再读一遍文件
+        """
+        os.makedirs(self.parts_dir, exist_ok=True)
+        part_path, meta_path = self._part_paths(url)
+
+        offset = 0
+        headers = {}
+        if os.path.exists(part_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+            validator = self._validator(meta)
+            # 预分配后进程被强制结束时，.part 的大小不代表已写入的字节数，只能从头下载
+            if meta.get("url") == url and validator and not meta.get("preallocated"):
+                offset = os.path.getsize(part_path)
+                headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+
+        with self.host_slot(url):
+            with session.get(url, stream=True, timeout=timeout, headers=headers) as r:
+                record_response(r)
+                if r.status_code == 416:
+                    # 已下载部分超出服务端文件大小，说明文件已变化，稍后从头开始
+                    restart = True
+                else:
+                    restart = False
+                    written, content_hash = self._stream(r, url, file_path, part_path, meta_path, offset)
+
+        if restart:
+            self._discard_part(url)
+            return self.fetch(session, url, file_path, timeout)
+
+        os.replace(part_path, file_path)
+        os.remove(meta_path)
+        return written, content_hash
+
+    @staticmethod
+    def _write_meta(meta_path: str, meta: Dict):
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @staticmethod
+    def _hash_prefix(part_path: str, offset: int):
+        """续传时先把已有部分计入哈希"""
+        digest = hashlib.sha256()
+        buf = _read_buffer()
+        with open(part_path, "rb") as f:
+            left = offset
+            while left > 0:
+                n = f.readinto(buf[:min(left, HASH_READ_CHUNK)])
+                if not n:
+                    break
+                digest.update(buf[:n])
+                left -= n
+        return digest
+
+    def _stream(self, r, url: str, file_path: str, part_path: str, meta_path: str,
+                offset: int) -> Tuple[int, str]:
+        """把响应体写入 .part 文件，返回 (.part 的最终大小, SHA-256)"""
+        r.raise_for_status()
+
+        remaining = int(r.headers.get('content-length', 0))
+        resumed = offset > 0 and r.status_code == 206 and \
+            r.headers.get("content-range", "").startswith(f"bytes {offset}-")
+        meta = {
+            "url": url,
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+        }
+        if not resumed:
+            # 服务端忽略了 Range 或校验值已变化：从头下载并记录新的校验值
+            offset = 0
+            digest = hashlib.sha256()
+        else:
+            self.write(f"↪️  续传 {os.path.basename(file_path)}（已有 {offset / 1024:.0f} KB）")
+            digest = self._hash_prefix(part_path, offset)
+
+        preallocate = remaining > 0 and not r.headers.get("Content-Encoding")
+        self._write_meta(meta_path, dict(meta, preallocated=preallocate))
+
+        self.add_total(remaining)
+        written = 0
+        with open(part_path, "r+b" if resumed else "wb") as f:
+            if preallocate:
+                _preallocate(f, offset + remaining)
+            f.seek(offset)
+            try:
+                written = self._copy_body(r, f, digest)
+            finally:
+                if preallocate:
+                    # 连接中断时截掉预分配但未写入的部分，.part 的大小即为续传位置
+                    f.truncate(f.tell())
+                    self._write_meta(meta_path, meta)
+
+        if remaining and written < remaining:
+            raise IOError(f"连接提前结束：{written}/{remaining} 字节，已保留断点")
+        return offset + written, digest.hexdigest()
+
+    def _copy_body(self, r, f, digest) -> int:
+        """readinto 复用缓冲区读取响应体，同时写文件与计算哈希；缓冲区随吞吐自适应增大"""
+        raw = r.raw
+        raw.decode_content = True  # 与 iter_content 一致：按 Content-Encoding 解压
+        buf = _read_buffer()
+        size = MIN_CHUNK
+        written = 0
+        while True:
+            n = raw.readinto(buf[:size])
+            if not n:
+                break
+            chunk = buf[:n]
+            f.write(chunk)
+            digest.update(chunk)
+            written += n
+            self.update(n)
+            if n == size and size < MAX_CHUNK:
+                size *= 2
+        return written
+
+    def _discard_part(self, url: str):
+        """删除某个 URL 的断点文件"""
+        for path in self._part_paths(url):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def count(self, ok: bool):
+        """登记一个任务的结果（成功 / 跳过或失败），显示在进度条后缀"""
+        with self._progress_lock:
+            if ok:
+                self.done += 1
+            else:
+                self.skipped += 1
+            self._bar().set_postfix(ok=self.done, skip=self.skipped)
+
+    def close(self):
+        """关闭汇总进度条"""
+        with self._progress_lock:
+            if self._progress is not None:
+                self._progress.close()
+                self._progress = None
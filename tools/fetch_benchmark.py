@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+抓取流程基准测试（本地模拟服务，不访问真实平台）
+启动两个本地 HTTP 服务：
+  API  模拟 Unsplash /search/photos、Pexels /v1/search 与 /videos/search、Pixabay /api/ 的响应结构
+  CDN  提供合成的图片/视频字节（支持 HEAD 与 Range）
+两者都可配置延迟、单连接带宽、5xx 错误率与 429 比例；
+按预设场景运行 fetch_wallpapers.py / fetch_video_wallpapers.py 的 搜索 + 下载 流水线，
+报告首个下载开始的时间、文件/秒、MB/秒 与单文件耗时 p50/p99
+合成字节不是有效的图片/视频，校验、后处理、转码与缩略图阶段不参与测试
+下载文件、去重库、搜索缓存与断点文件都写入临时目录，不影响仓库中的素材与 .fetch_cache
+
+用法:
+  python -m tools.fetch_benchmark
+  python -m tools.fetch_benchmark --scenario lossy --workers 16 --output bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+if __package__ in (None, ""):
+    # 直接以脚本运行（python tools/fetch_benchmark.py）时，让 tools 包与抓取脚本可以被导入
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import REPO_ROOT
+from tools.dedup_store import get_store
+from tools.download_engine import DownloadEngine
+from tools.http_cache import configure_cache
+from tools.http_pool import close_sessions, configure_pool
+from tools.rate_limit import PROVIDER_LIMITS, configure_limits
+from tools.search_cursor import configure_cursors
+
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+import fetch_video_wallpapers  # noqa: E402
+import fetch_wallpapers  # noqa: E402
+
+MB = 1024 * 1024
+WRITE_CHUNK = 64 * 1024
+TOTAL_RESULTS = 1000  # 每个关键词在模拟平台上的结果总数
+
+# 场景：延迟（秒）、单连接带宽（字节/秒，0 为不限）、5xx 比例、429 比例、平均文件大小
+SCENARIOS = {
+    "baseline": {
+        "latency": 0.01, "bandwidth": 0, "error_rate": 0.0, "throttle_rate": 0.0,
+        "image_bytes": 1 * MB, "video_bytes": 6 * MB,
+    },
+    "slow-cdn": {
+        "latency": 0.15, "bandwidth": 4 * MB, "error_rate": 0.0, "throttle_rate": 0.0,
+        "image_bytes": 1 * MB, "video_bytes": 6 * MB,
+    },
+    "lossy": {
+        "latency": 0.05, "bandwidth": 8 * MB, "error_rate": 0.05, "throttle_rate": 0.0,
+        "image_bytes": 1 * MB, "video_bytes": 6 * MB,
+    },
+    "throttled": {
+        "latency": 0.05, "bandwidth": 0, "error_rate": 0.0, "throttle_rate": 0.1,
+        "image_bytes": 1 * MB, "video_bytes": 6 * MB,
+    },
+}
+TARGETS = ("wallpapers", "videos")
+
+# 视频清晰度 -> (宽, 高, 相对于 video_bytes 的大小系数)
+VIDEO_RENDITIONS = {
+    "sd": (540, 960, 0.25),
+    "hd": (1080, 1920, 1.0),
+    "uhd": (2160, 3840, 3.0),
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class MockState:
+    """模拟服务的配置、随机源与计数器（API 与 CDN 共用）"""
+
+    def __init__(self, scenario: Dict, seed: int = 0, id_base: int = 0):
+        self.scenario = scenario
+        self.id_base = id_base
+        self.cdn_base = ""
+        self.counters = {"api": 0, "cdn": 0, "errors": 0, "throttled": 0, "bytes": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._blob = random.Random(seed).randbytes(int(scenario["video_bytes"] * 5) + WRITE_CHUNK)
+
+    def count(self, key: str, value: int = 1):
+        with self._lock:
+            self.counters[key] += value
+
+    def roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def body(self, name: str, size: int) -> bytes:
+        """按文件名生成确定的合成内容：不同文件内容不同，内容哈希去重不会误判"""
+        prefix = f"{name}\n".encode("utf-8")
+        return prefix + self._blob[:max(0, size - len(prefix))]
+
+    def file_size(self, name: str, base: int) -> int:
+        """同一文件大小固定，不同文件在 0.5x ~ 1.5x 之间分布"""
+        return int(base * (0.5 + (zlib.crc32(name.encode("utf-8")) % 1000) / 1000))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 保持连接，与真实 CDN 一样复用连接池
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state
+
+    def _send_json(self, data: Dict):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_status(self, status: int, headers: Dict = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _inject_failure(self) -> bool:
+        """按场景配置注入延迟、429 与 5xx，已响应时返回 True"""
+        scenario = self.state.scenario
+        if scenario["latency"]:
+            time.sleep(scenario["latency"])
+        if self.state.roll(scenario["throttle_rate"]):
+            self.state.count("throttled")
+            self._send_status(429, {"Retry-After": "1"})
+            return True
+        if self.state.roll(scenario["error_rate"]):
+            self.state.count("errors")
+            self._send_status(503)
+            return True
+        return False
+
+    def do_HEAD(self):
+        self._handle(head=True)
+
+    def do_GET(self):
+        self._handle(head=False)
+
+    def _handle(self, head: bool):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        role = self.server.role
+        self.state.count(role)
+        if self._inject_failure():
+            return
+        if role == "cdn":
+            self._serve_file(url.path, head)
+            return
+
+        routes = {
+            "/search/photos": self._unsplash,
+            "/v1/search": self._pexels,
+            "/videos/search": self._pexels_videos,
+            "/api/": self._pixabay,
+        }
+        route = routes.get(url.path)
+        if route is None:
+            self._send_status(404)
+            return
+        self._send_json(route(params))
+
+    # ---- API ----
+
+    def _page(self, params: Dict, page_key: str = "page", size_key: str = "per_page"):
+        """当前页条目的 ID（同一关键词结果稳定）；每 5 条有 1 条横屏，用于验证筛选"""
+        page = int(params.get(page_key, 1))
+        per_page = int(params.get(size_key, 10))
+        query = params.get("query") or params.get("q") or ""
+        start = (page - 1) * per_page
+        seed = zlib.crc32(query.encode("utf-8")) % 100000
+        ids = [self.state.id_base + seed * TOTAL_RESULTS + i
+               for i in range(start, min(start + per_page, TOTAL_RESULTS))]
+        return page, per_page, ids
+
+    @staticmethod
+    def _dims(item_id: int):
+        return (1920, 1080) if item_id % 5 == 4 else (1320, 2868)
+
+    def _image_url(self, provider: str, item_id: int) -> str:
+        return f"{self.state.cdn_base}/image/{provider}_{item_id}.jpg"
+
+    def _unsplash(self, params: Dict) -> Dict:
+        page, per_page, ids = self._page(params)
+        results = []
+        for item_id in ids:
+            width, height = self._dims(item_id)
+            results.append({
+                "id": f"u{item_id}",
+                "width": width,
+                "height": height,
+                "urls": {
+                    "raw": self._image_url("unsplash", item_id) + "?ixid=bench",
+                    "small": f"{self.state.cdn_base}/preview/unsplash_{item_id}.jpg",
+                },
+                "user": {"name": "Mock"},
+            })
+        return {"total": TOTAL_RESULTS, "total_pages": -(-TOTAL_RESULTS // per_page), "results": results}
+
+    def _next_page(self, path: str, page: int, per_page: int) -> Optional[str]:
+        return f"{path}?page={page + 1}&per_page={per_page}" if page * per_page < TOTAL_RESULTS else None
+
+    def _pexels(self, params: Dict) -> Dict:
+        page, per_page, ids = self._page(params)
+        photos = []
+        for item_id in ids:
+            width, height = self._dims(item_id)
+            photos.append({
+                "id": item_id,
+                "width": width,
+                "height": height,
+                "photographer": "Mock",
+                "src": {
+                    "original": self._image_url("pexels", item_id),
+                    "large2x": self._image_url("pexels", item_id),
+                    "tiny": f"{self.state.cdn_base}/preview/pexels_{item_id}.jpg",
+                },
+            })
+        data = {"page": page, "per_page": per_page, "total_results": TOTAL_RESULTS, "photos": photos}
+        next_page = self._next_page("/v1/search", page, per_page)
+        if next_page:
+            data["next_page"] = next_page
+        return data
+
+    def _pexels_videos(self, params: Dict) -> Dict:
+        page, per_page, ids = self._page(params)
+        videos = []
+        for item_id in ids:
+            files = [
+                {
+                    "id": item_id * 10 + i,
+                    "quality": quality,
+                    "file_type": "video/mp4",
+                    "width": width,
+                    "height": height,
+                    "link": f"{self.state.cdn_base}/video/{item_id}_{quality}.mp4",
+                }
+                for i, (quality, (width, height, _)) in enumerate(VIDEO_RENDITIONS.items())
+            ]
+            videos.append({"id": item_id, "duration": 10 + item_id % 20,
+                           "user": {"name": "Mock"}, "video_files": files})
+        data = {"page": page, "per_page": per_page, "total_results": TOTAL_RESULTS, "videos": videos}
+        next_page = self._next_page("/videos/search", page, per_page)
+        if next_page:
+            data["next_page"] = next_page
+        return data
+
+    def _pixabay(self, params: Dict) -> Dict:
+        _, _, ids = self._page(params)
+        hits = []
+        for item_id in ids:
+            width, height = self._dims(item_id)
+            hits.append({
+                "id": item_id,
+                "imageWidth": width,
+                "imageHeight": height,
+                "largeImageURL": self._image_url("pixabay", item_id),
+                "previewURL": f"{self.state.cdn_base}/preview/pixabay_{item_id}.jpg",
+                "tags": "mock",
+            })
+        return {"total": TOTAL_RESULTS, "totalHits": TOTAL_RESULTS, "hits": hits}
+
+    # ---- CDN ----
+
+    def _file_size(self, path: str) -> Optional[int]:
+        parts = path.strip("/").split("/")
+        if len(parts) != 2:
+            return None
+        kind, name = parts
+        scenario = self.state.scenario
+        if kind == "image":
+            return self.state.file_size(name, scenario["image_bytes"])
+        if kind == "preview":
+            return 16 * 1024
+        if kind == "video":
+            quality = os.path.splitext(name)[0].rsplit("_", 1)[-1]
+            factor = VIDEO_RENDITIONS.get(quality, (0, 0, 1.0))[2]
+            return self.state.file_size(name, int(scenario["video_bytes"] * factor))
+        return None
+
+    def _serve_file(self, path: str, head: bool):
+        size = self._file_size(path)
+        if size is None:
+            self._send_status(404)
+            return
+
+        etag = f'"{zlib.crc32(path.encode("utf-8")):08x}"'
+        start = 0
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes=") and self.headers.get("If-Range") in (None, etag):
+            start = int(range_header[6:].split("-")[0] or 0)
+            if start >= size:
+                self._send_status(416, {"Content-Range": f"bytes */{size}"})
+                return
+
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "video/mp4" if path.endswith(".mp4") else "image/jpeg")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.end_headers()
+        if head:
+            return
+
+        body = memoryview(self.state.body(path, size))[start:]
+        bandwidth = self.state.scenario["bandwidth"]
+        began = time.perf_counter()
+        sent = 0
+        while sent < len(body):
+            chunk = body[sent:sent + WRITE_CHUNK]
+            self.wfile.write(chunk)
+            sent += len(chunk)
+            if bandwidth:
+                # 单连接限速：发送进度超前于带宽时等待
+                ahead = sent / bandwidth - (time.perf_counter() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+        self.state.count("bytes", sent)
+
+
+class MockServer(ThreadingHTTPServer):
+    """模拟 API 或 CDN 服务（监听 127.0.0.1 的随机端口，在后台线程中运行）"""
+
+    daemon_threads = True
+
+    def __init__(self, role: str, state: MockState):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.role = role
+        self.state = state
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "MockServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TimedEngine(DownloadEngine):
+    """记录每个文件耗时与字节数的下载引擎（耗时包含等待主机并发名额的时间）"""
+
+    def __init__(self, *args, verbose: bool = False, **kwargs):
+        kwargs.setdefault("progress", verbose)  # 安静模式下进度条同样不输出到 stderr
+        super().__init__(*args, **kwargs)
+        self.verbose = verbose
+        self.timings: List[float] = []
+        self.bytes = 0
+        self.failures = 0
+        self.first_fetch = None
+        self._timing_lock = threading.Lock()
+
+    def fetch(self, session, url: str, file_path: str, timeout: int = 30):
+        start = time.perf_counter()
+        with self._timing_lock:
+            if self.first_fetch is None:
+                self.first_fetch = start
+        try:
+            written, content_hash = super().fetch(session, url, file_path, timeout)
+        except Exception:
+            with self._timing_lock:
+                self.failures += 1
+            raise
+        with self._timing_lock:
+            self.timings.append(time.perf_counter() - start)
+            self.bytes += written
+        return written, content_hash
+
+    def write(self, message: str):
+        if self.verbose:
+            super().write(message)
+
+
+@contextlib.contextmanager
+def _pointed_at(api_base: str):
+    """临时把各平台接口地址指向模拟服务，并使用假的 API Key"""
+    patches = [
+        (fetch_wallpapers.UnsplashDownloader, "API_URL", f"{api_base}/search/photos"),
+        (fetch_wallpapers.PexelsDownloader, "API_URL", f"{api_base}/v1/search"),
+        (fetch_wallpapers.PixabayDownloader, "API_URL", f"{api_base}/api/"),
+        (fetch_video_wallpapers.PexelsVideoDownloader, "API_URL", f"{api_base}/videos/search"),
+    ]
+    saved = [(owner, name, getattr(owner, name)) for owner, name, _ in patches]
+    saved_keys = (dict(fetch_wallpapers.API_KEYS), dict(fetch_video_wallpapers.API_KEYS))
+    try:
+        for owner, name, value in patches:
+            setattr(owner, name, value)
+        for keys in (fetch_wallpapers.API_KEYS, fetch_video_wallpapers.API_KEYS):
+            for platform in keys:
+                keys[platform] = "benchmark"
+        yield
+    finally:
+        for owner, name, value in saved:
+            setattr(owner, name, value)
+        fetch_wallpapers.API_KEYS.update(saved_keys[0])
+        fetch_video_wallpapers.API_KEYS.update(saved_keys[1])
+
+
+def _run_wallpapers(work_dir: str, queries: List[str], count: int, engine: TimedEngine, workers: int) -> int:
+    platforms = list(fetch_wallpapers.PLATFORM_DOWNLOADERS)
+    downloaders = fetch_wallpapers.make_downloaders(queries, platforms, work_dir, engine)
+    stats = fetch_wallpapers.run_pipeline(list(downloaders.items()), engine, get_store(), count=count,
+                                          validate=False, variants=False, search_workers=workers)
+    return stats["download"]["out"]
+
+
+def _run_videos(work_dir: str, queries: List[str], count: int, engine: TimedEngine, workers: int) -> int:
+    downloaders = [
+        (query, fetch_video_wallpapers.PexelsVideoDownloader(
+            fetch_video_wallpapers.API_KEYS["pexels"], os.path.join(work_dir, query), engine))
+        for query in queries
+    ]
+    stats = fetch_video_wallpapers.run_pipeline(downloaders, engine, count=count, search_workers=workers)
+    return stats["download"]["out"]
+
+
+RUNNERS = {"wallpapers": _run_wallpapers, "videos": _run_videos}
+
+
+def run_scenario(name: str, target: str, work_dir: str, queries: List[str], count: int,
+                 workers: int, per_host: int, seed: int = 0, id_base: int = 0,
+                 verbose: bool = False) -> Dict:
+    """启动模拟服务并跑一次 搜索 + 下载，返回指标"""
+    scenario = SCENARIOS[name]
+    state = MockState(scenario, seed, id_base)
+    api = MockServer("api", state).start()
+    cdn = MockServer("cdn", state).start()
+    state.cdn_base = cdn.base_url
+
+    target_dir = os.path.join(work_dir, f"{name}-{target}")
+    engine = TimedEngine(max_workers=workers, per_host=per_host, desc=f"⬇️  {name}/{target}",
+                         parts_dir=os.path.join(target_dir, ".parts"), verbose=verbose)
+    configure_pool(workers)
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with _pointed_at(api.base_url), output:
+            start = time.perf_counter()
+            success = RUNNERS[target](target_dir, queries, count, engine, workers)
+            finished = time.perf_counter()
+    finally:
+        engine.close()
+        close_sessions()
+        api.stop()
+        cdn.stop()
+
+    first_fetch = engine.first_fetch or finished
+    download_seconds = max(finished - first_fetch, 1e-9)
+    return {
+        "scenario": name,
+        "target": target,
+        "files": success,
+        "failed": engine.failures,
+        "bytes": engine.bytes,
+        "first_fetch_seconds": round(first_fetch - start, 3),
+        "download_seconds": round(download_seconds, 3),
+        "files_per_second": round(success / download_seconds, 2),
+        "mb_per_second": round(engine.bytes / MB / download_seconds, 2),
+        "p50_seconds": round(percentile(engine.timings, 50), 3),
+        "p99_seconds": round(percentile(engine.timings, 99), 3),
+        "server": dict(state.counters),
+    }
+
+
+# 报告列：(标题, 取值, 宽度, 格式)；表头与数据行共用，文本左对齐、数字右对齐
+REPORT_COLUMNS = [
+    ("场景", lambda r: r["scenario"], 12, ""),
+    ("目标", lambda r: r["target"], 12, ""),
+    ("文件", lambda r: r["files"], 6, "d"),
+    ("失败", lambda r: r["failed"], 6, "d"),
+    ("首个下载 s", lambda r: r["first_fetch_seconds"], 12, ".2f"),
+    ("下载 s", lambda r: r["download_seconds"], 9, ".2f"),
+    ("文件/s", lambda r: r["files_per_second"], 9, ".2f"),
+    ("MB/s", lambda r: r["mb_per_second"], 9, ".2f"),
+    ("p50 s", lambda r: r["p50_seconds"], 8, ".3f"),
+    ("p99 s", lambda r: r["p99_seconds"], 8, ".3f"),
+    ("429", lambda r: r["server"]["throttled"], 6, "d"),
+    ("5xx", lambda r: r["server"]["errors"], 6, "d"),
+]
+
+
+def _cell(text: str, width: int, left: bool) -> str:
+    """按终端显示宽度补齐（中文占两列）"""
+    shown = sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+    pad = " " * max(0, width - shown)
+    return text + pad if left else pad + text
+
+
+def _report_line(cells: List[str]) -> str:
+    return "".join(_cell(text, width, not spec) for text, (_, _, width, spec) in zip(cells, REPORT_COLUMNS))
+
+
+def print_report(results: List[Dict]):
+    total = sum(width for _, _, width, _ in REPORT_COLUMNS)
+    print(f"\n{'=' * total}")
+    print(_report_line([title for title, _, _, _ in REPORT_COLUMNS]))
+    print(f"{'-' * total}")
+    for r in results:
+        print(_report_line([format(get(r), spec) for _, get, _, spec in REPORT_COLUMNS]))
+    print(f"{'=' * total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用本地模拟平台测量壁纸/视频抓取流程的吞吐")
+    parser.add_argument("--scenario", "-s", type=str, default=",".join(SCENARIOS),
+                        help=f"场景，逗号分隔（可选: {', '.join(SCENARIOS)}）")
+    parser.add_argument("--target", "-t", type=str, default=",".join(TARGETS),
+                        help="测试对象，逗号分隔（wallpapers, videos）")
+    parser.add_argument("--query", "-q", type=str, default="nature,city", help="搜索关键词，逗号分隔")
+    parser.add_argument("--count", "-c", type=int, default=10, help="每个关键词的数量（默认: 10）")
+    parser.add_argument("--workers", "-w", type=int, default=8, help="并发下载线程数（默认: 8）")
+    parser.add_argument("--per-host", type=int, default=4, help="单个主机的最大并发连接数（默认: 4）")
+    parser.add_argument("--seed", type=int, default=0, help="错误注入的随机种子")
+    parser.add_argument("--output", "-o", type=str, default=None, help="把结果写入 JSON 文件")
+    parser.add_argument("--verbose", "-v", action="store_true", help="显示抓取脚本自身的输出")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenario.split(",") if s.strip()]
+    targets = [t.strip() for t in args.target.split(",") if t.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS] + [t for t in targets if t not in RUNNERS]
+    if unknown:
+        print(f"❌ 未知的场景/目标：{', '.join(unknown)}")
+        sys.exit(1)
+    queries = [q.strip() for q in args.query.split(",") if q.strip()]
+
+    # 模拟服务没有真实配额：放开令牌桶，只保留 429 退避逻辑
+    configure_limits({provider: (1000.0, 1000) for provider in PROVIDER_LIMITS})
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="fetch-bench-") as work_dir:
+        # 去重库与搜索缓存放在临时目录；每次运行使用不同的 ID 区间，互不去重
+        store = get_store(os.path.join(work_dir, "dedup.sqlite3"))
+        configure_cache(ttl=0, cache_dir=os.path.join(work_dir, "search"))
+        # 每个场景都从第一页开始翻阅，结果才可比
+        configure_cursors(enabled=False, path=os.path.join(work_dir, "search_cursors.json"))
+        for run, (name, target) in enumerate((s, t) for s in scenarios for t in targets):
+            print(f"⏱️  {name} · {target} ...")
+            result = run_scenario(name, target, work_dir, queries, args.count, args.workers,
+                                  args.per_host, args.seed, id_base=run * 10 ** 8, verbose=args.verbose)
+            results.append(result)
+            print(f"   {result['files']} 个文件，{result['files_per_second']} 文件/秒，"
+                  f"{result['mb_per_second']} MB/秒，p50 {result['p50_seconds']}s，p99 {result['p99_seconds']}s")
+        store.close()
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"📝 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
@@ -0,0 +1,163 @@
+"""
+搜索接口响应缓存
+按 平台 + 接口 + 规范化参数 落盘缓存 JSON 响应，带 TTL 与总大小上限（按最近使用淘汰）
+Unsplash / Pexels / Pixabay / Pexels Videos 共用
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from tools import CACHE_DIR
+from tools.rate_limit import limited_get
+
+DEFAULT_CACHE_DIR = os.path.join(CACHE_DIR, "search")
+DEFAULT_TTL = 6 * 3600  # 秒
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 不参与缓存键的参数（密钥等，换 Key 不应导致缓存失效）
+IGNORED_PARAMS = {"key", "client_id"}
+
+
+def normalize_params(params: Dict) -> Dict[str, str]:
+    """规范化请求参数：排序、去掉密钥、字符串统一小写并折叠空白"""
+    normalized = {}
+    for key in sorted(params or {}):
+        if key.lower() in IGNORED_PARAMS:
+            continue
+        value = params[key]
+        if isinstance(value, str):
+            value = " ".join(value.lower().split())
+        normalized[key] = str(value)
+    return normalized
+
+
+class ResponseCache:
+    """线程安全的磁盘 JSON 缓存"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, refresh: bool = False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _path(self, provider: str, endpoint: str, params: Dict) -> str:
+        raw = json.dumps([provider, endpoint, normalize_params(params)], ensure_ascii=False)
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json")
+
+    def get(self, provider: str, endpoint: str, params: Dict) -> Optional[Dict]:
+        """命中且未过期时返回缓存的响应"""
+        if self.refresh or self.ttl <= 0:
+            return None
+
+        path = self._path(provider, endpoint, params)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get("stored_at", 0) > self.ttl:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # 用 mtime 记录最近使用时间，供淘汰使用
+        os.utime(path, None)
+        with self._lock:
+            self.hits += 1
+        return entry.get("data")
+
+    def put(self, provider: str, endpoint: str, params: Dict, data: Dict):
+        """写入缓存（原子替换），超出大小上限时淘汰最久未使用的条目"""
+        path = self._path(provider, endpoint, params)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        payload = json.dumps({"stored_at": time.time(), "data": data}, ensure_ascii=False)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += os.path.getsize(path) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for fname in files:
+                if fname.endswith(".json"):
+                    path = os.path.join(root, fname)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到降到上限的 80%"""
+        target = self.max_bytes * 0.8
+        for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+
+_shared: Optional[ResponseCache] = None
+_shared_guard = threading.Lock()
+
+
+def configure_cache(ttl: float = DEFAULT_TTL, refresh: bool = False,
+                    max_bytes: int = DEFAULT_MAX_BYTES, cache_dir: str = DEFAULT_CACHE_DIR) -> ResponseCache:
+    """按命令行参数创建进程内共享的缓存"""
+    global _shared
+    with _shared_guard:
+        _shared = ResponseCache(cache_dir, ttl, max_bytes, refresh)
+        return _shared
+
+
+def get_cache() -> ResponseCache:
+    """获取进程内共享的缓存（未配置时使用默认参数）"""
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = ResponseCache()
+        return _shared
+
+
+def get_json(session, provider: str, url: str, params: Dict, headers: Dict = None,
+             timeout: int = 10, cache: ResponseCache = None) -> Dict:
+    """带缓存、按平台限流的 GET JSON 请求"""
+    cache = cache or get_cache()
+    data = cache.get(provider, url, params)
+    if data is not None:
+        return data
+
+    response = limited_get(session, provider, url, params, headers, timeout)
+    response.raise_for_status()
+    data = response.json()
+    cache.put(provider, url, params, data)
+    return data
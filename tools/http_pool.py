@@ -0,0 +1,69 @@
+"""
+进程内共享的 HTTP 连接池
+所有下载器实例共用同一个 requests.Session，跨主题复用 TCP/TLS 连接；
+连接池大小与下载并发数匹配，幂等的 GET/HEAD 请求在网络错误和 5xx 时自动退避重试
+（429 由 tools.rate_limit 负责，不在这里重试）
+"""
+
+import threading
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 8
+POOL_HOSTS = 16  # 保留连接池的主机数（API 域名 + 各 CDN 域名）
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5  # 0.5s, 1s, 2s ...
+RETRY_STATUSES = (500, 502, 503, 504)
+USER_AGENT = "glasso-wallpaper-fetcher/1.0"
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_guard = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+
+
+def configure_pool(pool_size: int):
+    """设置连接池大小（需在首次 get_session 之前调用，通常等于下载并发数）"""
+    global _pool_size
+    with _sessions_guard:
+        _pool_size = max(1, pool_size)
+
+
+def _build_session(pool_size: int) -> requests.Session:
+    retry = Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size,
+                          max_retries=retry, pool_block=True)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def get_session(name: str = "default") -> requests.Session:
+    """获取指定名称的共享 Session（首次调用时创建）"""
+    with _sessions_guard:
+        session = _sessions.get(name)
+        if session is None:
+            session = _sessions[name] = _build_session(_pool_size)
+        return session
+
+
+def close_sessions():
+    """关闭所有共享 Session 及其连接"""
+    with _sessions_guard:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+壁纸后处理：按目标机型缩放并重新编码
+JPEG 使用 draft 模式在解码阶段直接降采样，超大原图不会完整解码；
+在进程池中并行处理，输出优化后的 JPEG 或 WebP
+依赖 Pillow（可选，缺失时自动跳过）
+
+用法:
+  python -m tools.image_postprocess assets/images/wallpapers --format webp --quality 80
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from tools.dedup_store import get_store
+
+try:
+    from PIL import Image, ImageOps
+    AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    Image = None
+    ImageOps = None
+    AVAILABLE = False
+
+# 目标机型：(宽, 高)
+TARGET_PROFILES = {
+    "iphone16promax": (1320, 2868),
+    "iphone16": (1179, 2556),
+    "fhd": (1080, 1920),
+}
+DEFAULT_PROFILE = "iphone16promax"
+# 壁纸最低尺寸：抓取时过滤、verify_assets 检查都以此为准
+MIN_WIDTH, MIN_HEIGHT = TARGET_PROFILES["fhd"]
+
+# 输出格式 -> (Pillow 格式名, 扩展名)
+# Flutter 原生不支持解码 AVIF，这里只提供 JPEG / WebP
+OUTPUT_FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_QUALITY = 82
+IMAGE_EXT = (".jpg", ".jpeg", ".png", ".webp")
+# App 展示的图片壁纸格式：素材目录按它扫描，须与 wallpaper_repository.dart 的 imageExtensions 一致
+# GIF 只收录、不做缩放重编码与变体（会丢失动画）
+WALLPAPER_EXT = IMAGE_EXT + (".gif",)
+
+
+def _cover_size(width: int, height: int, target_w: int, target_h: int):
+    """等比缩放到刚好覆盖目标尺寸（只缩小不放大）"""
+    scale = min(1.0, max(target_w / width, target_h / height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _reserve_dst(path: str, ext: str) -> str:
+    """
+    为转换格式后的输出占一个不冲突的文件名：foo.png -> foo.jpg，已存在时依次尝试 foo_1.jpg、foo_2.jpg...
+    以 O_EXCL 创建空文件占位，并行处理 foo.png 与 foo.jpeg 时也不会写到同一个文件
+    """
+    stem = os.path.splitext(path)[0]
+    n = 0
+    while True:
+        dst = stem + ext if n == 0 else f"{stem}_{n}{ext}"
+        try:
+            os.close(os.open(dst, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return dst
+        except FileExistsError:
+            n += 1
+
+
+def process_image(path: str, target_w: int, target_h: int, fmt: str = DEFAULT_FORMAT,
+                  quality: int = DEFAULT_QUALITY) -> Dict:
+    """
+    缩放并重新编码单张图片（在子进程中执行）
+    返回 {"src", "dst", "before", "after", "skipped"}
+    """
+    pil_format, ext = OUTPUT_FORMATS[fmt]
+    before = os.path.getsize(path)
+    result = {"src": path, "dst": path, "before": before, "after": before, "skipped": True}
+
+    with Image.open(path) as img:
+        # EXIF 方向为 90°/270° 时，显示尺寸与存储尺寸宽高互换
+        rotated = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        width, height = (img.height, img.width) if rotated else (img.width, img.height)
+        size = _cover_size(width, height, target_w, target_h)
+        same_format = img.format == pil_format and path.lower().endswith(ext)
+        if size == (width, height) and same_format and not rotated:
+            return result  # 已是目标尺寸与格式，避免重复有损编码
+
+        if img.format == "JPEG":
+            # 解码时按 1/2、1/4、1/8 降采样，结果不小于目标尺寸
+            img.draft("RGB", (size[1], size[0]) if rotated else size)
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        if (img.width, img.height) != size:
+            img = img.resize(size, Image.LANCZOS)
+
+        # 扩展名不变时原地替换；转换格式时不能覆盖已有的同名文件（如 foo.png 旁边的 foo.jpg）
+        dst = path if os.path.splitext(path)[1] == ext else _reserve_dst(path, ext)
+        tmp = dst + ".tmp"
+        try:
+            if pil_format == "JPEG":
+                img.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+            else:
+                img.save(tmp, "WEBP", quality=quality, method=6)
+        except BaseException:
+            if dst != path:
+                os.remove(dst)  # 释放占位
+            raise
+
+    after = os.path.getsize(tmp)
+    if same_format and after >= before:
+        # 重新编码反而更大，保留原图
+        os.remove(tmp)
+        if dst != path:
+            os.remove(dst)
+        return result
+
+    os.replace(tmp, dst)
+    if dst != path:
+        os.remove(path)
+    return {"src": path, "dst": dst, "before": before, "after": after, "skipped": False}
+
+
+def decode_size(path: str) -> Tuple[int, int]:
+    """
+    完整解码一张图片，返回显示宽高（考虑 EXIF 方向）；损坏或截断时抛出异常
+    JPEG 以 draft 模式按 1/8 解码，仍会读完全部压缩数据，截断的文件会被发现
+    """
+    with Image.open(path) as img:
+        rotated = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        width, height = (img.height, img.width) if rotated else (img.width, img.height)
+        if img.format == "JPEG":
+            img.draft("RGB", (img.width // 8, img.height // 8))
+        img.load()
+    return width, height
+
+
+def validate_image(path: str, min_width: int = 0, min_height: int = 0) -> Optional[str]:
+    """检查下载的图片能否完整解码、尺寸是否达标（在子进程中执行），返回错误信息，正常返回 None"""
+    try:
+        width, height = decode_size(path)
+    except Exception as e:
+        return f"无法解码（{e}）"
+    if width < min_width or height < min_height:
+        return f"尺寸不足（{width}×{height}）"
+    return None
+
+
+def process_images(paths: List[str], profile: str = DEFAULT_PROFILE, fmt: str = DEFAULT_FORMAT,
+                   quality: int = DEFAULT_QUALITY, max_workers: int = None, store=None) -> List[Dict]:
+    """在进程池中批量后处理，返回每张图片的结果；文件改名时同步更新去重库"""
+    if not AVAILABLE:
+        print("⚠️  未安装 Pillow，跳过图片后处理（pip install pillow）")
+        return []
+    if not paths:
+        return []
+
+    target_w, target_h = TARGET_PROFILES[profile]
+    print(f"\n🪄 正在后处理 {len(paths)} 张图片 → {target_w}×{target_h} {fmt.upper()} q{quality}")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(process_image, p, target_w, target_h, fmt, quality) for p in paths]
+        for path, future in zip(paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"  ⚠️  后处理失败：{os.path.basename(path)}（{e}）")
+
+    before = sum(r["before"] for r in results)
+    after = sum(r["after"] for r in results)
+    changed = [r for r in results if not r["skipped"]]
+    for r in changed:
+        if store is not None and r["dst"] != r["src"]:
+            store.rename_path(r["src"], r["dst"])
+    if store is not None:
+        store.flush()
+
+    saved = (before - after) / (1024 * 1024)
+    print(f"✨ 处理 {len(changed)} 张，跳过 {len(results) - len(changed)} 张，节省 {saved:.1f} MB")
+    return results
+
+
+def find_images(base_dir: str, extensions: Tuple[str, ...] = IMAGE_EXT) -> List[str]:
+    """列出目录下所有壁纸原图（跳过缩略图/变体等派生目录），默认只列出可以后处理的格式"""
+    paths = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in ("thumbnails", "variants")]
+        for fname in sorted(files):
+            if fname.lower().endswith(extensions) and not fname.startswith("_"):
+                paths.append(os.path.join(root, fname))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="壁纸后处理：缩放到目标机型并重新编码")
+    parser.add_argument("dirs", nargs="+", help="要处理的目录")
+    parser.add_argument("--profile", choices=sorted(TARGET_PROFILES), default=DEFAULT_PROFILE,
+                        help=f"目标机型（默认: {DEFAULT_PROFILE}）")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default=DEFAULT_FORMAT,
+                        help=f"输出格式（默认: {DEFAULT_FORMAT}）")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY,
+                        help=f"编码质量 1-100（默认: {DEFAULT_QUALITY}）")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="进程数（默认: CPU 核数）")
+    args = parser.parse_args()
+
+    store = get_store()
+    paths = [p for d in args.dirs for p in find_images(d)]
+    process_images(paths, args.profile, args.format, args.quality, args.jobs, store)
+    store.close()
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+壁纸多分辨率变体
+为每张壁纸生成若干固定宽度的小图（默认 400px 网格、800px 预览），原图作为 full 使用
+命名：<主题目录>/variants/<原文件名（含扩展名）>_w<宽度>.<jpg|webp>
+保留原扩展名，foo.jpg 与 foo.png 的变体不会互相覆盖
+只为新增或更新过的原图生成（按 mtime 判断），在进程池中并行执行
+依赖 Pillow（可选，缺失时自动跳过）
+
+用法:
+  python -m tools.image_variants assets/images/wallpapers
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence
+
+from tools.image_postprocess import IMAGE_EXT, find_images
+
+try:
+    from PIL import Image, ImageOps
+    AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    Image = None
+    ImageOps = None
+    AVAILABLE = False
+
+VARIANTS_DIR = "variants"
+VARIANT_WIDTHS = (400, 800)  # 网格、预览
+VARIANT_QUALITY = 80
+
+
+def variant_path(src: str, width: int) -> str:
+    """原图对应某个宽度的变体路径"""
+    folder, fname = os.path.split(src)
+    out_ext = ".webp" if fname.lower().endswith(".webp") else ".jpg"
+    return os.path.join(folder, VARIANTS_DIR, f"{fname}_w{width}{out_ext}")
+
+
+def is_stale(src: str, widths: Sequence[int]) -> bool:
+    """是否有变体缺失或比原图旧"""
+    src_mtime = os.path.getmtime(src)
+    missing = []
+    for width in widths:
+        dst = variant_path(src, width)
+        if not os.path.exists(dst):
+            missing.append(width)
+        elif os.path.getmtime(dst) < src_mtime:
+            return True
+    if not missing:
+        return False
+
+    # 比原图还宽的变体本就不会生成，只读文件头判断
+    try:
+        with Image.open(src) as img:
+            rotated = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+            src_width = img.height if rotated else img.width
+    except OSError:
+        return False  # 无法识别的文件不生成变体，也不中断整批
+    return any(width < src_width for width in missing)
+
+
+def make_variants(src: str, widths: Sequence[int], quality: int = VARIANT_QUALITY) -> List[str]:
+    """生成一张原图的所有变体（在子进程中执行），返回写入的文件"""
+    written = []
+    with Image.open(src) as img:
+        # 与 is_stale 一致按显示方向（EXIF 方向 5-8 宽高互换）判断原图宽度
+        rotated = img.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        src_width, src_height = (img.height, img.width) if rotated else (img.width, img.height)
+        if img.format == "JPEG":
+            # 只需解码到最大变体的尺寸（draft 按存储方向计算）
+            largest = max(widths)
+            size = (largest, round(largest * src_height / src_width))
+            img.draft("RGB", (size[1], size[0]) if rotated else size)
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        # 从大到小依次缩放，后一张复用前一张的结果
+        current = img
+        for width in sorted(widths, reverse=True):
+            dst = variant_path(src, width)
+            if width >= src_width:
+                # 原图本身不够宽，不生成该变体（App 回退到原图）
+                if os.path.exists(dst):
+                    os.remove(dst)
+                continue
+            if width < current.width:
+                height = max(1, round(current.height * width / current.width))
+                current = current.resize((width, height), Image.LANCZOS)
+
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp = dst + ".tmp"
+            if dst.endswith(".webp"):
+                current.save(tmp, "WEBP", quality=quality, method=6)
+            else:
+                current.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+            os.replace(tmp, dst)
+            written.append(dst)
+    return written
+
+
+def find_orphans(base_dir: str) -> List[str]:
+    """原图已不存在的变体（旧命名 <去扩展名>_w<宽度> 的变体也在其中，清理后按新命名重新生成）"""
+    orphans = []
+    for root, dirs, files in os.walk(base_dir):
+        if os.path.basename(root) != VARIANTS_DIR:
+            continue
+        parent = os.path.dirname(root)
+        sources = {f for f in os.listdir(parent) if f.lower().endswith(IMAGE_EXT)}
+        for fname in sorted(files):
+            source = os.path.splitext(fname)[0].rsplit("_w", 1)[0]
+            if source not in sources:
+                orphans.append(os.path.join(root, fname))
+    return orphans
+
+
+def prune_orphans(base_dir: str) -> int:
+    """删除原图已不存在的变体"""
+    orphans = find_orphans(base_dir)
+    for path in orphans:
+        os.remove(path)
+    return len(orphans)
+
+
+def generate_variants(base_dir: str, widths: Sequence[int] = VARIANT_WIDTHS,
+                      quality: int = VARIANT_QUALITY, max_workers: int = None) -> Dict[str, int]:
+    """为目录下新增/更新的原图并行生成变体"""
+    if not AVAILABLE:
+        print("⚠️  未安装 Pillow，跳过变体生成（pip install pillow）")
+        return {"sources": 0, "written": 0, "pruned": 0}
+
+    pruned = prune_orphans(base_dir)
+    stale = [src for src in find_images(base_dir) if is_stale(src, widths)]
+    written = 0
+    if stale:
+        print(f"\n🖼️  正在为 {len(stale)} 张壁纸生成 {'/'.join(map(str, widths))}px 变体...")
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(make_variants, src, tuple(widths), quality) for src in stale]
+            for src, future in zip(stale, futures):
+                try:
+                    written += len(future.result())
+                except Exception as e:
+                    print(f"  ⚠️  变体生成失败：{os.path.basename(src)}（{e}）")
+        print(f"✨ 生成 {written} 个变体文件")
+
+    return {"sources": len(stale), "written": written, "pruned": pruned}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为壁纸生成多分辨率变体")
+    parser.add_argument("dirs", nargs="+", help="壁纸根目录")
+    parser.add_argument("--widths", type=str, default=",".join(map(str, VARIANT_WIDTHS)),
+                        help="变体宽度，逗号分隔（默认: 400,800）")
+    parser.add_argument("--quality", type=int, default=VARIANT_QUALITY,
+                        help=f"编码质量（默认: {VARIANT_QUALITY}）")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="进程数（默认: CPU 核数）")
+    args = parser.parse_args()
+
+    widths = [int(w) for w in args.widths.split(",") if w.strip()]
+    for base_dir in args.dirs:
+        result = generate_variants(base_dir, widths, args.quality, args.jobs)
+        print(f"📊 {base_dir}: 更新 {result['sources']} 张原图，清理 {result['pruned']} 个过期变体")
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
@@ -0,0 +1,178 @@
+"""
+分阶段流水线：有界队列 + 背压
+  source（搜索结果或已规划好的候选）→ 阶段 1 → 阶段 2 → ... → 最后一个阶段（索引/提交）
+每个阶段有独立的线程数与有界输入队列，下游处理不过来时上游的 put 会阻塞，
+在途条目数只取决于队列长度与线程数，与批量大小无关，内存占用保持平稳
+CPU 密集的阶段在线程里通过 Pipeline.cpu() 把工作交给共享进程池，线程只负责等待结果，
+该阶段同时在途的任务数等于它的线程数；网络 I/O 阶段与 CPU 阶段因此可以同时进行
+fetch_wallpapers.py 与 fetch_video_wallpapers.py 共用
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from tools.run_metrics import get_metrics
+
+DEFAULT_QUEUE_FACTOR = 2  # 输入队列长度 = 阶段线程数 × 该系数
+POLL_INTERVAL = 0.2
+
+_DONE = object()
+
+
+class PipelineStage:
+    """
+    流水线阶段
+    fn(item) 返回要交给下一阶段的条目，返回 None 表示丢弃（如重复、下载失败）；
+    fan_out 为 True 时 fn 返回可迭代对象，其中每个元素分别交给下一阶段
+    timed 为 True 时每次调用记入 run_metrics（自身已有指标的阶段设为 False）
+    """
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, fan_out: bool = False,
+                 queue_size: int = None, timed: bool = True):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.fan_out = fan_out
+        self.queue_size = queue_size or self.workers * DEFAULT_QUEUE_FACTOR
+        self.timed = timed
+        self.stats = {"in": 0, "out": 0, "dropped": 0, "failed": 0, "busy": 0.0}
+
+
+class Pipeline:
+    """按阶段顺序连接的有界队列流水线"""
+
+    def __init__(self, stages: List[PipelineStage], process_workers: int = None,
+                 log: Callable[[str], None] = print):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.process_workers = process_workers
+        self.log = log
+        self._queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+        self._remaining = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_guard = threading.Lock()
+
+    # ---- 进程池 ----
+
+    def cpu(self, fn: Callable, *args, **kwargs):
+        """在共享进程池中执行 fn 并等待结果（在 CPU 阶段的线程中调用，fn 与参数需可 pickle）"""
+        with self._pool_guard:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.process_workers)
+            pool = self._pool
+        return pool.submit(fn, *args, **kwargs).result()
+
+    # ---- 运行 ----
+
+    def _put(self, index: int, item) -> bool:
+        """放入第 index 个阶段的队列；队列满时阻塞（背压），流水线已停止时返回 False"""
+        q = self._queues[index]
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _forward(self, index: int, item):
+        stage = self.stages[index]
+        items = item if stage.fan_out else (item,)
+        for out in items:
+            if out is None:
+                continue
+            with self._lock:
+                stage.stats["out"] += 1
+            if index + 1 < len(self.stages):
+                if not self._put(index + 1, out):
+                    return
+
+    def _call(self, stage: PipelineStage, item):
+        if not stage.timed:
+            return stage.fn(item)
+        with get_metrics().stage(stage.name):
+            return stage.fn(item)
+
+    def _worker(self, index: int):
+        stage = self.stages[index]
+        q = self._queues[index]
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+
+            start = time.perf_counter()
+            try:
+                result = self._call(stage, item)
+            except Exception as e:
+                result = None
+                with self._lock:
+                    stage.stats["failed"] += 1
+                self.log(f"⚠️  {stage.name} 阶段异常：{e}")
+            with self._lock:
+                stage.stats["in"] += 1
+                stage.stats["busy"] += time.perf_counter() - start
+                if result is None and not stage.fan_out:
+                    stage.stats["dropped"] += 1
+            if result is not None:
+                self._forward(index, result)
+
+        # 本阶段最后一个线程退出时通知下一阶段结束
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last and index + 1 < len(self.stages):
+            for _ in range(self.stages[index + 1].workers):
+                self._put(index + 1, _DONE)
+
+    def _feed(self, source: Iterable):
+        try:
+            for item in source:
+                if not self._put(0, item):
+                    return
+        except Exception as e:
+            self.log(f"⚠️  流水线输入异常：{e}")
+        for _ in range(self.stages[0].workers):
+            self._put(0, _DONE)
+
+    def run(self, source: Iterable) -> Dict[str, Dict]:
+        """运行到所有条目处理完毕，返回各阶段统计；Ctrl-C 时停止所有阶段后重新抛出"""
+        threads = [threading.Thread(target=self._feed, args=(source,), name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=self._worker, args=(index,), name=f"pipeline-{stage.name}-{i}",
+                                 daemon=True)
+                for i in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            self._stop.set()
+            raise
+        finally:
+            with self._pool_guard:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=not self._stop.is_set(), cancel_futures=self._stop.is_set())
+                    self._pool = None
+        return {stage.name: dict(stage.stats) for stage in self.stages}
+
+
+def print_stats(stats: Dict[str, Dict]):
+    """打印各阶段的 输入 → 输出 与忙碌时间"""
+    print("\n🧵 流水线：")
+    for name, s in stats.items():
+        extra = f"，失败 {s['failed']}" if s["failed"] else ""
+        print(f"  • {name}: {s['in']} → {s['out']}（丢弃 {s['dropped']}{extra}，忙碌 {s['busy']:.1f}s）")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+占位图：BlurHash + 主色
+原图以 draft 模式降采样解码到约 32px，BlurHash 的 DCT 分量与主色统计都用 NumPy 矩阵运算完成；
+在进程池中并行计算，结果按内容哈希缓存在 .fetch_cache/placeholders.json，只处理新文件
+依赖 NumPy + Pillow（可选，缺失时自动跳过）
+
+用法:
+  python -m tools.placeholders assets/images/avatars/anime/avatar_anime_01.jpg
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from tools import CACHE_DIR
+from tools.dedup_store import file_sha256, rel_path
+
+try:
+    import numpy as np
+    from PIL import Image, ImageOps
+    AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+    Image = None
+    ImageOps = None
+    AVAILABLE = False
+
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "placeholders.json")
+SAMPLE_SIZE = 32          # 降采样后的最长边
+COMPONENTS = (3, 4)       # 竖屏壁纸：横向 3 × 纵向 4 个分量
+COLOR_BITS = 4            # 主色统计时每个通道保留的位数
+CHUNK_SIZE = 8
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _encode83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // (83 ** (length - i - 1))) % 83] for i in range(length))
+
+
+def _srgb_to_linear(pixels: "np.ndarray") -> "np.ndarray":
+    v = pixels / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(1.0, max(0.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash(pixels: "np.ndarray", components: Tuple[int, int] = COMPONENTS) -> str:
+    """由 (h, w, 3) 的 sRGB 像素计算 BlurHash"""
+    cx, cy = components
+    h, w = pixels.shape[:2]
+    linear = _srgb_to_linear(pixels.astype(np.float64))
+
+    # 余弦基：(cx, w) 与 (cy, h)，一次 einsum 得到全部 cy × cx 个分量
+    basis_x = np.cos(np.pi * np.outer(np.arange(cx), np.arange(w)) / w)
+    basis_y = np.cos(np.pi * np.outer(np.arange(cy), np.arange(h)) / h)
+    factors = np.einsum("jy,ix,yxc->jic", basis_y, basis_x, linear) / (w * h)
+    norm = np.full((cy, cx, 1), 2.0)
+    norm[0, 0] = 1.0
+    factors = (factors * norm).reshape(-1, 3)
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((cx - 1) + (cy - 1) * 9, 1)
+
+    if len(ac):
+        quantised_max = int(max(0, min(82, np.floor(np.abs(ac).max() * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1.0
+    result += _encode83(quantised_max, 1)
+
+    r, g, b = (_linear_to_srgb(c) for c in dc)
+    result += _encode83((r << 16) + (g << 8) + b, 4)
+
+    scaled = np.sign(ac) * np.sqrt(np.abs(ac / max_value))
+    quant = np.clip(np.floor(scaled * 9 + 9.5), 0, 18).astype(int)
+    for qr, qg, qb in quant:
+        result += _encode83(qr * 19 * 19 + qg * 19 + qb, 2)
+    return result
+
+
+def dominant_color(pixels: "np.ndarray", bits: int = COLOR_BITS) -> str:
+    """按通道量化后统计出现最多的颜色桶，返回桶内像素均值 #rrggbb"""
+    flat = pixels.reshape(-1, 3).astype(np.int64)
+    shift = 8 - bits
+    q = flat >> shift
+    bins = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    top = np.bincount(bins).argmax()
+    r, g, b = flat[bins == top].mean(axis=0).round().astype(int)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def compute_placeholder(path: str) -> Tuple[str, str]:
+    """解码缩小后的图片并计算 (BlurHash, 主色)（在子进程中执行）"""
+    with Image.open(path) as img:
+        img.draft("RGB", (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR)
+        pixels = np.asarray(img)
+
+    cx, cy = COMPONENTS if img.height >= img.width else COMPONENTS[::-1]
+    return blurhash(pixels, (cx, cy)), dominant_color(pixels)
+
+
+class PlaceholderCache:
+    """
+    两级缓存：
+      files   文件路径 -> [大小, mtime, 内容哈希]，避免每次重新计算哈希
+      results 内容哈希 -> [BlurHash, 主色]，改名/移动的文件无需重新计算
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.files: Dict[str, list] = data.get("files", {})
+        self.results: Dict[str, list] = data.get("results", {})
+
+    def content_hash(self, path: str) -> str:
+        key = rel_path(path)
+        st = os.stat(path)
+        entry = self.files.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            return entry[2]
+        digest = file_sha256(path)
+        self.files[key] = [st.st_size, st.st_mtime, digest]
+        self.dirty = True
+        return digest
+
+    def prune(self, keep_paths: List[str]):
+        """只保留本次仍存在的文件及其结果"""
+        keep = {rel_path(p) for p in keep_paths}
+        files = {k: v for k, v in self.files.items() if k in keep}
+        hashes = {v[2] for v in files.values()}
+        results = {k: v for k, v in self.results.items() if k in hashes}
+        if len(files) != len(self.files) or len(results) != len(self.results):
+            self.files, self.results = files, results
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "results": self.results}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def compute_placeholders(paths: List[str], max_workers: int = None, cache: PlaceholderCache = None,
+                         prune: bool = False) -> Dict[str, Dict[str, str]]:
+    """
+    为一批图片计算占位信息，返回 路径 -> {"blurhash", "color"}
+    只有内容哈希不在缓存里的文件才会解码；prune 为 True 时清理不在 paths 中的缓存条目
+    """
+    if not AVAILABLE or not paths:
+        return {}
+
+    cache = cache or PlaceholderCache()
+    hashes = {path: cache.content_hash(path) for path in paths}
+
+    # 同一内容只算一次
+    todo: Dict[str, str] = {}
+    for path, digest in hashes.items():
+        if digest not in cache.results and digest not in todo:
+            todo[digest] = path
+
+    if todo:
+        print(f"🎨 正在为 {len(todo)} 张图片计算 BlurHash / 主色...")
+        items = list(todo.items())
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(_safe_compute, [path for _, path in items], chunksize=CHUNK_SIZE)
+            for (digest, _), result in zip(items, results):
+                if result is not None:
+                    cache.results[digest] = list(result)
+                    cache.dirty = True
+
+    if prune:
+        cache.prune(paths)
+    cache.save()
+
+    placeholders = {}
+    for path, digest in hashes.items():
+        result = cache.results.get(digest)
+        if result:
+            placeholders[path] = {"blurhash": result[0], "color": result[1]}
+    return placeholders
+
+
+def _safe_compute(path: str) -> Optional[Tuple[str, str]]:
+    try:
+        return compute_placeholder(path)
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="计算图片的 BlurHash 与主色")
+    parser.add_argument("paths", nargs="+", help="图片路径")
+    args = parser.parse_args()
+
+    if not AVAILABLE:
+        print("⚠️  未安装 NumPy / Pillow（pip install numpy pillow）")
+        sys.exit(1)
+    for path, value in compute_placeholders(args.paths).items():
+        print(f"{path}\t{value['blurhash']}\t{value['color']}")
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
@@ -0,0 +1,199 @@
+"""
+跨平台近似重复检测
+用各平台 API 自带的小预览图计算感知哈希（dHash），
+在下载原图之前剔除与已有素材（或本次计划中排在前面的候选）过于相似的条目
+依赖 NumPy + Pillow（可选，缺失时自动跳过）
+"""
+
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from tools import REPO_ROOT
+
+try:
+    import numpy as np
+    from PIL import Image
+    AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+    Image = None
+    AVAILABLE = False
+
+HASH_SIZE = 8  # 8×8 = 64 位哈希
+DEFAULT_THRESHOLD = 6  # 汉明距离 ≤ 6 视为同一张图
+
+
+def _to_signed(value: int) -> int:
+    """uint64 -> SQLite 可存储的 int64"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def decode_preview(data: bytes) -> Optional["np.ndarray"]:
+    """把预览图解码为 (HASH_SIZE, HASH_SIZE + 1) 的灰度矩阵"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # JPEG 解码时直接降采样，避免完整解码
+            img.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+            small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+            return np.asarray(small, dtype=np.int16)
+    except Exception:
+        return None
+
+
+def dhash_batch(pixels: "np.ndarray") -> "np.ndarray":
+    """批量计算 dHash：输入 (n, 8, 9) 灰度矩阵，输出 (n,) uint64"""
+    bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    packed = np.packbits(bits.reshape(len(pixels), -1), axis=1)
+    return packed.view(">u8").ravel().astype(np.uint64)
+
+
+def popcount(values: "np.ndarray") -> "np.ndarray":
+    """逐元素统计 uint64 中 1 的个数"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    as_bytes = values.astype(np.uint64).view(np.uint8).reshape(values.shape + (8,))
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1)
+
+
+def hamming_matrix(a: "np.ndarray", b: "np.ndarray") -> "np.ndarray":
+    """a (n,) 与 b (m,) 两两之间的汉明距离矩阵 (n, m)"""
+    return popcount(np.bitwise_xor(a[:, None], b[None, :]))
+
+
+class PreviewIndex:
+    """已有素材的感知哈希索引"""
+
+    def __init__(self, hashes: List[int] = None):
+        self.hashes = np.array([_to_unsigned(h) for h in (hashes or [])], dtype=np.uint64)
+
+    @classmethod
+    def from_store(cls, store) -> "PreviewIndex":
+        return cls(store.all_phashes())
+
+    def min_distance(self, candidates: "np.ndarray") -> "np.ndarray":
+        """每个候选到索引中最近条目的距离；索引为空时返回 65"""
+        if len(self.hashes) == 0 or len(candidates) == 0:
+            return np.full(len(candidates), HASH_SIZE * HASH_SIZE + 1, dtype=np.int64)
+        return hamming_matrix(candidates, self.hashes).min(axis=1)
+
+    def add(self, value: int):
+        self.hashes = np.append(self.hashes, np.uint64(value))
+
+
+def backfill_store(store) -> int:
+    """为库中已有但缺少感知哈希的图片补算哈希，返回补算数量"""
+    if not AVAILABLE:
+        return 0
+
+    rows = store.missing_phash((".jpg", ".jpeg", ".png", ".webp"))
+    decoded = []
+    for rowid, path in rows:
+        full_path = os.path.join(REPO_ROOT, path)
+        if not os.path.exists(full_path):
+            continue
+        with open(full_path, "rb") as f:
+            pixels = decode_preview(f.read())
+        if pixels is not None:
+            decoded.append((rowid, pixels))
+
+    if not decoded:
+        return 0
+
+    hashes = dhash_batch(np.stack([pixels for _, pixels in decoded]))
+    for (rowid, _), value in zip(decoded, hashes):
+        store.set_phash(rowid, _to_signed(int(value)))
+    store.flush()
+    return len(decoded)
+
+
+def _fetch_preview(session, engine, url: str) -> Optional[bytes]:
+    try:
+        with engine.host_slot(url):
+            response = session.get(url, timeout=10)
+            response.raise_for_status()
+            return response.content
+    except Exception:
+        return None
+
+
+class PreviewFilter:
+    """
+    流水线中的逐条近似重复过滤（与 filter_plan 规则相同）
+    每个候选与已有素材及本次已放行的候选比较，先完成比对的优先保留
+    """
+
+    def __init__(self, store, session, engine, threshold: int = DEFAULT_THRESHOLD):
+        self.session = session
+        self.engine = engine
+        self.threshold = threshold
+        self.index = PreviewIndex.from_store(store)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def check(self, item: Dict) -> Optional[Dict]:
+        """保留时返回条目（带上 phash 字段），近似重复时在条目上标记 similar 并返回 None"""
+        data = _fetch_preview(self.session, self.engine, item["preview"]) if item.get("preview") else None
+        pixels = decode_preview(data) if data else None
+        if pixels is None:
+            return item
+
+        value = int(dhash_batch(pixels[None])[0])
+        with self._lock:
+            if self.index.min_distance(np.array([value], dtype=np.uint64))[0] <= self.threshold:
+                self.dropped += 1
+                item["similar"] = True
+                return None
+            self.index.add(value)
+        item["phash"] = _to_signed(value)
+        return item
+
+
+def filter_plan(plan: List[Dict], store, session, engine,
+                threshold: int = DEFAULT_THRESHOLD, max_workers: int = 8) -> List[Dict]:
+    """
+    按预览图剔除近似重复的计划条目
+    保留的条目会带上 "phash" 字段，下载成功后写入去重库；剔除的条目标记 "similar"
+    """
+    if not AVAILABLE:
+        print("⚠️  未安装 numpy / Pillow，跳过预览图去重（pip install numpy pillow）")
+        return plan
+
+    candidates = [item for item in plan if item.get("preview")]
+    if not candidates:
+        return plan
+
+    print(f"\n🧬 正在比对 {len(candidates)} 张预览图的感知哈希...")
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        previews = list(pool.map(lambda it: _fetch_preview(session, engine, it["preview"]), candidates))
+
+    decoded = [(item, decode_preview(data)) for item, data in zip(candidates, previews) if data]
+    decoded = [(item, pixels) for item, pixels in decoded if pixels is not None]
+    if not decoded:
+        return plan
+
+    hashes = dhash_batch(np.stack([pixels for _, pixels in decoded]))
+    to_owned = PreviewIndex.from_store(store).min_distance(hashes)
+    # 本次计划内部两两比较，排在前面的候选优先保留
+    pairwise = hamming_matrix(hashes, hashes)
+
+    dropped = set()
+    kept_idx = []
+    for i, (item, _) in enumerate(decoded):
+        if to_owned[i] <= threshold or (kept_idx and pairwise[i, kept_idx].min() <= threshold):
+            dropped.add(id(item))
+            item["similar"] = True
+            continue
+        kept_idx.append(i)
+        item["phash"] = _to_signed(int(hashes[i]))
+
+    result = [item for item in plan if id(item) not in dropped]
+    print(f"✨ 近似重复剔除 {len(dropped)} 张，保留 {len(result)} 张")
+    return result
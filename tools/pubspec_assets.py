@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+pubspec.yaml 资源路径的增量索引
+用 os.scandir 扫描素材根目录，记录每个目录的 mtime 快照（.fetch_cache/asset_index.json）；
+目录 mtime 未变时直接复用上次的结果，不再列出其中的文件
+只有资源列表真正变化（新增含资源的目录、目录被删除）时才改写 pubspec.yaml 的 assets 段（其余内容原样保留），
+避免无谓地触发 flutter pub get 与资源重新打包
+fetch_wallpapers.py、fetch_video_wallpapers.py、tools/rename_wallpapers.py 共用
+
+用法:
+  python -m tools.pubspec_assets
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+from tools import CACHE_DIR, REPO_ROOT
+from tools.run_metrics import get_metrics
+
+DEFAULT_PUBSPEC = os.path.join(REPO_ROOT, "pubspec.yaml")
+DEFAULT_SNAPSHOT = os.path.join(CACHE_DIR, "asset_index.json")
+
+# 由索引管理的素材根目录 -> pubspec 中的分组注释
+ASSET_ROOTS = {
+    "assets/images": "图片资源",
+    "assets/videos": "视频资源",
+}
+# 始终保留的单个文件资源 -> 分组注释
+ASSET_FILES = {
+    "assets/catalog.json": "素材目录（tools/catalog.py 生成）",
+}
+ASSET_EXT = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".mp4", ".mov")
+
+_ASSETS_KEY_RE = re.compile(r"^(\s+)assets:\s*(#.*)?$")
+
+
+class AssetIndex:
+    """目录 mtime 快照：相对路径 -> {"mtime", "has_assets", "subdirs"}"""
+
+    def __init__(self, snapshot_path: str = DEFAULT_SNAPSHOT, project_dir: str = REPO_ROOT):
+        self.snapshot_path = snapshot_path
+        self.project_dir = project_dir
+        self.rescanned = 0
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                self.dirs: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self.dirs = {}
+        self._seen = set()
+
+    def _scan_dir(self, rel_dir: str) -> Tuple[bool, List[str]]:
+        """列出单个目录：是否直接包含资源文件、子目录列表"""
+        has_assets = False
+        subdirs = []
+        with os.scandir(os.path.join(self.project_dir, rel_dir)) as it:
+            for entry in it:
+                if entry.name.startswith((".", "_")):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif not has_assets and entry.name.lower().endswith(ASSET_EXT):
+                    has_assets = True
+        return has_assets, sorted(subdirs)
+
+    def _walk(self, rel_dir: str, found: List[str]):
+        try:
+            mtime = os.stat(os.path.join(self.project_dir, rel_dir)).st_mtime
+        except OSError:
+            return
+        self._seen.add(rel_dir)
+
+        cached = self.dirs.get(rel_dir)
+        if cached is None or cached["mtime"] != mtime:
+            # 目录本身有增删改名（mtime 变化）时才重新列出
+            has_assets, subdirs = self._scan_dir(rel_dir)
+            cached = self.dirs[rel_dir] = {"mtime": mtime, "has_assets": has_assets, "subdirs": subdirs}
+            self.rescanned += 1
+
+        if cached["has_assets"]:
+            found.append(rel_dir + "/")
+        for name in cached["subdirs"]:
+            self._walk(f"{rel_dir}/{name}", found)
+
+    def asset_dirs(self, roots: Sequence[str] = tuple(ASSET_ROOTS)) -> List[str]:
+        """返回所有直接包含资源文件的目录（pubspec 格式，以 / 结尾）"""
+        self._seen = set()
+        found: List[str] = []
+        for root in roots:
+            self._walk(root.rstrip("/"), found)
+        # 已删除的目录不再保留在快照中
+        self.dirs = {k: v for k, v in self.dirs.items() if k in self._seen}
+        return sorted(found)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.dirs, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+
+
+def _managed_root(asset: str) -> Optional[str]:
+    for root in ASSET_ROOTS:
+        if asset.rstrip("/") == root or asset.startswith(root + "/"):
+            return root
+    return None
+
+
+def build_assets(current: List[str], asset_dirs: List[str], project_dir: str = REPO_ROOT) -> List[str]:
+    """
+    合成新的资源列表：保留现有条目的顺序（已删除的目录除外），新发现的目录追加在后面
+    手工添加的条目与仍存在的空目录（如只有 .gitkeep 的主题）原样保留
+    """
+    files = [f for f in ASSET_FILES if os.path.exists(os.path.join(project_dir, f))]
+    kept = [
+        a for a in current
+        if a not in ASSET_FILES and (_managed_root(a) is None or os.path.isdir(os.path.join(project_dir, a)))
+    ]
+    added = [d for d in asset_dirs if d not in kept]
+    return files + kept + added
+
+
+def _render_assets(assets: List[str], indent: str) -> List[str]:
+    """按分组输出 assets 段（带注释）"""
+    groups: Dict[str, List[str]] = {}
+    for asset in assets:
+        root = _managed_root(asset)
+        label = ASSET_FILES.get(asset) or (ASSET_ROOTS[root] if root else "其他资源")
+        groups.setdefault(label, []).append(asset)
+
+    lines = []
+    for label, items in groups.items():
+        if lines:
+            lines.append("\n")
+        lines.append(f"{indent}# {label}\n")
+        lines.extend(f"{indent}- {item}\n" for item in items)
+    return lines
+
+
+def _replace_assets_block(text: str, assets: List[str]) -> Optional[str]:
+    """只替换 flutter.assets 段的文本，其余内容保持不变；找不到 assets 段时返回 None"""
+    lines = text.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        match = _ASSETS_KEY_RE.match(line.rstrip("\n"))
+        if not match:
+            continue
+        key_indent = len(match.group(1))
+
+        end = i + 1
+        last_item = i
+        while end < len(lines):
+            stripped = lines[end].strip()
+            indent = len(lines[end]) - len(lines[end].lstrip())
+            if stripped and not stripped.startswith("#") and indent <= key_indent:
+                break
+            if stripped.startswith("-"):
+                last_item = end
+            end += 1
+
+        block = _render_assets(assets, " " * (key_indent + 2))
+        return "".join(lines[:i + 1] + block + lines[last_item + 1:])
+    return None
+
+
+def asset_roots(*dirs: str, project_dir: str = REPO_ROOT) -> List[str]:
+    """默认素材根目录加上命令行指定的下载目录（相对 pubspec 所在目录；已被默认根目录覆盖的不重复）"""
+    roots = list(ASSET_ROOTS)
+    for d in dirs:
+        rel = os.path.relpath(os.path.abspath(d), project_dir).replace(os.sep, "/")
+        if rel == "." or rel.startswith("../"):
+            continue  # 项目目录之外的文件不能作为 Flutter 资源
+        if not any(rel == root or rel.startswith(root + "/") for root in roots):
+            roots.append(rel)
+    return roots
+
+
+def update_pubspec(pubspec_path: str = DEFAULT_PUBSPEC, roots: Sequence[str] = tuple(ASSET_ROOTS),
+                   snapshot_path: str = DEFAULT_SNAPSHOT) -> bool:
+    """按增量索引更新 pubspec.yaml 的 assets，资源列表未变化时不写文件；返回是否写入"""
+    with get_metrics().stage("pubspec") as stage:
+        written = _update_pubspec(pubspec_path, roots, snapshot_path, stage)
+        stage.set(written=written)
+        return written
+
+
+def _update_pubspec(pubspec_path: str, roots: Sequence[str], snapshot_path: str, stage) -> bool:
+    if not os.path.exists(pubspec_path):
+        print(f"⚠️  未找到 {pubspec_path}，跳过自动更新。")
+        return False
+
+    project_dir = os.path.dirname(os.path.abspath(pubspec_path))
+    index = AssetIndex(snapshot_path, project_dir)
+    asset_dirs = index.asset_dirs(roots)
+    index.save()
+    stage.set(rescanned=index.rescanned)
+
+    with open(pubspec_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    content = yaml.safe_load(text) or {}
+    current = list((content.get("flutter") or {}).get("assets") or [])
+    assets = build_assets(current, asset_dirs, project_dir)
+
+    if assets == current:
+        print(f"🧩 pubspec.yaml 资源列表无变化（重新扫描 {index.rescanned} 个目录）")
+        return False
+
+    new_text = _replace_assets_block(text, assets)
+    if new_text is None:
+        # 没有 assets 段：退回到整体重写
+        content.setdefault("flutter", {})["assets"] = assets
+        new_text = yaml.dump(content, allow_unicode=True, sort_keys=False)
+
+    for asset in sorted(set(assets) - set(current)):
+        print(f"  ➕ 添加路径：{asset}")
+    for asset in sorted(set(current) - set(assets)):
+        print(f"  ➖ 移除路径：{asset}")
+
+    tmp_path = pubspec_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(new_text)
+    os.replace(tmp_path, pubspec_path)
+    print("✅ pubspec.yaml 已更新")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量更新 pubspec.yaml 中的资源路径")
+    parser.add_argument("--pubspec", type=str, default=DEFAULT_PUBSPEC, help="pubspec.yaml 路径")
+    args = parser.parse_args()
+    update_pubspec(args.pubspec)
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
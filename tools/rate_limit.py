@@ -0,0 +1,179 @@
+"""
+按平台限流的请求调度器
+令牌桶控制请求节奏，读取响应里的 X-Ratelimit-* 头动态调整速率，
+遇到 429 时按 Retry-After / 指数退避 + 抖动重试，而不是直接放弃该次搜索
+配额耗尽且短时间内不会恢复（没有给出重置时间，或重置时间超过 MAX_RESET_WAIT）时，
+该平台后续请求直接抛出 RateLimited，本次运行跳过该平台，而不是长时间无提示地等待
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from tools.run_metrics import get_metrics, record_response
+
+# 平台默认配额：(每秒速率, 突发容量)
+PROVIDER_LIMITS = {
+    "unsplash": (50 / 3600, 50),     # Demo Key：50 次/小时
+    "pexels": (200 / 3600, 20),      # 200 次/小时
+    "pixabay": (100 / 60, 20),       # 100 次/分钟
+}
+
+# 共用同一配额的接口
+PROVIDER_ALIASES = {
+    "pexels_video": "pexels",
+}
+
+MAX_RETRIES = 5
+BASE_BACKOFF = 2.0  # 秒
+MAX_BACKOFF = 300.0
+MAX_RESET_WAIT = 3600.0  # 配额耗尽时最多等待的秒数，超过则本次运行跳过该平台
+
+
+class RateLimited(Exception):
+    """配额耗尽且无法在可接受时间内恢复"""
+
+
+def _header(headers, name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """线程安全的令牌桶"""
+
+    def __init__(self, rate: float, capacity: float, name: str = ""):
+        self.name = name
+        self.default_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.exhausted: Optional[str] = None  # 配额耗尽且本次运行内不会恢复的原因
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """取一个令牌，不足时阻塞等待；配额已耗尽时抛出 RateLimited"""
+        while True:
+            with self._lock:
+                if self.exhausted:
+                    raise RateLimited(self.exhausted)
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if wait <= 0:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(min(wait, 5.0))
+
+    def block_for(self, seconds: float):
+        """在接下来的 seconds 秒内暂停发放令牌"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """根据 X-Ratelimit-Remaining / Reset 调整节奏，保持在平台允许的上限"""
+        remaining = _header(headers, "X-Ratelimit-Remaining")
+        if remaining is None:
+            return
+
+        reset = _header(headers, "X-Ratelimit-Reset")
+        if reset is not None and reset > 1e9:
+            reset -= time.time()  # Pexels 返回 UNIX 时间戳，Pixabay 返回剩余秒数
+
+        notice = None
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # 服务端说剩多少就最多用多少
+            self.tokens = min(self.tokens, remaining)
+
+            if remaining <= 0:
+                self.rate = self.default_rate
+                if reset is None:
+                    # 没有给出重置时间（Unsplash 为滚动小时窗口），不在本次运行中等待
+                    if not self.exhausted:
+                        self.exhausted = "配额已耗尽（未给出重置时间），本次运行跳过"
+                        notice = f"⛔ {self.name} {self.exhausted}"
+                elif reset <= MAX_RESET_WAIT:
+                    if self.blocked_until <= now:
+                        notice = f"⏳ {self.name} 配额已用完，暂停请求 {max(reset, 1):.0f} 秒后继续"
+                    self.blocked_until = max(self.blocked_until, now + max(reset, 1))
+                elif not self.exhausted:
+                    self.exhausted = f"配额已耗尽，{reset / 3600:.1f} 小时后才会重置，本次运行跳过"
+                    notice = f"⛔ {self.name} {self.exhausted}"
+            elif reset is not None and 0 < reset <= MAX_RESET_WAIT:
+                # 把剩余配额均匀摊到窗口内，但不低于默认速率
+                self.rate = max(self.default_rate, remaining / reset)
+            else:
+                self.rate = self.default_rate
+        if notice:
+            print(notice)
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_guard = threading.Lock()
+
+
+def configure_limits(limits: Dict[str, Tuple[float, float]]):
+    """覆盖平台配额（如本地基准测试中的模拟服务没有真实配额），已创建的令牌桶会被重建"""
+    with _buckets_guard:
+        PROVIDER_LIMITS.update(limits)
+        _buckets.clear()
+
+
+def get_bucket(provider: str) -> TokenBucket:
+    """获取平台对应的令牌桶（同一配额的接口共用）"""
+    key = PROVIDER_ALIASES.get(provider, provider)
+    with _buckets_guard:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate, capacity = PROVIDER_LIMITS.get(key, (5.0, 5))
+            bucket = _buckets[key] = TokenBucket(rate, capacity, key)
+        return bucket
+
+
+def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+    """指数退避 + 全抖动；服务端给出 Retry-After 时以其为下限"""
+    delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def limited_get(session, provider: str, url: str, params: Dict = None, headers: Dict = None,
+                timeout: int = 10):
+    """按平台配额发起 GET 请求；429 时退避重试，返回最终响应"""
+    bucket = get_bucket(provider)
+
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        response = session.get(url, params=params, headers=headers, timeout=timeout)
+        bucket.update_from_headers(response.headers)
+        record_response(response)
+
+        if response.status_code != 429:
+            return response
+
+        if attempt == MAX_RETRIES:
+            break
+        metrics = get_metrics()
+        metrics.current().add("retries", 1)
+        metrics.incr("retries", provider=provider, reason="429")
+        delay = _backoff(attempt, _header(response.headers, "Retry-After"))
+        print(f"⏳ {provider} 触发限流（429），{delay:.1f} 秒后重试（{attempt + 1}/{MAX_RETRIES}）")
+        bucket.block_for(delay)
+
+    return response
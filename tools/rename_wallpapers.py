@@ -1,93 +1,238 @@
 #!/usr/bin/env python3
+"""
+按主题批量重命名壁纸：wallpaper_<主题>_<序号>.<ext>
+先在内存中算出完整的 源 -> 目标 映射，再分两阶段执行（源 -> 临时名 -> 目标），
+互相占用名字的循环改名也不会冲突；多分辨率变体随原图一起改名
+执行前写入日志 .fetch_cache/rename_journal.json，中断后再次运行会继续完成，
+也可以 --rollback 回滚；去重库中的路径同步更新，改名后的文件不会被重复下载
+
+用法:
+  python -m tools.rename_wallpapers [--dry-run] [--rollback]
+"""
+
+import argparse
+import json
 import os
 import re
 import sys
-import yaml
-from typing import List
+import time
+from typing import List, Tuple
+
+if __package__ in (None, ""):
+    # 直接以脚本运行（python tools/rename_wallpapers.py）时，让 tools 包可以被导入
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import CACHE_DIR, REPO_ROOT
+from tools import catalog
+from tools.dedup_store import get_store
+from tools.image_variants import VARIANT_WIDTHS, variant_path
+from tools.pubspec_assets import update_pubspec
 
 SUPPORTED_EXT = (".jpg", ".jpeg", ".png", ".webp")
+DEFAULT_JOURNAL = os.path.join(CACHE_DIR, "rename_journal.json")
+
+Move = Tuple[str, str]  # (源路径, 目标路径)
 
 
 def natural_sort_key(s: str):
     return [int(text) if text.isdigit() else text.lower() for text in re.split(r"(\d+)", s)]
 
 
-def rename_in_topic(topic_dir: str, topic: str) -> List[str]:
+def plan_topic(topic_dir: str, topic: str) -> List[Move]:
+    """计算一个主题目录的完整改名映射（只包含需要改名的文件及其变体）"""
     files = [f for f in os.listdir(topic_dir) if os.path.splitext(f)[1].lower() in SUPPORTED_EXT]
     files.sort(key=natural_sort_key)
 
-    changed = []
+    # 序号唯一，目标名天然不冲突；目标名被其他文件占用时由两阶段执行处理
+    moves = []
     for idx, fname in enumerate(files, 1):
         ext = os.path.splitext(fname)[1].lower()
-        new_name = f"wallpaper_{topic}_{idx}{ext}"
         src = os.path.join(topic_dir, fname)
-        dst = os.path.join(topic_dir, new_name)
+        dst = os.path.join(topic_dir, f"wallpaper_{topic}_{idx}{ext}")
         if src == dst:
             continue
-        # 避免覆盖：若重名则追加序号
-        counter = 1
-        while os.path.exists(dst):
-            new_name = f"wallpaper_{topic}_{idx}_{counter}{ext}"
-            dst = os.path.join(topic_dir, new_name)
-            counter += 1
-        os.rename(src, dst)
-        changed.append(new_name)
-        print(f"✅ {fname} -> {new_name}")
-    return changed
-
-
-def update_pubspec(pubspec_path: str, base_dir: str):
-    if not os.path.exists(pubspec_path):
-        print(f"⚠️ 未找到 {pubspec_path}，跳过自动更新。")
-        return
-
-    with open(pubspec_path, "r", encoding="utf-8") as f:
-        content = yaml.safe_load(f)
-
-    if "flutter" not in content:
-        content["flutter"] = {}
-
-    assets = content["flutter"].get("assets", [])
-
-    for root, dirs, files in os.walk(base_dir):
-        if any(fname.lower().endswith(SUPPORTED_EXT) for fname in files):
-            rel_path = os.path.relpath(root, os.path.dirname(pubspec_path)) + "/"
-            rel_path = rel_path.replace("\\", "/")
-            if rel_path not in assets:
-                assets.append(rel_path)
-                print(f"➕ 追加资源路径: {rel_path}")
-
-    content["flutter"]["assets"] = sorted(list(set(assets)))
-
-    with open(pubspec_path, "w", encoding="utf-8") as f:
-        yaml.dump(content, f, allow_unicode=True, sort_keys=False)
-
-    print("✅ pubspec.yaml 已更新！")
+        moves.append((src, dst))
+        for width in VARIANT_WIDTHS:
+            src_variant = variant_path(src, width)
+            if os.path.exists(src_variant):
+                moves.append((src_variant, variant_path(dst, width)))
+    return moves
+
+
+def plan_renames(base_dir: str) -> List[Move]:
+    """所有主题目录的改名映射"""
+    moves = []
+    for topic in sorted(os.listdir(base_dir)):
+        topic_dir = os.path.join(base_dir, topic)
+        if os.path.isdir(topic_dir) and not topic.startswith("."):
+            moves.extend(plan_topic(topic_dir, topic))
+    return moves
+
+
+class RenameJournal:
+    """
+    改名日志：记录每个文件的 (源, 临时名, 目标) 与当前阶段
+      phase 1  源 -> 临时名（此时文件只会在源或临时名处）
+      phase 2  临时名 -> 目标（此时文件只会在临时名或目标处）
+      phase 3  文件已就位，更新去重库
+    """
+
+    def __init__(self, path: str = DEFAULT_JOURNAL):
+        self.path = path
+        self.entries: List[List[str]] = []
+        self.phase = 0
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_JOURNAL) -> "RenameJournal":
+        journal = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        journal.entries = data["entries"]
+        journal.phase = data["phase"]
+        return journal
+
+    @classmethod
+    def create(cls, moves: List[Move], path: str = DEFAULT_JOURNAL) -> "RenameJournal":
+        journal = cls(path)
+        token = f"{os.getpid()}{int(time.time())}"
+        for i, (src, dst) in enumerate(moves):
+            tmp = os.path.join(os.path.dirname(src), f".rename-{token}-{i}{os.path.splitext(src)[1]}")
+            journal.entries.append([os.path.relpath(p, REPO_ROOT) for p in (src, tmp, dst)])
+        journal.set_phase(1)
+        return journal
+
+    def triples(self):
+        for entry in self.entries:
+            yield tuple(os.path.join(REPO_ROOT, p) for p in entry)
+
+    def set_phase(self, phase: int):
+        self.phase = phase
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"phase": phase, "entries": self.entries}, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def finish(self):
+        os.remove(self.path)
+
+
+def _update_store(journal: RenameJournal, store):
+    """去重库路径也分两阶段更新，循环改名时不会互相覆盖；一次提交"""
+    triples = list(journal.triples())
+    for src, tmp, _ in triples:
+        store.rename_path(src, tmp)
+    for _, tmp, dst in triples:
+        store.rename_path(tmp, dst)
+    store.flush()
+
+
+def apply_journal(journal: RenameJournal, store=None) -> int:
+    """执行（或从中断处继续执行）日志中的改名，返回改名数量"""
+    if journal.phase == 1:
+        for src, tmp, _ in journal.triples():
+            if os.path.exists(src) and not os.path.exists(tmp):
+                os.rename(src, tmp)
+        journal.set_phase(2)
+
+    if journal.phase == 2:
+        for _, tmp, dst in journal.triples():
+            if os.path.exists(tmp):
+                os.rename(tmp, dst)
+        journal.set_phase(3)
+
+    if journal.phase == 3 and store is not None:
+        _update_store(journal, store)
+    journal.finish()
+    return len(journal.entries)
+
+
+def rollback_journal(journal: RenameJournal) -> int:
+    """把中断的改名恢复原状（去重库只在文件全部就位后才更新，无需回滚），返回恢复数量"""
+    if journal.phase >= 3:
+        print("⚠️  改名已全部完成，只差更新去重库，无需回滚；请直接重新运行以完成")
+        return 0
+
+    if journal.phase == 2:
+        for _, tmp, dst in journal.triples():
+            if os.path.exists(dst) and not os.path.exists(tmp):
+                os.rename(dst, tmp)
+        journal.set_phase(1)
+
+    restored = 0
+    for src, tmp, _ in journal.triples():
+        if os.path.exists(tmp):
+            os.rename(tmp, src)
+            restored += 1
+    journal.finish()
+    return restored
 
 
 def main():
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "assets", "images", "wallpapers"))
-    pubspec_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "pubspec.yaml"))
-
+    parser = argparse.ArgumentParser(description="按主题批量重命名壁纸")
+    parser.add_argument("--dir", type=str, default=os.path.join(REPO_ROOT, "assets", "images", "wallpapers"),
+                        help="壁纸根目录")
+    parser.add_argument("--dry-run", action="store_true", help="只打印改名计划")
+    parser.add_argument("--rollback", action="store_true", help="回滚上次中断的改名")
+    args = parser.parse_args()
+
+    base_dir = os.path.abspath(args.dir)
     if not os.path.exists(base_dir):
         print(f"❌ 未找到目录: {base_dir}")
         sys.exit(1)
 
-    print(f"📂 重命名目录: {base_dir}")
-    topics = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
-    topics.sort()
+    # 上次运行被中断：回滚，或先继续完成再重新规划
+    if args.rollback:
+        if os.path.exists(DEFAULT_JOURNAL):
+            print(f"↩️  已回滚 {rollback_journal(RenameJournal.load())} 个文件")
+        else:
+            print("没有需要回滚的改名")
+        return
 
-    total_changed = 0
-    for topic in topics:
-        topic_dir = os.path.join(base_dir, topic)
-        print(f"\n— 处理主题: {topic}")
-        changed = rename_in_topic(topic_dir, topic)
-        total_changed += len(changed)
+    if args.dry_run:
+        # dry run 不改动任何文件与去重库；有未完成的改名时只报告，规划要等它完成后才准确
+        print(f"📂 重命名目录: {base_dir}")
+        if os.path.exists(DEFAULT_JOURNAL):
+            journal = RenameJournal.load()
+            print(f"⏸️  有上次中断的改名（阶段 {journal.phase}，{len(journal.entries)} 个文件），"
+                  f"正式运行时会先继续完成，--rollback 可回滚")
+            for src, _, dst in journal.triples():
+                print(f"  {os.path.relpath(src, base_dir)} -> {os.path.relpath(dst, base_dir)}")
+            print("\n📊 dry run，未改动")
+            return
+        moves = plan_renames(base_dir)
+        for src, dst in moves:
+            print(f"  {os.path.relpath(src, base_dir)} -> {os.path.relpath(dst, base_dir)}")
+        print(f"\n📊 计划重命名 {len(moves)} 个文件（dry run，未改动）")
+        return
+
+    store = get_store()
+    resumed = 0
+    if os.path.exists(DEFAULT_JOURNAL):
+        journal = RenameJournal.load()
+        print(f"⏯️  继续上次中断的改名（阶段 {journal.phase}）")
+        resumed = apply_journal(journal, store)
+        print(f"✅ 已完成 {resumed} 个文件的改名")
 
-    print(f"\n📊 共重命名 {total_changed} 个文件")
+    # 改名前先按原文件名索引已有素材，文件名中的平台/ID 才不会随改名丢失
+    store.index_existing(base_dir)
 
-    update_pubspec(pubspec_path, base_dir)
+    print(f"📂 重命名目录: {base_dir}")
+    moves = plan_renames(base_dir)
+    for src, dst in moves:
+        print(f"  {os.path.relpath(src, base_dir)} -> {os.path.relpath(dst, base_dir)}")
+
+    renamed = apply_journal(RenameJournal.create(moves), store) if moves else 0
+    store.close()
+    print(f"\n📊 共重命名 {resumed + renamed} 个文件")
+    if not renamed and not resumed:
+        return
 
+    # 续做的改名同样需要刷新素材目录与 pubspec
+    catalog.write_catalog(image_root=base_dir)
+    update_pubspec(os.path.join(REPO_ROOT, "pubspec.yaml"))
 
 if __name__ == "__main__":
     if sys.version_info.major < 3:
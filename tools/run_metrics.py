@@ -0,0 +1,462 @@
+"""
+抓取运行的分阶段性能指标
+在搜索、下载、缩略图、转码、pubspec 更新等阶段外包一层 stage()，记录耗时、字节数、TTFB、重试次数与成败；
+每个阶段调用结束时追加一行 JSON 到运行报告（JSON Lines），运行结束时写入汇总行，
+并可输出 Prometheus textfile collector 格式的文件（node_exporter --collector.textfile.directory）
+可选按阶段开启 cProfile（每个线程各自采样，按阶段合并）与 tracemalloc（阶段活跃窗口内的分配差异），
+结果写入 --profile-dir
+未调用 configure_metrics 时所有接口都是空操作
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from tools import CACHE_DIR
+
+DEFAULT_REPORT_DIR = os.path.join(CACHE_DIR, "metrics")
+METRIC_PREFIX = "wallpaper_fetch"
+TRACEMALLOC_FRAMES = 5
+TRACEMALLOC_TOP = 25
+
+
+class Stage:
+    """一次阶段调用的记录：由调用方补充字段，或标记为失败"""
+
+    __slots__ = ("name", "provider", "fields", "ok", "error")
+
+    def __init__(self, name: str, provider: Optional[str], fields: Dict):
+        self.name = name
+        self.provider = provider
+        self.fields = fields
+        self.ok = True
+        self.error = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def add(self, key: str, value: float):
+        self.fields[key] = self.fields.get(key, 0) + value
+
+    def fail(self, error):
+        self.ok = False
+        self.error = error if isinstance(error, str) else f"{type(error).__name__}: {error}"
+
+
+class _NullStage(Stage):
+    """未启用指标时使用，所有写入都被丢弃"""
+
+    def __init__(self):
+        super().__init__("", None, {})
+
+    def set(self, **fields):
+        pass
+
+    def add(self, key: str, value: float):
+        pass
+
+    def fail(self, error):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def _prom_labels(labels: Dict[str, str]) -> str:
+    def escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items() if value is not None) + "}"
+
+
+class RunMetrics:
+    """一次抓取运行的指标收集器（线程安全）"""
+
+    def __init__(self, script: str = None, report_path: str = None, prom_path: str = None,
+                 profile_dir: str = None, profile_stages: Iterable[str] = (), trace_memory: bool = False):
+        self.script = script
+        self.enabled = script is not None
+        self.report_path = report_path
+        self.prom_path = prom_path
+        self.profile_dir = profile_dir
+        self.profile_stages = set(profile_stages)
+        self.trace_memory = trace_memory and bool(profile_dir)
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._report = None
+        # (阶段, 平台) -> 汇总
+        self._durations: Dict[tuple, List[float]] = defaultdict(list)
+        self._totals: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._counters: Dict[tuple, float] = defaultdict(float)
+        # 剖析数据
+        self._profiles: Dict[str, pstats.Stats] = {}
+        self._active: Dict[str, int] = defaultdict(int)
+        self._snapshots: Dict[str, tracemalloc.Snapshot] = {}
+        self._memory: Dict[str, Dict[str, float]] = {}
+
+        if self.enabled and report_path:
+            os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+            self._report = open(report_path, "a", encoding="utf-8")
+            self._emit({"event": "start", "argv": sys.argv[1:]})
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    # ---- 记录 ----
+
+    def _emit(self, record: Dict):
+        if self._report is None:
+            return
+        line = json.dumps({"run": self.run_id, "script": self.script, "ts": round(time.time(), 3), **record},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            self._report.write(line + "\n")
+            self._report.flush()
+
+    def _stack(self) -> List[Stage]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self) -> Stage:
+        """当前线程正在进行的阶段（没有时返回空记录），供底层代码补充 TTFB、重试等字段"""
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else _NULL_STAGE
+
+    @contextmanager
+    def stage(self, name: str, provider: str = None, **fields):
+        """记录一次阶段调用；阶段内抛出的异常会标记为失败并继续向上抛出"""
+        if not self.enabled:
+            yield _NULL_STAGE
+            return
+
+        record = Stage(name, provider, fields)
+        stack = self._stack()
+        profiler = self._start_profile(name) if not stack else None
+        self._enter_window(name)
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.fail(e)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            self._leave_window(name)
+            if profiler is not None:
+                self._stop_profile(name, profiler)
+            self._finish(record, seconds)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        """累加计数器（如 retries、errors），标签用于区分平台/原因"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+        with self._lock:
+            self._counters[key] += value
+
+    def _finish(self, record: Stage, seconds: float):
+        key = (record.name, record.provider)
+        with self._lock:
+            self._durations[key].append(seconds)
+            totals = self._totals[key]
+            totals["calls"] += 1
+            if not record.ok:
+                totals["errors"] += 1
+            for field in ("bytes", "retries"):
+                if isinstance(record.fields.get(field), (int, float)):
+                    totals[field] += record.fields[field]
+            if isinstance(record.fields.get("ttfb"), (int, float)):
+                totals["ttfb_sum"] += record.fields["ttfb"]
+                totals["ttfb_count"] += 1
+        if not record.ok:
+            self.incr("errors", stage=record.name, provider=record.provider)
+
+        entry = {"event": "stage", "stage": record.name, "seconds": round(seconds, 4), "ok": record.ok}
+        if record.provider:
+            entry["provider"] = record.provider
+        if record.error:
+            entry["error"] = record.error
+        entry.update(record.fields)
+        self._emit(entry)
+
+    # ---- 剖析 ----
+
+    def _start_profile(self, name: str) -> Optional[cProfile.Profile]:
+        if not self.profile_dir or name not in self.profile_stages:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None  # 其他剖析器已在运行（Python 3.12+ 全进程只能有一个）
+        return profiler
+
+    def _stop_profile(self, name: str, profiler: cProfile.Profile):
+        profiler.disable()
+        with self._lock:
+            if name in self._profiles:
+                self._profiles[name].add(profiler)
+            else:
+                self._profiles[name] = pstats.Stats(profiler)
+
+    def _enter_window(self, name: str):
+        """阶段从空闲变为活跃时记录内存快照"""
+        if not self.trace_memory or name not in self.profile_stages:
+            return
+        with self._lock:
+            self._active[name] += 1
+            if self._active[name] == 1:
+                tracemalloc.reset_peak()
+                self._snapshots[name] = tracemalloc.take_snapshot()
+
+    def _leave_window(self, name: str):
+        """阶段回到空闲时与开始时的快照比较，写出分配差异最大的位置"""
+        if not self.trace_memory or name not in self.profile_stages:
+            return
+        with self._lock:
+            self._active[name] -= 1
+            if self._active[name] > 0:
+                return
+            before = self._snapshots.pop(name, None)
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            memory = self._memory.setdefault(name, {"peak": 0, "windows": 0})
+            memory["peak"] = max(memory["peak"], peak)
+            memory["windows"] += 1
+        if before is None:
+            return
+
+        stats = after.compare_to(before, "lineno")[:TRACEMALLOC_TOP]
+        path = os.path.join(self.profile_dir, f"{self.script}-{name}.tracemalloc.txt")
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(f"# run {self.run_id} · {name} · 峰值 {peak / 1024 / 1024:.1f} MB，当前 {current / 1024 / 1024:.1f} MB\n")
+            for stat in stats:
+                f.write(f"{stat}\n")
+            f.write("\n")
+
+    # ---- 输出 ----
+
+    def summary(self) -> Dict[str, Dict]:
+        """按 阶段/平台 汇总：调用次数、失败数、总耗时、p50/p99、字节数、平均 TTFB、重试次数"""
+        result = {}
+        with self._lock:
+            for key, durations in sorted(self._durations.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+                totals = self._totals[key]
+                ordered = sorted(durations)
+                entry = {
+                    "calls": int(totals["calls"]),
+                    "errors": int(totals["errors"]),
+                    "seconds": round(sum(durations), 3),
+                    "p50": round(statistics.median(ordered), 4),
+                    "p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 4),
+                }
+                if totals["bytes"]:
+                    entry["bytes"] = int(totals["bytes"])
+                if totals["retries"]:
+                    entry["retries"] = int(totals["retries"])
+                if totals["ttfb_count"]:
+                    entry["ttfb_avg"] = round(totals["ttfb_sum"] / totals["ttfb_count"], 4)
+                result[f"{key[0]}/{key[1]}" if key[1] else key[0]] = entry
+        return result
+
+    def _write_prom(self, duration: float):
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+
+        def sample(name: str, labels: Dict, value: float):
+            value = float(value)
+            text = str(int(value)) if value.is_integer() else repr(value)
+            lines.append(f"{METRIC_PREFIX}_{name}{_prom_labels(labels)} {text}")
+
+        base = {"script": self.script}
+        with self._lock:
+            durations = {k: sorted(v) for k, v in self._durations.items()}
+            totals = {k: dict(v) for k, v in self._totals.items()}
+            counters = dict(self._counters)
+
+        metric("stage_duration_seconds", "summary", "最近一次运行各阶段单次调用耗时")
+        for (stage, provider), values in durations.items():
+            labels = dict(base, stage=stage, provider=provider)
+            sample("stage_duration_seconds", dict(labels, quantile="0.5"), statistics.median(values))
+            sample("stage_duration_seconds", dict(labels, quantile="0.99"),
+                   values[min(len(values) - 1, int(len(values) * 0.99))])
+            sample("stage_duration_seconds_sum", labels, sum(values))
+            sample("stage_duration_seconds_count", labels, len(values))
+
+        metric("stage_bytes_total", "counter", "最近一次运行各阶段传输的字节数")
+        for (stage, provider), total in totals.items():
+            if total.get("bytes"):
+                sample("stage_bytes_total", dict(base, stage=stage, provider=provider), total["bytes"])
+
+        metric("stage_ttfb_seconds", "summary", "最近一次运行各阶段的首字节时间")
+        for (stage, provider), total in totals.items():
+            if total.get("ttfb_count"):
+                labels = dict(base, stage=stage, provider=provider)
+                sample("stage_ttfb_seconds_sum", labels, total["ttfb_sum"])
+                sample("stage_ttfb_seconds_count", labels, total["ttfb_count"])
+
+        for name in sorted({key[0] for key in counters}):
+            metric(f"{name}_total", "counter", f"最近一次运行的 {name} 次数")
+            for (counter, labels), value in counters.items():
+                if counter == name:
+                    sample(f"{name}_total", dict(base, **dict(labels)), value)
+
+        metric("run_duration_seconds", "gauge", "最近一次运行的总耗时")
+        sample("run_duration_seconds", base, duration)
+        metric("last_run_timestamp_seconds", "gauge", "最近一次运行结束的 Unix 时间")
+        sample("last_run_timestamp_seconds", base, time.time())
+
+        # textfile collector 要求原子替换，避免读到半个文件
+        os.makedirs(os.path.dirname(os.path.abspath(self.prom_path)), exist_ok=True)
+        tmp_path = f"{self.prom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prom_path)
+
+    def close(self) -> Dict[str, Dict]:
+        """写入汇总行、Prometheus 文件与剖析结果，返回汇总"""
+        if not self.enabled:
+            return {}
+        duration = time.time() - self.started
+        summary = self.summary()
+        counters = {}
+        for (name, labels), value in self._counters.items():
+            label_text = ",".join(f"{k}={v}" for k, v in labels)
+            counters[f"{name}{{{label_text}}}" if label_text else name] = value
+
+        record = {"event": "summary", "seconds": round(duration, 3), "stages": summary, "counters": counters}
+        if self._memory:
+            record["memory_peak"] = {name: int(m["peak"]) for name, m in self._memory.items()}
+        self._emit(record)
+
+        if self.prom_path:
+            self._write_prom(duration)
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for name, stats in self._profiles.items():
+                stats.dump_stats(os.path.join(self.profile_dir, f"{self.script}-{name}.prof"))
+        if self._report is not None:
+            self._report.close()
+            self._report = None
+        if self.trace_memory:
+            tracemalloc.stop()
+        self.enabled = False
+        return summary
+
+
+_shared = RunMetrics()
+_shared_guard = threading.Lock()
+
+
+def configure_metrics(script: str, report_path: str = None, prom_path: str = None,
+                      profile_dir: str = None, profile_stages: Iterable[str] = (),
+                      trace_memory: bool = False) -> RunMetrics:
+    """按命令行参数创建进程内共享的指标收集器"""
+    global _shared
+    with _shared_guard:
+        _shared = RunMetrics(script, report_path, prom_path, profile_dir, profile_stages, trace_memory)
+        return _shared
+
+
+def get_metrics() -> RunMetrics:
+    """获取进程内共享的指标收集器（未配置时为空操作）"""
+    return _shared
+
+
+def record_response(response):
+    """把响应的 TTFB 与 urllib3 自动重试次数记到当前阶段"""
+    stage = _shared.current()
+    if stage is _NULL_STAGE:
+        return
+    elapsed = getattr(response, "elapsed", None)
+    if elapsed is not None:
+        stage.set(ttfb=round(elapsed.total_seconds(), 4))
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    history = getattr(retries, "history", None) or ()
+    if history:
+        stage.add("retries", len(history))
+        _shared.incr("retries", provider=stage.provider, reason="transport")
+
+
+def print_summary(summary: Dict[str, Dict]):
+    """打印各阶段汇总"""
+    if not summary:
+        return
+    print("\n⏱️  阶段耗时：")
+    for key, entry in summary.items():
+        extra = ""
+        if entry.get("bytes"):
+            extra += f"，{entry['bytes'] / 1024 / 1024:.1f} MB"
+        if entry.get("ttfb_avg"):
+            extra += f"，TTFB {entry['ttfb_avg'] * 1000:.0f} ms"
+        if entry.get("retries"):
+            extra += f"，重试 {entry['retries']} 次"
+        if entry["errors"]:
+            extra += f"，失败 {entry['errors']} 次"
+        print(f"  • {key}: {entry['calls']} 次，共 {entry['seconds']:.2f}s，"
+              f"p50 {entry['p50']:.3f}s，p99 {entry['p99']:.3f}s{extra}")
+
+
+def add_arguments(parser):
+    """抓取脚本共用的指标参数"""
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        nargs="?",
+        const="",
+        default=None,
+        help="写入 JSON Lines 运行报告（默认路径 .fetch_cache/metrics/<脚本>.jsonl，可指定文件）"
+    )
+    parser.add_argument(
+        "--prom",
+        type=str,
+        default=None,
+        help="写入 Prometheus textfile collector 文件（如 /var/lib/node_exporter/wallpapers.prom）"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=None,
+        help="按阶段输出 cProfile 结果（<脚本>-<阶段>.prof）的目录"
+    )
+    parser.add_argument(
+        "--profile-stages",
+        type=str,
+        default="search,download,thumbnail,transcode,pubspec,catalog",
+        help="需要剖析的阶段，逗号分隔（默认全部）"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="配合 --profile-dir，用 tracemalloc 记录各阶段的内存分配差异"
+    )
+
+
+def configure_from_args(script: str, args) -> RunMetrics:
+    """根据 add_arguments 添加的参数配置指标；三类输出都未开启时保持空操作"""
+    if args.metrics is None and not args.prom and not args.profile_dir:
+        return get_metrics()
+    report_path = None
+    if args.metrics is not None:
+        report_path = args.metrics or os.path.join(DEFAULT_REPORT_DIR, f"{script}.jsonl")
+    stages = [s.strip() for s in args.profile_stages.split(",") if s.strip()]
+    return configure_metrics(script, report_path, args.prom, args.profile_dir, stages, args.trace_memory)
@@ -0,0 +1,147 @@
+"""
+增量搜索游标
+对按时间倒序返回结果的平台（Unsplash order_by=latest），按（平台, 关键词）记录一段
+已处理完的连续结果区间 {newest, oldest, count}：区间内的结果都已下载、去重跳过或被筛掉
+翻页时遇到区间内的条目直接跳到区间之后继续，夜间批量刷新只需请求新结果所在的一两页，
+上次失败、超出预算或超出数量的结果不在区间内，之后的运行仍会取到
+区间在下载结果确定后才更新（遇到第一个未处理的结果即截止），最后统一写入
+.fetch_cache/search_cursors.json；dry run、中途失败的搜索不更新，--full-scan 可忽略游标从头翻阅
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from tools import CACHE_DIR
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, "search_cursors.json")
+
+
+def parse_time(value) -> Optional[float]:
+    """把接口返回的 ISO 8601 时间（如 2024-05-03T11:00:28-04:00）转为时间戳，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _key(provider: str, query: str) -> str:
+    return f"{provider}:{' '.join(query.lower().split())}"
+
+
+def _handled_prefix(entries: List[Tuple[float, bool]]) -> List[float]:
+    """从最新的结果开始，取到第一个未处理的结果之前"""
+    prefix = []
+    for published, handled in entries:
+        if not handled:
+            break
+        prefix.append(published)
+    return prefix
+
+
+def merge_range(old: Optional[Dict], before: List[Tuple[float, bool]], reached: bool,
+                after: List[Tuple[float, bool]]) -> Optional[Dict]:
+    """
+    按本次的处理结果计算新的已处理区间
+    before / after 为到达旧区间之前 / 之后取到的结果 [(发布时间, 是否已处理)]，按时间倒序
+    """
+    head = _handled_prefix(before)
+    if old is not None and reached:
+        if len(head) < len(before):
+            # 新结果中有未处理的，区间不能越过它，保留旧区间
+            return old
+        merged = {
+            "newest": head[0] if head else old["newest"],
+            "oldest": old["oldest"],
+            "count": len(head) + old["count"],
+        }
+        tail = _handled_prefix(after)
+        if tail:
+            merged["oldest"] = tail[-1]
+            merged["count"] += len(tail)
+        return merged
+    if not head:
+        return old
+    # 没有接上旧区间（首次运行或取够数量前未到达旧区间）：两段之间还有未见过的结果，只保留新的一段
+    return {"newest": head[0], "oldest": head[-1], "count": len(head)}
+
+
+class SearchCursors:
+    """线程安全的游标表：平台:关键词 -> 已处理区间"""
+
+    def __init__(self, path: str = DEFAULT_PATH, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self.skipped = 0  # 跳过了已处理区间的搜索数
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries: Dict[str, Dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _range(self, key: str) -> Optional[Dict]:
+        entry = self.entries.get(key)
+        # 旧版本只记录了一个时间戳，无法判断哪些结果已处理，当作没有记录
+        return entry if isinstance(entry, dict) else None
+
+    def get(self, provider: str, query: str) -> Optional[Dict]:
+        """已处理区间；未启用或没有记录时返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            return self._range(_key(provider, query))
+
+    def reached(self):
+        """登记一次跳过已处理区间的搜索"""
+        with self._lock:
+            self.skipped += 1
+
+    def update(self, provider: str, query: str, before: List[Tuple[float, bool]], reached: bool,
+               after: List[Tuple[float, bool]]):
+        """下载结果确定后更新区间，参数含义同 merge_range"""
+        key = _key(provider, query)
+        with self._lock:
+            old = self._range(key) if self.enabled else None
+            merged = merge_range(old, before, reached, after)
+            if merged is not None and merged != self.entries.get(key):
+                self.entries[key] = merged
+                self._dirty = True
+
+    def save(self):
+        """有变化时原子写入"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+_shared: Optional[SearchCursors] = None
+_shared_guard = threading.Lock()
+
+
+def configure_cursors(enabled: bool = True, path: str = DEFAULT_PATH) -> SearchCursors:
+    """按命令行参数创建进程内共享的游标表"""
+    global _shared
+    with _shared_guard:
+        _shared = SearchCursors(path, enabled)
+        return _shared
+
+
+def get_cursors() -> SearchCursors:
+    """获取进程内共享的游标表（未配置时使用默认参数）"""
+    global _shared
+    with _shared_guard:
+        if _shared is None:
+            _shared = SearchCursors()
+        return _shared
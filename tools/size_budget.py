@@ -0,0 +1,168 @@
+"""
+下载前的体积预算规划
+并发发送 HEAD 请求读取候选文件的 Content-Length，
+按总预算 / 单主题预算（已在磁盘上的素材也计入）挑出能装下的候选，只把这些交给下载阶段
+挑选顺序按每个（主题, 平台）内的搜索排名轮流进行，避免某个平台独占预算
+"""
+
+import os
+import re
+import statistics
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+PROBE_TIMEOUT = 10
+DEFAULT_PROBE_WORKERS = 8
+
+_SIZE_RE = re.compile(r"^\s*([\d.]+)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """解析 "40MB" / "512k" / "1.5G" 这样的大小，返回字节数"""
+    match = _SIZE_RE.match(text or "")
+    if not match:
+        raise ValueError(f"无法解析大小：{text!r}（示例：40MB、512K、1.5G）")
+    number, unit = match.groups()
+    return int(float(number) * _SIZE_UNITS[unit.lower()])
+
+
+def format_size(size: float) -> str:
+    """字节数转为便于阅读的字符串"""
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def dir_size(path: str) -> int:
+    """目录下所有文件的总大小（跳过隐藏目录与 _ 开头的记录文件）"""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for fname in files:
+            if fname.startswith((".", "_")):
+                continue
+            try:
+                total += os.path.getsize(os.path.join(root, fname))
+            except OSError:
+                pass
+    return total
+
+
+def head_size(session, url: str, timeout: int = PROBE_TIMEOUT) -> Optional[int]:
+    """HEAD 请求读取 Content-Length，未返回时为 None"""
+    response = session.head(url, allow_redirects=True, timeout=timeout)
+    if response.status_code >= 400:
+        return None
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def probe_sizes(plan: List[Dict], session, engine=None, max_workers: int = DEFAULT_PROBE_WORKERS,
+                timeout: int = PROBE_TIMEOUT) -> int:
+    """
+    并发 HEAD 探测大小未知的条目，写入 item["bytes"]（探测不到为 None），返回大小已知的条目数量
+    已带有 bytes 的条目（接口给出或挑选文件时已探测过）不再重复请求
+    """
+    def probe(item: Dict) -> Optional[int]:
+        try:
+            if engine is not None:
+                with engine.host_slot(item["url"]):
+                    return head_size(session, item["url"], timeout)
+            return head_size(session, item["url"], timeout)
+        except Exception:
+            return None
+
+    pending = [item for item in plan if not item.get("bytes")]
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(len(pending), max_workers))) as pool:
+            sizes = list(pool.map(probe, pending))
+        for item, size in zip(pending, sizes):
+            item["bytes"] = size
+    return sum(1 for item in plan if item.get("bytes"))
+
+
+def _estimate_unknown(plan: List[Dict]):
+    """探测不到大小的条目按同平台（否则全部）已知大小的中位数估算"""
+    known = [item["bytes"] for item in plan if item.get("bytes")]
+    by_platform = defaultdict(list)
+    for item in plan:
+        if item.get("bytes"):
+            by_platform[item["platform"]].append(item["bytes"])
+    for item in plan:
+        if not item.get("bytes"):
+            sizes = by_platform.get(item["platform"]) or known
+            item["estimated_bytes"] = int(statistics.median(sizes)) if sizes else 0
+
+
+def _ranked(plan: List[Dict]) -> List[int]:
+    """按每个（主题, 平台）组内的排名轮流排列，返回条目下标"""
+    rank = {}
+    counters = defaultdict(int)
+    for idx, item in enumerate(plan):
+        key = (item["query"], item["platform"])
+        rank[idx] = counters[key]
+        counters[key] += 1
+    return sorted(range(len(plan)), key=lambda idx: (rank[idx], idx))
+
+
+def apply_budget(plan: List[Dict], total_budget: int = None, topic_budget: int = None,
+                 base_dir: str = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    在总预算 / 单主题预算内挑选候选（已有文件占用的空间先扣除）
+    返回 (入选条目, 因超预算剔除的条目)，入选条目保持原计划顺序
+    """
+    if not plan or (total_budget is None and topic_budget is None):
+        return plan, []
+
+    _estimate_unknown(plan)
+
+    used_total = dir_size(base_dir) if base_dir and total_budget is not None else 0
+    used_topic: Dict[str, int] = {}
+
+    selected = set()
+    for idx in _ranked(plan):
+        item = plan[idx]
+        size = item.get("bytes") or item.get("estimated_bytes", 0)
+        topic_dir = item["downloader"].save_dir
+        if topic_budget is not None and topic_dir not in used_topic:
+            used_topic[topic_dir] = dir_size(topic_dir)
+
+        if total_budget is not None and used_total + size > total_budget:
+            continue
+        if topic_budget is not None and used_topic[topic_dir] + size > topic_budget:
+            continue
+
+        selected.add(idx)
+        used_total += size
+        if topic_budget is not None:
+            used_topic[topic_dir] += size
+
+    kept = [item for idx, item in enumerate(plan) if idx in selected]
+    dropped = [item for idx, item in enumerate(plan) if idx not in selected]
+    return kept, dropped
+
+
+def plan_with_budget(plan: List[Dict], session, engine=None, total_budget: int = None,
+                     topic_budget: int = None, base_dir: str = None,
+                     max_workers: int = DEFAULT_PROBE_WORKERS) -> List[Dict]:
+    """探测大小并按预算裁剪计划，打印摘要，返回入选条目"""
+    if not plan or (total_budget is None and topic_budget is None):
+        return plan
+
+    pending = sum(1 for item in plan if not item.get("bytes"))
+    if pending:
+        print(f"\n📏 正在探测 {pending} 个候选文件的大小...")
+    known = probe_sizes(plan, session, engine, max_workers)
+    if known < len(plan):
+        print(f"  ⚠️  {len(plan) - known} 个文件未返回 Content-Length，按同平台中位数估算")
+
+    kept, dropped = apply_budget(plan, total_budget, topic_budget, base_dir)
+    planned = sum(item.get("bytes") or item.get("estimated_bytes", 0) for item in kept)
+    limits = []
+    if total_budget is not None:
+        limits.append(f"总计 ≤ {format_size(total_budget)}")
+    if topic_budget is not None:
+        limits.append(f"每个主题 ≤ {format_size(topic_budget)}")
+    print(f"📏 预算（{'，'.join(limits)}）：保留 {len(kept)} 个（约 {format_size(planned)}），"
+          f"超出预算剔除 {len(dropped)} 个")
+    return kept
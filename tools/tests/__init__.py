@@ -0,0 +1,7 @@
+"""
+抓取工具的单元测试（pytest）
+全部在临时目录中运行，不访问真实平台，也不改动仓库中的素材与 .fetch_cache
+
+用法:
+  python -m pytest -q tools/tests
+"""
@@ -0,0 +1,63 @@
+"""DedupStore.claim / release：同一素材只会被一个线程下载"""
+
+import threading
+
+import pytest
+
+from tools.dedup_store import DedupStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DedupStore(str(tmp_path / "dedup.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_claim_is_exclusive_until_released(store):
+    assert store.claim("unsplash", "abc", "https://example.com/abc")
+    assert not store.claim("unsplash", "abc", "https://example.com/abc")
+
+    store.release("unsplash", "abc", "https://example.com/abc")
+    assert store.claim("unsplash", "abc", "https://example.com/abc")
+
+
+def test_item_id_is_normalised_to_string(store):
+    assert store.claim("pexels", 42, "https://example.com/42")
+    assert not store.claim("pexels", "42", "https://example.com/42")
+    store.release("pexels", "42", "https://example.com/42")
+    assert store.claim("pexels", 42, "https://example.com/42")
+
+
+def test_downloaded_item_cannot_be_claimed(store):
+    assert store.claim("unsplash", "abc", "https://example.com/abc")
+    store.record_download("unsplash", "abc", "https://example.com/abc", "hash", "/tmp/abc.jpg")
+    store.release("unsplash", "abc", "https://example.com/abc")
+
+    assert not store.claim("unsplash", "abc", "https://example.com/abc")
+    # 同一 ID 换了 URL、或同一 URL 来自旧记录（无 ID）都视为已下载
+    assert not store.claim("unsplash", "abc", "https://example.com/abc?w=1320")
+    assert not store.claim("unsplash", None, "https://example.com/abc")
+    # 其他平台的同名 ID 不受影响
+    assert store.claim("pexels", "abc", "https://example.com/other")
+
+
+def test_concurrent_claims_have_one_winner(store):
+    threads = 16
+    barrier = threading.Barrier(threads)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        barrier.wait()
+        won = store.claim("pixabay", 7, "https://example.com/7")
+        with lock:
+            results.append(won)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    assert results.count(True) == 1
@@ -0,0 +1,130 @@
+"""DownloadEngine 断点续传：Range/If-Range 续传、校验值变化时从头下载、416 后重新下载（fetch_benchmark 的模拟 CDN）"""
+
+import hashlib
+import json
+import os
+import time
+import zlib
+
+import pytest
+import requests
+
+from tools.download_engine import DownloadEngine
+from tools.fetch_benchmark import MockServer, MockState
+
+SCENARIO = {
+    "latency": 0.0, "bandwidth": 0, "error_rate": 0.0, "throttle_rate": 0.0,
+    "image_bytes": 256 * 1024, "video_bytes": 64 * 1024,
+}
+PATH = "/image/resume_test.jpg"
+
+
+@pytest.fixture
+def cdn():
+    state = MockState(SCENARIO)
+    server = MockServer("cdn", state).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = DownloadEngine(max_workers=2, parts_dir=str(tmp_path / "parts"), progress=False)
+    engine.write = lambda message: None
+    yield engine
+    engine.close()
+
+
+def _expected(server: MockServer) -> bytes:
+    size = server.state.file_size(os.path.basename(PATH), SCENARIO["image_bytes"])
+    return server.state.body(PATH, size)
+
+
+def _etag() -> str:
+    return f'"{zlib.crc32(PATH.encode("utf-8")):08x}"'
+
+
+def _seed_part(engine: DownloadEngine, url: str, data: bytes, **meta):
+    """模拟上次中断留下的 .part 与元数据"""
+    part_path, meta_path = engine._part_paths(url)
+    os.makedirs(engine.parts_dir, exist_ok=True)
+    with open(part_path, "wb") as f:
+        f.write(data)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(dict({"url": url}, **meta), f)
+
+
+def _sent_bytes(server: MockServer, expected: int) -> int:
+    # 服务端在发送完后才计数，稍等片刻
+    deadline = time.monotonic() + 2
+    while server.state.counters["bytes"] < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return server.state.counters["bytes"]
+
+
+def _fetch(engine, server, tmp_path):
+    url = server.base_url + PATH
+    dst = str(tmp_path / "out.jpg")
+    with requests.Session() as session:
+        written, content_hash = engine.fetch(session, url, dst)
+    with open(dst, "rb") as f:
+        data = f.read()
+    return url, written, content_hash, data
+
+
+def test_fresh_download(cdn, engine, tmp_path):
+    body = _expected(cdn)
+    url, written, content_hash, data = _fetch(engine, cdn, tmp_path)
+
+    assert data == body
+    assert written == len(body)
+    assert content_hash == hashlib.sha256(body).hexdigest()
+    assert not any(os.path.exists(p) for p in engine._part_paths(url))
+
+
+def test_resume_requests_only_the_rest(cdn, engine, tmp_path):
+    body = _expected(cdn)
+    half = len(body) // 2
+    _seed_part(engine, cdn.base_url + PATH, body[:half], etag=_etag())
+
+    _, written, content_hash, data = _fetch(engine, cdn, tmp_path)
+
+    assert data == body
+    assert written == len(body)
+    assert content_hash == hashlib.sha256(body).hexdigest()  # 已有部分也计入哈希
+    assert _sent_bytes(cdn, len(body) - half) == len(body) - half
+
+
+def test_changed_validator_restarts_from_scratch(cdn, engine, tmp_path):
+    body = _expected(cdn)
+    _seed_part(engine, cdn.base_url + PATH, b"x" * 1000, etag='"stale"')
+
+    _, written, content_hash, data = _fetch(engine, cdn, tmp_path)
+
+    assert data == body
+    assert content_hash == hashlib.sha256(body).hexdigest()
+    assert _sent_bytes(cdn, len(body)) == len(body)
+
+
+def test_preallocated_part_is_not_resumed(cdn, engine, tmp_path):
+    body = _expected(cdn)
+    _seed_part(engine, cdn.base_url + PATH, b"\0" * len(body), etag=_etag(), preallocated=True)
+
+    _, _, _, data = _fetch(engine, cdn, tmp_path)
+
+    assert data == body
+    assert _sent_bytes(cdn, len(body)) == len(body)
+
+
+def test_416_discards_part_and_downloads_again(cdn, engine, tmp_path):
+    body = _expected(cdn)
+    # 已有部分不小于服务端文件（文件已变短）：服务端返回 416
+    _seed_part(engine, cdn.base_url + PATH, b"y" * (len(body) + 10), etag=_etag())
+
+    url, written, content_hash, data = _fetch(engine, cdn, tmp_path)
+
+    assert data == body
+    assert written == len(body)
+    assert content_hash == hashlib.sha256(body).hexdigest()
+    assert cdn.state.counters["cdn"] == 2
+    assert not any(os.path.exists(p) for p in engine._part_paths(url))
@@ -0,0 +1,132 @@
+"""Pipeline：条目流转、异常隔离、背压与 Ctrl-C 停止"""
+
+import _thread
+import threading
+import time
+
+import pytest
+
+from tools.pipeline import Pipeline, PipelineStage
+
+
+def _run_quiet(stages, source):
+    logs = []
+    stats = Pipeline(stages, log=logs.append).run(source)
+    return stats, logs
+
+
+def test_items_flow_through_all_stages():
+    collected = []
+    lock = threading.Lock()
+
+    def sink(item):
+        with lock:
+            collected.append(item)
+        return item
+
+    stages = [
+        PipelineStage("search", lambda q: [f"{q}-{i}" for i in range(3)], workers=2, fan_out=True),
+        PipelineStage("download", lambda item: item.upper(), workers=3),
+        PipelineStage("index", sink),
+    ]
+    stats, logs = _run_quiet(stages, ["a", "b"])
+
+    assert sorted(collected) == sorted(f"{q}-{i}".upper() for q in "ab" for i in range(3))
+    assert stats["search"]["in"] == 2 and stats["search"]["out"] == 6
+    assert stats["download"]["in"] == 6 and stats["download"]["out"] == 6
+    assert stats["index"]["in"] == 6
+    assert logs == []
+
+
+def test_none_results_are_dropped():
+    stages = [
+        PipelineStage("filter", lambda n: n if n % 2 else None, workers=2),
+        PipelineStage("sink", lambda n: n),
+    ]
+    stats, _ = _run_quiet(stages, range(10))
+
+    assert stats["filter"]["dropped"] == 5
+    assert stats["sink"]["in"] == 5
+
+
+def test_stage_exception_fails_only_that_item():
+    def flaky(n):
+        if n == 3:
+            raise ValueError("boom")
+        return n
+
+    seen = []
+    stages = [PipelineStage("flaky", flaky, workers=2), PipelineStage("sink", seen.append)]
+    stats, logs = _run_quiet(stages, range(6))
+
+    assert stats["flaky"]["failed"] == 1
+    assert stats["flaky"]["dropped"] == 1
+    assert sorted(seen) == [0, 1, 2, 4, 5]
+    assert any("flaky" in line and "boom" in line for line in logs)
+
+
+def test_source_exception_is_logged_and_pipeline_finishes():
+    def source():
+        yield 1
+        yield 2
+        raise RuntimeError("search failed")
+
+    seen = []
+    stats, logs = _run_quiet([PipelineStage("sink", seen.append)], source())
+
+    assert sorted(seen) == [1, 2]
+    assert stats["sink"]["in"] == 2
+    assert any("search failed" in line for line in logs)
+
+
+def test_backpressure_bounds_items_pulled_from_source():
+    release = threading.Event()
+    pulled = []
+
+    def source():
+        for n in range(50):
+            pulled.append(n)
+            yield n
+
+    stages = [PipelineStage("slow", lambda n: release.wait() and n, workers=1, queue_size=2)]
+    pipeline = Pipeline(stages, log=lambda _: None)
+    runner = threading.Thread(target=pipeline.run, args=(source(),))
+    runner.start()
+    try:
+        time.sleep(0.5)
+        # 1 个在处理 + 队列中 2 个 + 输入线程手里 1 个
+        assert len(pulled) <= 4
+    finally:
+        release.set()
+        runner.join(10)
+    assert not runner.is_alive()
+    assert len(pulled) == 50
+
+
+def test_keyboard_interrupt_stops_every_stage():
+    def endless():
+        n = 0
+        while True:
+            yield n
+            n += 1
+
+    def slow(n):
+        time.sleep(0.01)
+        return n
+
+    stages = [PipelineStage("a", slow, workers=2), PipelineStage("b", slow, workers=2)]
+    timer = threading.Timer(0.3, _thread.interrupt_main)
+    timer.start()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            Pipeline(stages, log=lambda _: None).run(endless())
+    finally:
+        timer.cancel()
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        alive = [t for t in threading.enumerate() if t.name.startswith("pipeline-")]
+        if not alive:
+            break
+        time.sleep(0.05)
+    assert alive == []
@@ -0,0 +1,123 @@
+"""RenameJournal：两阶段改名、中断后继续与回滚"""
+
+import os
+
+import pytest
+
+from tools.dedup_store import DedupStore
+from tools.rename_wallpapers import RenameJournal, apply_journal, rollback_journal
+
+
+@pytest.fixture
+def topic(tmp_path):
+    """a.jpg、b.jpg 互换名字（循环改名），c.jpg 改为 d.jpg"""
+    folder = tmp_path / "nature"
+    folder.mkdir()
+    for name in ("a", "b", "c"):
+        (folder / f"{name}.jpg").write_text(name, encoding="utf-8")
+    paths = {name: str(folder / f"{name}.jpg") for name in "abcd"}
+    moves = [(paths["a"], paths["b"]), (paths["b"], paths["a"]), (paths["c"], paths["d"])]
+    return folder, paths, moves
+
+
+def _contents(folder) -> dict:
+    return {name: (folder / name).read_text(encoding="utf-8") for name in sorted(os.listdir(folder))}
+
+
+def test_apply_swaps_names_and_removes_journal(topic, tmp_path):
+    folder, _, moves = topic
+    journal_path = str(tmp_path / "journal.json")
+
+    assert apply_journal(RenameJournal.create(moves, journal_path)) == 3
+
+    assert _contents(folder) == {"a.jpg": "b", "b.jpg": "a", "d.jpg": "c"}
+    assert not os.path.exists(journal_path)
+
+
+def test_apply_updates_store_paths(topic, tmp_path):
+    folder, paths, moves = topic
+    store = DedupStore(str(tmp_path / "dedup.sqlite3"))
+    for name in "abc":
+        store.record("unsplash", name, f"https://example.com/{name}", f"hash-{name}", paths[name])
+    store.flush()
+
+    apply_journal(RenameJournal.create(moves, str(tmp_path / "journal.json")), store)
+
+    assert store.find_hash("hash-a").endswith("nature/b.jpg")
+    assert store.find_hash("hash-b").endswith("nature/a.jpg")
+    assert store.find_hash("hash-c").endswith("nature/d.jpg")
+    store.close()
+
+
+def test_resume_after_interrupted_phase_one(topic, tmp_path):
+    folder, _, moves = topic
+    journal_path = str(tmp_path / "journal.json")
+    journal = RenameJournal.create(moves, journal_path)
+    # 第一阶段只完成了第一个文件就被中断
+    src, tmp, _ = next(journal.triples())
+    os.rename(src, tmp)
+
+    apply_journal(RenameJournal.load(journal_path))
+
+    assert _contents(folder) == {"a.jpg": "b", "b.jpg": "a", "d.jpg": "c"}
+
+
+def test_resume_after_interrupted_phase_two(topic, tmp_path):
+    folder, _, moves = topic
+    journal_path = str(tmp_path / "journal.json")
+    journal = RenameJournal.create(moves, journal_path)
+    for src, tmp, _ in journal.triples():
+        os.rename(src, tmp)
+    journal.set_phase(2)
+    _, tmp, dst = next(journal.triples())
+    os.rename(tmp, dst)
+
+    apply_journal(RenameJournal.load(journal_path))
+
+    assert _contents(folder) == {"a.jpg": "b", "b.jpg": "a", "d.jpg": "c"}
+
+
+def test_rollback_from_phase_one(topic, tmp_path):
+    folder, _, moves = topic
+    journal_path = str(tmp_path / "journal.json")
+    journal = RenameJournal.create(moves, journal_path)
+    src, tmp, _ = next(journal.triples())
+    os.rename(src, tmp)
+
+    assert rollback_journal(RenameJournal.load(journal_path)) == 1
+
+    assert _contents(folder) == {"a.jpg": "a", "b.jpg": "b", "c.jpg": "c"}
+    assert not os.path.exists(journal_path)
+
+
+def test_rollback_from_phase_two(topic, tmp_path):
+    folder, _, moves = topic
+    journal_path = str(tmp_path / "journal.json")
+    journal = RenameJournal.create(moves, journal_path)
+    for src, tmp, _ in journal.triples():
+        os.rename(src, tmp)
+    journal.set_phase(2)
+    triples = list(journal.triples())
+    for _, tmp, dst in triples[:2]:
+        os.rename(tmp, dst)
+
+    assert rollback_journal(RenameJournal.load(journal_path)) == 3
+
+    assert _contents(folder) == {"a.jpg": "a", "b.jpg": "b", "c.jpg": "c"}
+    assert not os.path.exists(journal_path)
+
+
+def test_rollback_refused_once_files_are_in_place(topic, tmp_path):
+    folder, _, moves = topic
+    journal_path = str(tmp_path / "journal.json")
+    journal = RenameJournal.create(moves, journal_path)
+    for src, tmp, _ in journal.triples():
+        os.rename(src, tmp)
+    for _, tmp, dst in journal.triples():
+        os.rename(tmp, dst)
+    journal.set_phase(3)
+
+    assert rollback_journal(RenameJournal.load(journal_path)) == 0
+
+    assert _contents(folder) == {"a.jpg": "b", "b.jpg": "a", "d.jpg": "c"}
+    assert os.path.exists(journal_path)
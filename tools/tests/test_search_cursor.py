@@ -0,0 +1,129 @@
+"""增量搜索游标：merge_range 区间合并、SearchCursors 持久化与按区间跳页"""
+
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+import fetch_wallpapers
+from tools.search_cursor import SearchCursors, configure_cursors, merge_range
+
+
+def test_first_run_records_handled_prefix():
+    before = [(100.0, True), (99.0, True), (98.0, False), (97.0, True)]
+    assert merge_range(None, before, False, []) == {"newest": 100.0, "oldest": 99.0, "count": 2}
+
+
+def test_first_run_without_handled_results_keeps_nothing():
+    assert merge_range(None, [(100.0, False)], False, []) is None
+
+
+def test_reaching_old_range_extends_it_on_both_ends():
+    old = {"newest": 90.0, "oldest": 80.0, "count": 10}
+    before = [(100.0, True), (95.0, True)]
+    after = [(79.0, True), (78.0, True), (77.0, False)]
+    assert merge_range(old, before, True, after) == {"newest": 100.0, "oldest": 78.0, "count": 14}
+
+
+def test_reaching_old_range_without_new_results():
+    old = {"newest": 90.0, "oldest": 80.0, "count": 10}
+    assert merge_range(old, [], True, []) == old
+
+
+def test_unhandled_new_result_keeps_old_range():
+    old = {"newest": 90.0, "oldest": 80.0, "count": 10}
+    before = [(100.0, True), (95.0, False)]
+    assert merge_range(old, before, True, [(79.0, True)]) is old
+
+
+def test_gap_before_old_range_replaces_it_with_new_segment():
+    old = {"newest": 90.0, "oldest": 80.0, "count": 10}
+    before = [(100.0, True), (99.0, True)]
+    assert merge_range(old, before, False, []) == {"newest": 100.0, "oldest": 99.0, "count": 2}
+
+
+def test_cursors_save_and_reload(tmp_path):
+    path = str(tmp_path / "cursors.json")
+    cursors = SearchCursors(path)
+    cursors.update("unsplash", "Nature  Scenery", [(100.0, True)], False, [])
+    cursors.save()
+
+    reloaded = SearchCursors(path)
+    assert reloaded.get("unsplash", "nature scenery") == {"newest": 100.0, "oldest": 100.0, "count": 1}
+    assert SearchCursors(path, enabled=False).get("unsplash", "nature scenery") is None
+
+
+def test_legacy_timestamp_entry_is_ignored(tmp_path):
+    path = tmp_path / "cursors.json"
+    path.write_text(json.dumps({"unsplash:nature": 1700000000.0}), encoding="utf-8")
+    assert SearchCursors(str(path)).get("unsplash", "nature") is None
+
+
+# ---- 按区间跳页 ----
+
+TOTAL = 100
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+class FakeDownloader(fetch_wallpapers.WallpaperDownloader):
+    """按时间倒序返回 TOTAL 条结果的模拟平台，记录请求过的页码"""
+
+    PLATFORM = "fake"
+    NAME = "Fake"
+    PUBLISHED_FIELD = "created_at"
+
+    def __init__(self):
+        self.pages: List[int] = []
+
+    def _fetch_page(self, query: str, page: int, per_page: int) -> Tuple[List[Dict], bool]:
+        self.pages.append(page)
+        start = (page - 1) * per_page
+        items = [{"id": i, "created_at": _iso(10000 - i)} for i in range(start, min(start + per_page, TOTAL))]
+        return items, start + per_page < TOTAL
+
+    def _parse_item(self, item: Dict) -> Optional[Dict]:
+        return {"id": item["id"]}
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cursors(tmp_path):
+    configure_cursors(path=str(tmp_path / "shared_cursors.json"))
+
+
+def test_page_jump_skips_handled_range():
+    # 第 5 ~ 64 条已处理过：第 1 页遇到区间后直接跳到第 3 页，区间之后继续取
+    cursor = {"newest": 10000 - 5, "oldest": 10000 - 64, "count": 60}
+    downloader = FakeDownloader()
+    scan = {"before": [], "after": [], "reached": False}
+
+    found = [w["id"] for w in downloader.iter_wallpapers("q", count=10, cursor=cursor, scan=scan)]
+
+    assert found == [0, 1, 2, 3, 4, 65, 66, 67, 68, 69]
+    assert downloader.pages == [1, 3, 4]
+    assert scan["reached"] is True
+    assert [item_id for _, item_id in scan["before"]] == [0, 1, 2, 3, 4]
+    assert [item_id for _, item_id in scan["after"]] == [65, 66, 67, 68, 69]
+
+
+def test_without_cursor_pages_are_sequential():
+    downloader = FakeDownloader()
+    found = [w["id"] for w in downloader.iter_wallpapers("q", count=50)]
+
+    # 每页 min(50 × 2, PER_PAGE_CAP) = 30 条
+    assert found == list(range(50))
+    assert downloader.pages == [1, 2]
+
+
+def test_short_range_is_skipped_in_place():
+    # 区间结束在同一页内：不跳页，逐条跳过
+    cursor = {"newest": 10000 - 2, "oldest": 10000 - 6, "count": 5}
+    downloader = FakeDownloader()
+
+    found = [w["id"] for w in downloader.iter_wallpapers("q", count=5, cursor=cursor)]
+
+    assert found == [0, 1, 7, 8, 9]
+    assert downloader.pages == [1]
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+素材完整性检查
+在进程池中并行扫描 assets/images 与 assets/videos：
+  图片  完整解码（截断的 JPEG 也能发现），壁纸检查是否达到 MIN_WIDTH×MIN_HEIGHT（不足只提示）
+  视频  ffprobe 读取容器与时长，再用 ffmpeg 只解复用、不解码地读完所有数据包，截断的 mp4 会报错
+  派生  变体与缩略图同样解码检查；原图/视频已不存在的变体与缩略图视为孤儿
+  去重库 指向已不存在文件的记录、尚未导入的 _downloaded.txt
+  目录  catalog.json 未收录的新素材、仍列着已删除文件的条目
+检查结果按 大小 + mtime 缓存在 .fetch_cache/verify.json，重复扫描只检查新增或变化的文件
+--repair：损坏文件移到 .fetch_cache/quarantine/（原图的去重记录一并删除，下次抓取会重新下载），
+删除孤儿、修正去重库、导入 _downloaded.txt（导入后删除，记录导出到 download_history.tsv），补齐变体与缩略图，最后更新 catalog.json 与 pubspec.yaml
+发现未修复的损坏文件时以状态码 1 退出
+
+用法:
+  python -m tools.verify_assets
+  python -m tools.verify_assets --repair
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+if __package__ in (None, ""):
+    # 直接以脚本运行（python tools/verify_assets.py）时，让 tools 包可以被导入
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import CACHE_DIR, REPO_ROOT
+from tools import catalog, image_postprocess, image_variants, video_thumbnails
+from tools.catalog import asset_path
+from tools.dedup_store import DEFAULT_DB_PATH, LEGACY_FILENAME, get_store
+from tools.image_postprocess import IMAGE_EXT, MIN_HEIGHT, MIN_WIDTH, find_images
+from tools.pubspec_assets import update_pubspec
+from tools.video_transcode import probe
+
+DEFAULT_CACHE = os.path.join(CACHE_DIR, "verify.json")
+QUARANTINE_DIR = os.path.join(CACHE_DIR, "quarantine")
+IMAGE_ROOT = os.path.join(REPO_ROOT, "assets", "images")
+VIDEO_TIMEOUT = 120
+
+
+def check_image(path: str) -> Dict:
+    """解码检查一张图片（在子进程中执行）"""
+    try:
+        width, height = image_postprocess.decode_size(path)
+    except Exception as e:
+        return {"error": f"无法解码（{e}）"}
+    return {"width": width, "height": height}
+
+
+def check_video(path: str) -> Dict:
+    """ffprobe 检查容器与时长，ffmpeg 解复用读完所有数据包（在子进程中执行）"""
+    info = probe(path)
+    if info is None:
+        return {"error": "ffprobe 无法读取视频流或时长"}
+    if info["duration"] <= 0:
+        return {"error": "时长为 0"}
+
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-map", "0:v:0", "-c", "copy", "-f", "null", "-"]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=VIDEO_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return {"error": "ffmpeg 读取超时"}
+    message = result.stderr.decode("utf-8", "replace").strip()
+    if result.returncode != 0 or message:
+        return {"error": (message.splitlines() or ["ffmpeg 读取失败"])[0]}
+    return {"width": info["width"], "height": info["height"], "duration": round(info["duration"], 2)}
+
+
+def find_derived(base_dir: str, dirname: str) -> List[str]:
+    """派生目录（variants / thumbnails）下的所有图片"""
+    paths = []
+    for root, dirs, files in os.walk(base_dir):
+        if os.path.basename(root) == dirname:
+            paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXT))
+    return paths
+
+
+def is_derived(path: str) -> bool:
+    """是否为变体或缩略图"""
+    folder = os.path.basename(os.path.dirname(path))
+    return folder in (image_variants.VARIANTS_DIR, video_thumbnails.THUMBNAILS_DIR)
+
+
+def find_legacy_lists(*roots: str) -> List[str]:
+    """尚未导入去重库的 _downloaded.txt"""
+    paths = []
+    for base_dir in roots:
+        for root, dirs, files in os.walk(base_dir):
+            if LEGACY_FILENAME in files:
+                paths.append(os.path.join(root, LEGACY_FILENAME))
+    return paths
+
+
+class VerifyCache:
+    """检查结果缓存：assets 路径 -> 大小、mtime 与检查结果"""
+
+    def __init__(self, path: str = DEFAULT_CACHE, enabled: bool = True):
+        self.path = path
+        self.dirty = False
+        self.entries: Dict[str, Dict] = {}
+        if enabled:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def get(self, path: str) -> Optional[Dict]:
+        entry = self.entries.get(asset_path(path))
+        st = os.stat(path)
+        if entry and entry["size"] == st.st_size and entry["mtime"] == st.st_mtime:
+            return entry["result"]
+        return None
+
+    def put(self, path: str, result: Dict):
+        st = os.stat(path)
+        self.entries[asset_path(path)] = {"size": st.st_size, "mtime": st.st_mtime, "result": result}
+        self.dirty = True
+
+    def prune(self):
+        """去掉文件已不存在的条目（未参与本次检查的文件保留，如缺少 ffmpeg 时的视频）"""
+        stale = [key for key in self.entries if not os.path.exists(os.path.join(REPO_ROOT, key))]
+        for key in stale:
+            del self.entries[key]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def scan(jobs: Dict[str, Callable[[str], Dict]], cache: VerifyCache,
+         max_workers: int = None) -> Dict[str, Dict]:
+    """检查所有文件（路径 -> 检查函数），缓存未命中的在进程池中并行执行，返回 路径 -> 结果"""
+    results = {}
+    todo = []
+    for path, check in jobs.items():
+        cached = cache.get(path)
+        if cached is not None:
+            results[path] = cached
+        else:
+            todo.append((path, check))
+
+    if todo:
+        print(f"🔎 检查 {len(todo)} 个新增或变化的文件（{len(jobs) - len(todo)} 个命中缓存）...")
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(check, path) for path, check in todo]
+            for (path, _), future in zip(todo, futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"error": f"检查异常（{e}）"}
+                results[path] = result
+                cache.put(path, result)
+    cache.prune()
+    return results
+
+
+def quarantine(path: str) -> str:
+    """把损坏文件移到 .fetch_cache/quarantine/ 下的同名相对路径"""
+    target = os.path.join(QUARANTINE_DIR, os.path.relpath(os.path.abspath(path), REPO_ROOT))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(path, target)
+    return target
+
+
+def verify(image_root: str = IMAGE_ROOT, wallpaper_root: str = catalog.IMAGE_ROOT,
+           video_root: str = catalog.VIDEO_ROOT, repair: bool = False, use_cache: bool = True,
+           max_workers: int = None, db_path: str = DEFAULT_DB_PATH) -> Dict[str, List]:
+    """扫描素材目录并输出报告，repair 为 True 时修复，返回各类问题"""
+    jobs = {}
+    if image_postprocess.AVAILABLE:
+        images = (find_images(image_root) + find_derived(image_root, image_variants.VARIANTS_DIR)
+                  + find_derived(video_root, video_thumbnails.THUMBNAILS_DIR))
+        for path in images:
+            jobs[path] = check_image
+    else:
+        print("⚠️  未安装 Pillow，跳过图片解码检查（pip install pillow）")
+    if video_thumbnails.has_ffmpeg(probe=True):
+        for path in video_thumbnails.find_videos(video_root):
+            jobs[path] = check_video
+    else:
+        print("⚠️  未检测到 ffmpeg/ffprobe，跳过视频检查")
+
+    cache = VerifyCache(enabled=use_cache)
+    results = scan(jobs, cache, max_workers)
+    cache.save()
+
+    wallpaper_prefix = os.path.abspath(wallpaper_root) + os.sep
+    broken = sorted(path for path, r in results.items() if "error" in r)
+    undersized = sorted(
+        path for path, r in results.items()
+        if "error" not in r and jobs[path] is check_image and not is_derived(path)
+        and os.path.abspath(path).startswith(wallpaper_prefix)
+        and (r["width"] < MIN_WIDTH or r["height"] < MIN_HEIGHT)
+    )
+
+    store = get_store(db_path)
+    issues = {
+        "broken": broken,
+        "undersized": undersized,
+        "orphans": image_variants.find_orphans(image_root) + video_thumbnails.find_orphans(video_root),
+        "missing": sorted(p for p in store.recorded_paths() if not os.path.exists(os.path.join(REPO_ROOT, p))),
+        "legacy": find_legacy_lists(image_root, video_root),
+        "catalog": catalog.stale_paths(image_root=wallpaper_root, video_root=video_root),
+    }
+    print(f"\n📋 检查 {len(jobs)} 个文件")
+    for path in broken:
+        print(f"  ❌ 损坏：{asset_path(path)}（{results[path]['error']}）")
+    for path in undersized:
+        r = results[path]
+        print(f"  ⚠️  尺寸不足：{asset_path(path)}（{r['width']}×{r['height']}，要求 ≥ {MIN_WIDTH}×{MIN_HEIGHT}）")
+    for path in issues["orphans"]:
+        print(f"  🧹 孤儿文件：{asset_path(path)}")
+    for path in issues["missing"]:
+        print(f"  🗃️  去重库记录的文件已不存在：{path}")
+    for path in issues["legacy"]:
+        print(f"  📄 未导入的旧记录：{asset_path(path)}")
+    for path in issues["catalog"]:
+        print(f"  🗂️  素材目录与文件不一致：{path}")
+    print(f"📊 损坏 {len(broken)}，尺寸不足 {len(undersized)}，孤儿 {len(issues['orphans'])}，"
+          f"失效记录 {len(issues['missing'])}，旧记录 {len(issues['legacy'])}，"
+          f"目录过期 {len(issues['catalog'])}")
+
+    if repair and any(issues[key] for key in ("broken", "orphans", "missing", "legacy", "catalog")):
+        _repair(issues, store, image_root, wallpaper_root, video_root)
+    store.close()
+    return issues
+
+
+def _repair(issues: Dict[str, List], store, image_root: str, wallpaper_root: str, video_root: str):
+    print("\n🔧 修复中...")
+    for path in issues["broken"]:
+        target = quarantine(path)
+        if not is_derived(path):
+            store.forget_path(path)  # 下次抓取重新下载
+        print(f"  📦 已隔离：{asset_path(path)} -> {os.path.relpath(target, REPO_ROOT)}")
+
+    # 孤儿在隔离损坏文件之后重新计算，包含刚失去原图的变体与缩略图
+    orphans = image_variants.find_orphans(image_root) + video_thumbnails.find_orphans(video_root)
+    for path in orphans:
+        os.remove(path)
+    for path in issues["missing"]:
+        store.detach_path(os.path.join(REPO_ROOT, path))
+    # 旧记录导入后删除，内容随 download_history.tsv 保留在仓库中
+    imported = sum(store.import_legacy_file(path, remove=True) for path in issues["legacy"])
+    store.flush()
+    store.export_history()
+    print(f"  🧹 删除孤儿 {len(orphans)} 个，修正去重记录 {len(issues['missing'])} 条，导入旧记录 {imported} 条")
+
+    # 补齐被隔离或缺失的变体与缩略图
+    image_variants.generate_variants(wallpaper_root)
+    if video_thumbnails.has_ffmpeg():
+        worker = video_thumbnails.ThumbnailWorker()
+        worker.backfill(video_root)
+        worker.close()
+
+    catalog.write_catalog()
+    update_pubspec()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查图片/视频素材的完整性，可选修复")
+    parser.add_argument("--images", type=str, default=IMAGE_ROOT, help="图片根目录（含头像等）")
+    parser.add_argument("--wallpapers", type=str, default=catalog.IMAGE_ROOT,
+                        help="壁纸根目录（按最低尺寸检查）")
+    parser.add_argument("--videos", type=str, default=catalog.VIDEO_ROOT, help="视频根目录")
+    parser.add_argument("--repair", action="store_true",
+                        help="隔离损坏文件、删除孤儿、修正去重库，并重新生成素材目录")
+    parser.add_argument("--no-cache", action="store_true", help="忽略检查缓存，全部重新检查")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="进程数（默认: CPU 核数）")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH,
+                        help="去重数据库路径（默认: .fetch_cache/dedup.sqlite3）")
+    args = parser.parse_args()
+
+    issues = verify(args.images, args.wallpapers, args.videos, args.repair, not args.no_cache,
+                    args.jobs, args.db)
+    if issues["broken"] and not args.repair:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
@@ -0,0 +1,81 @@
+"""
+视频文件挑选策略
+Pexels 每个视频提供 sd / hd / uhd 等多个文件，按目标档位对每个文件排序：
+  分辨率  竖屏且不低于设备尺寸（1080×1920）才算达标，比设备更大只会多占空间
+  帧率    优先不高于目标帧率（默认 30fps）的文件，60fps 的文件约大一倍，壁纸用不上
+  大小    接口给出 size 时直接使用；设置了单个视频预算时并发 HEAD 探测真实大小（size_budget.probe_sizes）；
+          否则按 宽 × 高 × 帧率 × 时长 × 每像素比特数 估算
+在帧率与预算都满足的文件中挑选体积最小的一个，通常就是设备分辨率的 HD 版本；
+都不满足时退而取体积最小的
+"""
+
+from typing import Dict, List, Optional
+
+from tools.size_budget import probe_sizes
+
+DEFAULT_FPS = 30
+FPS_TOLERANCE = 1           # 29.97 / 30.0 / 31 都视为 30fps
+BITS_PER_PIXEL = 0.12       # 库存 H.264 视频的典型值，仅用于比较各文件的相对大小
+DEFAULT_DURATION = 15       # 接口未给出时长时的估算值（秒）
+
+
+def estimate_bytes(width: int, height: int, fps: float, duration: float) -> int:
+    """按每像素比特数估算文件大小"""
+    return int(width * height * fps * (duration or DEFAULT_DURATION) * BITS_PER_PIXEL / 8)
+
+
+class VideoTarget:
+    """目标档位：最低宽高、期望帧率与单个视频的大小预算（None 表示不限）"""
+
+    def __init__(self, min_width: int, min_height: int, fps: float = DEFAULT_FPS, max_bytes: int = None):
+        self.min_width = min_width
+        self.min_height = min_height
+        self.fps = fps
+        self.max_bytes = max_bytes
+
+    def accepts(self, width: int, height: int) -> bool:
+        """竖屏且不低于最低宽高"""
+        return height > width and width >= self.min_width and height >= self.min_height
+
+    def meets(self, candidate: Dict) -> bool:
+        """帧率不高于目标且在预算内"""
+        if candidate["fps"] > self.fps + FPS_TOLERANCE:
+            return False
+        return self.max_bytes is None or candidate["bytes"] <= self.max_bytes
+
+    def rank(self, candidate: Dict):
+        """排序键：完全达标的优先，再按体积与分辨率从小到大（都不达标时取最小的）"""
+        return (not self.meets(candidate), candidate["bytes"], candidate["width"] * candidate["height"])
+
+
+def select_file(video_files: List[Dict], duration: float, target: VideoTarget,
+                session=None, engine=None) -> Optional[Dict]:
+    """
+    从 video_files 中挑选最合适的文件，没有达标文件时返回 None
+    传入 session 时对接口未给出大小的候选并发发送 HEAD 探测
+    返回 {"url", "width", "height", "quality", "fps", "bytes", "estimated"}
+    """
+    candidates = []
+    for vf in video_files:
+        width, height = vf.get("width") or 0, vf.get("height") or 0
+        if vf.get("file_type") != "video/mp4" or not target.accepts(width, height):
+            continue
+        candidates.append({
+            "url": vf["link"],
+            "width": width,
+            "height": height,
+            "quality": vf.get("quality") or "",
+            "fps": float(vf.get("fps") or target.fps),
+            "bytes": vf.get("size") or None,
+        })
+    if not candidates:
+        return None
+
+    if session is not None:
+        probe_sizes(candidates, session, engine)
+    for candidate in candidates:
+        candidate["estimated"] = candidate["bytes"] is None
+        if candidate["estimated"]:
+            candidate["bytes"] = estimate_bytes(candidate["width"], candidate["height"],
+                                                candidate["fps"], duration)
+    return min(candidates, key=target.rank)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+视频缩略图生成
+独立于下载的线程池阶段：视频下载完成后提交任务，抽帧与后续下载并行进行
+ffmpeg 检测每次运行只做一次；抽帧使用输入端 seek + 只解码关键帧；
+缩略图比源视频新时直接跳过，重复运行与全量补齐几乎没有开销
+
+用法:
+  python -m tools.video_thumbnails assets/videos
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from tools.run_metrics import get_metrics
+
+THUMBNAILS_DIR = "thumbnails"
+THUMB_WIDTH = 400
+THUMB_SEEK = 0.0  # 抽帧位置（秒），取该位置之前最近的关键帧
+THUMB_TIMEOUT = 10
+DEFAULT_WORKERS = 2
+VIDEO_EXT = (".mp4", ".mov")
+
+
+@lru_cache(maxsize=None)
+def has_ffmpeg(probe: bool = False) -> bool:
+    """ffmpeg 是否可用，probe 为 True 时还要求 ffprobe（读取时长、宽高时需要），进程内只检测一次"""
+    if shutil.which("ffmpeg") is None:
+        return False
+    return not probe or shutil.which("ffprobe") is not None
+
+
+@lru_cache(maxsize=None)
+def check_ffmpeg() -> bool:
+    """检查 FFmpeg 是否安装，缺失时只提示一次"""
+    if not has_ffmpeg():
+        print("\n⚠️  警告：未检测到 FFmpeg")
+        print("\nFFmpeg 用于生成视频缩略图。安装方法：")
+        print("  macOS:   brew install ffmpeg")
+        print("  Ubuntu:  sudo apt install ffmpeg")
+        print("  Windows: 下载 https://ffmpeg.org/download.html\n")
+        return False
+    return True
+
+
+def thumbnail_path(video_path: str) -> str:
+    """视频对应的缩略图路径：<目录>/thumbnails/<文件名>.jpg"""
+    folder, fname = os.path.split(video_path)
+    return os.path.join(folder, THUMBNAILS_DIR, os.path.splitext(fname)[0] + ".jpg")
+
+
+def is_up_to_date(video_path: str, thumb_path: str) -> bool:
+    """缩略图存在且不早于源视频"""
+    try:
+        return os.path.getmtime(thumb_path) >= os.path.getmtime(video_path)
+    except OSError:
+        return False
+
+
+def generate_thumbnail(video_path: str, thumb_path: str, width: int = THUMB_WIDTH,
+                       seek: float = THUMB_SEEK) -> bool:
+    """抽取一帧生成缩略图（先写临时文件再原子替换）"""
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+    tmp_path = os.path.splitext(thumb_path)[0] + ".tmp.jpg"
+
+    cmd = [
+        "ffmpeg",
+        "-v", "error",
+        "-skip_frame", "nokey",       # 只解码关键帧
+        "-ss", f"{seek:.3f}",         # 放在 -i 之前：按容器索引直接跳转
+        "-noaccurate_seek",
+        "-i", video_path,
+        "-frames:v", "1",             # 只提取 1 帧
+        "-vf", f"scale={width}:-2",   # 缩放到指定宽度，高度取偶数
+        "-y",
+        tmp_path,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=THUMB_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        result = None
+
+    if result is None or result.returncode != 0 or not os.path.exists(tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+    os.replace(tmp_path, thumb_path)
+    return True
+
+
+def find_videos(base_dir: str) -> List[str]:
+    """列出目录下所有视频（跳过缩略图目录）"""
+    paths = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d != THUMBNAILS_DIR]
+        for fname in sorted(files):
+            if fname.lower().endswith(VIDEO_EXT) and not fname.startswith("_"):
+                paths.append(os.path.join(root, fname))
+    return paths
+
+
+def find_orphans(base_dir: str) -> List[str]:
+    """视频已不存在的缩略图（含中断残留的临时文件）"""
+    orphans = []
+    for root, dirs, files in os.walk(base_dir):
+        if os.path.basename(root) != THUMBNAILS_DIR:
+            continue
+        parent = os.path.dirname(root)
+        videos = {os.path.splitext(f)[0] for f in os.listdir(parent) if f.lower().endswith(VIDEO_EXT)}
+        for fname in sorted(files):
+            if os.path.splitext(fname)[0] not in videos:
+                orphans.append(os.path.join(root, fname))
+    return orphans
+
+
+class ThumbnailWorker:
+    """缩略图线程池：ffmpeg 在子进程中运行，线程只负责等待"""
+
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, width: int = THUMB_WIDTH,
+                 log: Callable[[str], None] = print):
+        self.width = width
+        self.log = log
+        self.max_workers = max_workers
+        self.enabled = has_ffmpeg()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumb")
+        self._futures: List[Future] = []
+        self._pending = set()
+        self._lock = threading.Lock()
+        self.stats = {"generated": 0, "skipped": 0, "failed": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def generate(self, video_path: str, thumb_path: str = None) -> bool:
+        """在当前线程中生成一张缩略图（流水线阶段直接调用），已是最新时跳过"""
+        if not self.enabled:
+            return False
+        thumb_path = thumb_path or thumbnail_path(video_path)
+        if is_up_to_date(video_path, thumb_path):
+            self._count("skipped")
+            return True
+        with get_metrics().stage("thumbnail", file=os.path.basename(video_path)) as stage:
+            if generate_thumbnail(video_path, thumb_path, self.width):
+                size = os.path.getsize(thumb_path)
+                stage.set(bytes=size)
+                self.log(f"  📸 生成缩略图: {os.path.basename(thumb_path)} ({size / 1024:.1f} KB)")
+                self._count("generated")
+                return True
+            stage.fail("ffmpeg 抽帧失败")
+            self.log(f"  ⚠️  缩略图生成失败：{os.path.basename(video_path)}")
+            self._count("failed")
+            return False
+
+    def _run(self, video_path: str, thumb_path: str):
+        try:
+            self.generate(video_path, thumb_path)
+        finally:
+            with self._lock:
+                self._pending.discard(video_path)
+
+    def submit(self, video_path: str) -> Optional[Future]:
+        """提交一个视频；缩略图已是最新或同一视频已在队列中时不提交"""
+        if not self.enabled:
+            return None
+        thumb_path = thumbnail_path(video_path)
+        if is_up_to_date(video_path, thumb_path):
+            self._count("skipped")
+            return None
+        with self._lock:
+            if video_path in self._pending:
+                return None
+            self._pending.add(video_path)
+        future = self._pool.submit(self._run, video_path, thumb_path)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def backfill(self, base_dir: str) -> int:
+        """为目录下缺少或过期缩略图的视频补齐，返回提交数量"""
+        return sum(1 for path in find_videos(base_dir) if self.submit(path) is not None)
+
+    def close(self) -> Dict[str, int]:
+        """等待所有任务完成并关闭线程池，返回统计"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self.log(f"  ⚠️  缩略图生成异常: {e}")
+                self._count("failed")
+        self._pool.shutdown(wait=True)
+        return dict(self.stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为视频生成缩略图（跳过已是最新的）")
+    parser.add_argument("dirs", nargs="+", help="视频根目录")
+    parser.add_argument("--workers", "-w", type=int, default=DEFAULT_WORKERS,
+                        help=f"并发 ffmpeg 进程数（默认: {DEFAULT_WORKERS}）")
+    parser.add_argument("--width", type=int, default=THUMB_WIDTH,
+                        help=f"缩略图宽度（默认: {THUMB_WIDTH}）")
+    args = parser.parse_args()
+
+    if not check_ffmpeg():
+        sys.exit(1)
+
+    worker = ThumbnailWorker(args.workers, args.width)
+    for base_dir in args.dirs:
+        worker.backfill(base_dir)
+    stats = worker.close()
+    print(f"📊 生成 {stats['generated']} 张，跳过 {stats['skipped']} 张，失败 {stats['failed']} 张")
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()
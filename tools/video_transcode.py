@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+视频壁纸转码
+按设备分辨率缩放，按单个视频的字节预算 / 码率上限重新编码为 H.264，
+去掉音轨（壁纸无声），并加 +faststart 把 moov 放到文件头，播放无需读完整个文件
+源码率与分辨率已在预算内时只做流复制（去音轨 + faststart），不重复有损编码
+已转码的文件记录在 .fetch_cache/transcoded.json（按 大小 + mtime + 参数），重复运行直接跳过
+转码输出先写到 .fetch_cache/transcode/<进程号>/，完成后再替换原文件；
+中断留下的临时文件在下次启动时清理（只清理已退出进程的，不影响同时运行的其他转码）
+
+用法:
+  python -m tools.video_transcode assets/videos --max-mb 2 --max-kbps 2500
+"""
+
+import argparse
+import errno
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from tools import CACHE_DIR
+from tools.dedup_store import rel_path
+from tools.run_metrics import get_metrics
+from tools.video_thumbnails import find_videos, has_ffmpeg
+
+DEFAULT_JOURNAL = os.path.join(CACHE_DIR, "transcoded.json")
+TMP_DIR = os.path.join(CACHE_DIR, "transcode")   # 每个进程使用以进程号命名的子目录
+LEGACY_TMP_SUFFIX = ".transcode.mp4"   # 旧版本写在素材目录里的临时文件
+STAGED_SUFFIX = ".transcode.tmp"       # 跨文件系统替换时在素材目录里的中转文件：.<文件名>.<进程号>.transcode.tmp
+DEFAULT_MAX_WIDTH = 1080   # 设备宽度（竖屏）
+DEFAULT_MAX_KBPS = 2500    # 码率上限
+DEFAULT_WORKERS = 2        # 同时运行的 ffmpeg 进程数（x264 自身已多线程）
+DEFAULT_PRESET = "slow"
+BUDGET_MARGIN = 0.92       # 给容器开销留余量
+MIN_KBPS = 300
+TRANSCODE_TIMEOUT = 600
+
+
+def probe(path: str) -> Optional[Dict]:
+    """读取视频宽高、时长、码率与是否有音轨"""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=codec_type,width,height:format=duration,bit_rate",
+        "-of", "json", path,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=30)
+        data = json.loads(result.stdout or b"{}")
+    except (subprocess.TimeoutExpired, ValueError):
+        return None
+
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    fmt = data.get("format", {})
+    if video is None or "duration" not in fmt:
+        return None
+    return {
+        "width": int(video.get("width", 0)),
+        "height": int(video.get("height", 0)),
+        "duration": float(fmt["duration"]),
+        "kbps": int(fmt.get("bit_rate", 0)) / 1000,
+        "audio": any(s.get("codec_type") == "audio" for s in streams),
+    }
+
+
+def target_kbps(duration: float, max_bytes: Optional[int], max_kbps: Optional[int]) -> Optional[float]:
+    """由字节预算与码率上限算出目标码率（取较小者）"""
+    limits = []
+    if max_kbps:
+        limits.append(max_kbps)
+    if max_bytes and duration > 0:
+        limits.append(max_bytes * 8 * BUDGET_MARGIN / duration / 1000)
+    if not limits:
+        return None
+    return max(MIN_KBPS, min(limits))
+
+
+def settings_key(max_width: int, max_bytes: Optional[int], max_kbps: Optional[int]) -> str:
+    """转码参数摘要，记入日志；参数变化后已转码的文件会重新处理"""
+    return f"w{max_width}/b{max_bytes or 0}/k{max_kbps or 0}"
+
+
+def transcode_video(path: str, max_width: int = DEFAULT_MAX_WIDTH, max_bytes: int = None,
+                    max_kbps: int = DEFAULT_MAX_KBPS, preset: str = DEFAULT_PRESET) -> Dict:
+    """
+    转码单个视频并原地替换
+    返回 {"path", "before", "after", "mode"}，mode 为 encode / remux / kept / failed
+    """
+    with get_metrics().stage("transcode", file=os.path.basename(path)) as stage:
+        result = _transcode(path, max_width, max_bytes, max_kbps, preset)
+        stage.set(bytes=result["before"], after=result["after"], mode=result["mode"])
+        if result["mode"] == "failed":
+            stage.fail("ffmpeg 转码失败")
+        return result
+
+
+def _transcode(path: str, max_width: int, max_bytes: Optional[int], max_kbps: Optional[int],
+               preset: str) -> Dict:
+    before = os.path.getsize(path)
+    result = {"path": path, "before": before, "after": before, "mode": "failed"}
+
+    info = probe(path)
+    if info is None:
+        return result
+
+    kbps = target_kbps(info["duration"], max_bytes, max_kbps)
+    needs_scale = info["width"] > max_width
+    needs_encode = needs_scale or (kbps is not None and info["kbps"] > kbps)
+
+    # 临时文件放在缓存目录，中断时不会被当作素材扫描、打包
+    run_dir = os.path.join(TMP_DIR, str(os.getpid()))
+    os.makedirs(run_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".mp4", dir=run_dir)
+    os.close(fd)
+    cmd = ["ffmpeg", "-v", "error", "-y", "-i", path, "-map", "0:v:0", "-an"]
+    if needs_encode:
+        cmd += ["-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p",
+                "-vf", f"scale='min({max_width},iw)':-2"]
+        if kbps is not None:
+            cmd += ["-b:v", f"{kbps:.0f}k", "-maxrate", f"{kbps:.0f}k", "-bufsize", f"{kbps * 2:.0f}k"]
+        else:
+            cmd += ["-crf", "23"]
+    else:
+        cmd += ["-c:v", "copy"]
+    cmd += ["-movflags", "+faststart", tmp_path]
+
+    try:
+        completed = subprocess.run(cmd, capture_output=True, timeout=TRANSCODE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        completed = None
+    if completed is None or completed.returncode != 0 or not os.path.exists(tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return result
+
+    after = os.path.getsize(tmp_path)
+    if needs_encode and not needs_scale and after >= before:
+        # 重新编码反而更大，保留原文件
+        os.remove(tmp_path)
+        result["mode"] = "kept"
+        return result
+
+    _install(tmp_path, path)
+    return {"path": path, "before": before, "after": after, "mode": "encode" if needs_encode else "remux"}
+
+
+def _install(tmp_path: str, path: str):
+    """用转码结果替换原文件；缓存目录与素材目录不在同一文件系统时先复制到旁边的点号文件再原子替换"""
+    try:
+        os.replace(tmp_path, path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    directory, name = os.path.split(path)
+    staged = os.path.join(directory, f".{name}.{os.getpid()}{STAGED_SUFFIX}")
+    try:
+        shutil.copyfile(tmp_path, staged)
+        os.replace(staged, path)
+    finally:
+        for leftover in (staged, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def _alive(pid: int) -> bool:
+    """进程是否仍在运行"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True  # 进程存在，只是属于其他用户
+    except OSError:
+        return False
+    return True
+
+
+def _owner(name: str) -> Optional[int]:
+    """临时文件/目录名中的进程号，无法识别时返回 None"""
+    if name.endswith(STAGED_SUFFIX):
+        name = name[:-len(STAGED_SUFFIX)].rsplit(".", 1)[-1]
+    return int(name) if name.isdigit() else None
+
+
+def clean_leftovers(base_dir: str) -> int:
+    """
+    删除中断的转码留下的临时文件，返回删除数量
+    缓存目录与素材目录中属于仍在运行的进程的临时文件保留；旧版本留下的文件直接删除
+    """
+    removed = 0
+    if os.path.isdir(TMP_DIR):
+        for name in os.listdir(TMP_DIR):
+            path = os.path.join(TMP_DIR, name)
+            pid = _owner(name)
+            if pid is not None and _alive(pid):
+                continue
+            if os.path.isdir(path):
+                removed += len(os.listdir(path))
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+                removed += 1
+    for root, _, files in os.walk(base_dir):
+        for name in files:
+            if _is_stale_asset_tmp(name):
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+def _is_stale_asset_tmp(name: str) -> bool:
+    """素材目录中的转码临时文件，且写入它的进程已退出"""
+    if name.endswith(LEGACY_TMP_SUFFIX):
+        return True
+    if not (name.startswith(".") and name.endswith(STAGED_SUFFIX)):
+        return False
+    pid = _owner(name)
+    return pid is None or not _alive(pid)
+
+
+class TranscodeJournal:
+    """已转码文件的记录：相对路径 -> 转码后的大小、mtime 与参数"""
+
+    def __init__(self, path: str = DEFAULT_JOURNAL):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def _stamp(path: str, settings: str) -> Dict:
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime": st.st_mtime, "settings": settings}
+
+    def is_done(self, path: str, settings: str) -> bool:
+        entry = self.entries.get(rel_path(path))
+        return entry is not None and entry == self._stamp(path, settings)
+
+    def mark(self, path: str, settings: str):
+        self.entries[rel_path(path)] = self._stamp(path, settings)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def transcode_videos(paths: List[str], max_width: int = DEFAULT_MAX_WIDTH, max_bytes: int = None,
+                     max_kbps: int = DEFAULT_MAX_KBPS, max_workers: int = DEFAULT_WORKERS,
+                     journal_path: str = DEFAULT_JOURNAL) -> List[Dict]:
+    """并行转码（同时最多 max_workers 个 ffmpeg 进程），跳过已按相同参数转码过的文件"""
+    if not has_ffmpeg(probe=True):
+        print("⚠️  未检测到 ffmpeg/ffprobe，跳过视频转码")
+        return []
+
+    settings = settings_key(max_width, max_bytes, max_kbps)
+    journal = TranscodeJournal(journal_path)
+    todo = [p for p in paths if not journal.is_done(p, settings)]
+    if not todo:
+        return []
+
+    budget = f"≤ {max_bytes / (1024 * 1024):.1f} MB/个" if max_bytes else f"≤ {max_kbps} kbps"
+    print(f"\n🎞️  正在转码 {len(todo)} 个视频 → 宽 ≤ {max_width}px，{budget}，无音轨，faststart")
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(transcode_video, p, max_width, max_bytes, max_kbps) for p in todo]
+        for path, future in zip(todo, futures):
+            try:
+                r = future.result()
+            except Exception as e:
+                print(f"  ⚠️  转码失败：{os.path.basename(path)}（{e}）")
+                continue
+            results.append(r)
+            if r["mode"] == "failed":
+                print(f"  ⚠️  转码失败：{os.path.basename(path)}")
+                continue
+            journal.mark(path, settings)
+            print(f"  🎞️  {os.path.basename(path)}: {r['before'] / 1024 / 1024:.2f} MB → "
+                  f"{r['after'] / 1024 / 1024:.2f} MB（{r['mode']}）")
+    journal.save()
+
+    saved = sum(r["before"] - r["after"] for r in results) / (1024 * 1024)
+    print(f"✨ 转码完成，节省 {saved:.1f} MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="视频壁纸转码：缩放、限码率、去音轨、faststart")
+    parser.add_argument("dirs", nargs="+", help="视频根目录")
+    parser.add_argument("--max-width", type=int, default=DEFAULT_MAX_WIDTH,
+                        help=f"最大宽度（默认: {DEFAULT_MAX_WIDTH}）")
+    parser.add_argument("--max-mb", type=float, default=None, help="单个视频的大小预算（MB）")
+    parser.add_argument("--max-kbps", type=int, default=DEFAULT_MAX_KBPS,
+                        help=f"码率上限（默认: {DEFAULT_MAX_KBPS}，0 表示不限）")
+    parser.add_argument("--jobs", "-j", type=int, default=DEFAULT_WORKERS,
+                        help=f"并发 ffmpeg 进程数（默认: {DEFAULT_WORKERS}）")
+    args = parser.parse_args()
+
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    for d in args.dirs:
+        clean_leftovers(d)
+    paths = [p for d in args.dirs for p in find_videos(d)]
+    transcode_videos(paths, args.max_width, max_bytes, args.max_kbps or None, args.jobs)
+
+
+if __name__ == "__main__":
+    if sys.version_info.major < 3:
+        print("⚠️ 请使用 Python 3 运行此脚本")
+        sys.exit(1)
+    main()